@@ -1,9 +1,12 @@
 """
 Система достижений (ачивок)
 """
+import hashlib
+import json
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import streamlit as st
+from utils.cache import cached_read_model, achievements_tag, on_achievements_unlocked
 
 # Словарь всех доступных достижений
 ACHIEVEMENTS = {
@@ -92,33 +95,40 @@ ACHIEVEMENTS = {
     }
 }
 
+def achievements_digest() -> str:
+    """Хеш определений: при изменении ACHIEVEMENTS bootstrap перезапишет achievements_def"""
+    payload = json.dumps(ACHIEVEMENTS, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+def seed_achievements(cursor):
+    """Записать определения достижений в achievements_def (вызывается из data.bootstrap)"""
+    cursor.executemany('''
+        INSERT INTO achievements_def
+        (id, name, description, emoji, condition_type, condition_value, reward_points)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            name = excluded.name, description = excluded.description, emoji = excluded.emoji,
+            condition_type = excluded.condition_type, condition_value = excluded.condition_value,
+            reward_points = excluded.reward_points
+    ''', [
+        (
+            ach_id,
+            ach_data['name'],
+            ach_data['description'],
+            ach_data['emoji'],
+            ach_data['condition_type'],
+            ach_data['condition_value'],
+            ach_data.get('reward_points', 0)
+        )
+        for ach_id, ach_data in ACHIEVEMENTS.items()
+    ])
+
 class AchievementSystem:
     """Система проверки и выдачи достижений"""
     
     def __init__(self, db_connection):
+        # Определения достижений записывает data.bootstrap при старте процесса
         self.conn = db_connection
-        self._init_achievements_def()
-    
-    def _init_achievements_def(self):
-        """Инициализация таблицы с определениями достижений"""
-        cursor = self.conn.cursor()
-        
-        for ach_id, ach_data in ACHIEVEMENTS.items():
-            cursor.execute('''
-                INSERT OR IGNORE INTO achievements_def 
-                (id, name, description, emoji, condition_type, condition_value, reward_points)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                ach_id,
-                ach_data['name'],
-                ach_data['description'],
-                ach_data['emoji'],
-                ach_data['condition_type'],
-                ach_data['condition_value'],
-                ach_data.get('reward_points', 0)
-            ))
-        
-        self.conn.commit()
     
     def check_and_unlock(self, child_id: int, stats: Dict) -> List[Dict]:
         """Проверить, какие достижения можно разблокировать"""
@@ -163,7 +173,7 @@ class AchievementSystem:
                 
                 # Начисляем бонусные баллы
                 if ach_data.get('reward_points', 0) > 0:
-                    self._add_reward_points(child_id, ach_data['reward_points'])
+                    self._add_reward_points(child_id, ach_data['reward_points'], ach_id)
                 
                 new_achievements.append({
                     'id': ach_id,
@@ -171,13 +181,17 @@ class AchievementSystem:
                 })
         
         self.conn.commit()
+        if new_achievements:
+            on_achievements_unlocked(child_id)
         return new_achievements
     
-    def _add_reward_points(self, child_id: int, points: int):
-        """Добавить бонусные баллы за достижение"""
-        cursor = self.conn.cursor()
-        cursor.execute('UPDATE children SET points = points + ? WHERE id = ?', (points, child_id))
+    def _add_reward_points(self, child_id: int, points: int, achievement_id: str = None):
+        """Добавить бонусные баллы за достижение (через журнал; ключ — не больше одного раза)"""
+        from data.points_ledger import record, ACHIEVEMENT
+        request_key = f"achievement:{child_id}:{achievement_id}" if achievement_id else None
+        record(self.conn.cursor(), child_id, points, ACHIEVEMENT, request_key=request_key)
     
+    @cached_read_model(ttl=300, tags=lambda achievements, child_id: [achievements_tag(child_id)])
     def get_unlocked_achievements(self, child_id: int) -> List[Dict]:
         """Получить все разблокированные достижения ребёнка"""
         cursor = self.conn.cursor()
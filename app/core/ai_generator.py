@@ -12,10 +12,10 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import urllib3
 import logging
+from utils.profiler import profiled
 
-# Настройка логгера
+# Настройка логгера (уровень наследуется от "FamilyQuest", см. utils.logger)
 logger = logging.getLogger("FamilyQuest.AI")
-logger.setLevel(logging.DEBUG)
 
 # Отключаем предупреждения о SSL (для разработки)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -151,6 +151,7 @@ class AITaskGenerator:
         else:
             return "14-17"
     
+    @profiled('ai.get_token')
     def _get_token(self) -> Optional[str]:
         """Получение токена доступа"""
         logger.info("🔄 _get_token() вызван")
@@ -220,6 +221,7 @@ class AITaskGenerator:
             st.error(f"Ошибка подключения к GigaChat: {e}")
             return None
     
+    @profiled('ai.call_gigachat')
     def _call_gigachat(self, prompt: str, temperature: float = 0.7) -> Optional[str]:
         """Отправка запроса к GigaChat API"""
         logger.info("📡 _call_gigachat() вызван")
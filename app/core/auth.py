@@ -2,11 +2,10 @@
 Система аутентификации и связи родитель-ребёнок
 """
 import streamlit as st
-import random
-import string
-from datetime import datetime, timedelta
 from typing import Optional, Dict, List
 from data.database import get_connection
+from core.invites import create_invite, get_invite, claim_invite
+from utils.cache import cached_read_model, points_tag, on_invitation_accepted, FAMILY_TAG
 
 class ParentManager:
     """Управление родителями и связями с детьми"""
@@ -21,16 +20,7 @@ class ParentManager:
 
     def get_invitation(self, invite_code: str) -> Optional[Dict]:
         """Получить информацию о приглашении по коду"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM invitations 
-            WHERE invite_code = ? AND status = 'pending' 
-            AND expires_at > datetime('now')
-        ''', (invite_code,))
-        row = cursor.fetchone()
-        conn.close()
-        return dict(row) if row else None
+        return get_invite(invite_code)
     
     def register_parent(self, email: str, name: str, pin: str) -> Optional[int]:
         """Регистрация нового родителя"""
@@ -63,36 +53,19 @@ class ParentManager:
     
     def generate_invite_code(self, parent_id: int, child_name: str = None) -> str:
         """Сгенерировать пригласительный код для ребёнка"""
-        # Код формата FAM-XXXXXX (6 случайных символов)
-        code = 'FAM-' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        expires_at = (datetime.now() + timedelta(days=7)).isoformat()
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO invitations (parent_id, invite_code, child_name, expires_at)
-            VALUES (?, ?, ?, ?)
-        ''', (parent_id, code, child_name, expires_at))
-        conn.commit()
-        conn.close()
-        
-        return code
+        # Код выводится из id приглашения (core.invites): коллизий не бывает
+        return create_invite(parent_id, child_name)
     
     def accept_invitation(self, invite_code: str, child_id: int) -> bool:
         """Принять приглашение и связать ребёнка с родителем"""
         conn = self._get_connection()
         cursor = conn.cursor()
         
-        # Проверяем код
-        cursor.execute('''
-            SELECT * FROM invitations 
-            WHERE invite_code = ? AND status = 'pending' 
-            AND expires_at > datetime('now')
-        ''', (invite_code,))
-        row = cursor.fetchone()
-        invite = dict(row) if row else None
+        # Проверяем код и сразу помечаем использованным
+        invite = claim_invite(cursor, invite_code)
         
         if not invite:
+            conn.rollback()
             conn.close()
             return False
         
@@ -102,15 +75,12 @@ class ParentManager:
             VALUES (?, ?)
         ''', (child_id, invite['parent_id']))
         
-        # Обновляем статус приглашения
-        cursor.execute('''
-            UPDATE invitations SET status = 'used' WHERE id = ?
-        ''', (invite['id'],))
-        
         conn.commit()
         conn.close()
+        on_invitation_accepted(child_id)
         return True
     
+    @cached_read_model(ttl=60, tags=lambda children, parent_id: [FAMILY_TAG] + [points_tag(c['id']) for c in children])
     def get_children_for_parent(self, parent_id: int) -> List[Dict]:
         """Получить всех детей родителя"""
         conn = self._get_connection()
@@ -124,6 +94,7 @@ class ParentManager:
         conn.close()
         return [dict(row) for row in rows]
     
+    @cached_read_model(ttl=300, tags=lambda parents, child_id: [FAMILY_TAG])
     def get_parents_for_child(self, child_id: int) -> List[Dict]:
         """Получить всех родителей ребёнка"""
         conn = self._get_connection()
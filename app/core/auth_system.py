@@ -2,18 +2,15 @@
 Система аутентификации пользователей
 """
 import streamlit as st
-import hashlib
-import random
-import string
 import json
-from datetime import datetime, timedelta, date
+from datetime import date
 from typing import Optional, Dict, List
 import sqlite3
 from data.database import get_connection
-
-def hash_password(password: str) -> str:
-    """Хеширование пароля"""
-    return hashlib.sha256(password.encode()).hexdigest()
+from utils.avatars import avatar_ref
+from utils.cache import cached_read_model, points_tag, on_invitation_accepted, on_points_changed, FAMILY_TAG
+from utils.logger import logger
+from core.passwords import hash_password, verify_password, verify_dummy, needs_rehash
 
 class AuthSystem:
     """Система аутентификации"""
@@ -34,7 +31,7 @@ class AuthSystem:
         try:
             password_hash = hash_password(password)
             interests_json = json.dumps(interests, ensure_ascii=False)
-            avatar = f"https://api.dicebear.com/7.x/adventurer/svg?seed={username}"
+            avatar = avatar_ref(username)
             last_active = date.today().isoformat()
             
             cursor.execute('''
@@ -89,16 +86,23 @@ class AuthSystem:
         """Вход пользователя"""
         conn = self._get_connection()
         cursor = conn.cursor()
-        password_hash = hash_password(password)
         
         cursor.execute('''
-            SELECT * FROM users WHERE username = ? AND password_hash = ?
-        ''', (username, password_hash))
+            SELECT * FROM users WHERE username = ?
+        ''', (username,))
         
         row = cursor.fetchone()
+        # Соединение не держим, пока считается KDF
+        conn.close()
         
-        if row:
+        if not row:
+            verify_dummy(password)
+            return None
+        
+        if verify_password(password, row['password_hash']):
             user = dict(row)
+            if needs_rehash(user['password_hash']):
+                user['password_hash'] = self._rehash_password(user['id'], user['password_hash'], password)
             # Преобразуем interests обратно в список для детей
             if user['user_type'] == 'child' and user.get('interests'):
                 try:
@@ -114,14 +118,33 @@ class AuthSystem:
             if 'streak_days' not in user or user['streak_days'] is None:
                 user['streak_days'] = 0
             
-            conn.close()
             return user
         
-        conn.close()
         return None
     
+    def _rehash_password(self, user_id: int, old_hash: str, password: str) -> str:
+        """Перезаписать хеш текущим KDF (старый формат или сменилась стоимость)"""
+        new_hash = hash_password(password)
+        conn = self._get_connection()
+        try:
+            # Только если хеш не сменился с момента проверки (параллельная смена пароля)
+            cursor = conn.execute('''
+                UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?
+            ''', (new_hash, user_id, old_hash))
+            conn.commit()
+            if cursor.rowcount:
+                logger.info(f"🔐 Хеш пароля пользователя {user_id} обновлён")
+                return new_hash
+            return old_hash
+        except sqlite3.Error as e:
+            logger.error(f"Database error in _rehash_password: {e}")
+            return old_hash
+        finally:
+            conn.close()
+    
+    @cached_read_model(ttl=300, tags=lambda user, user_id: [points_tag(user_id)])
     def get_user_by_id(self, user_id: int) -> Optional[Dict]:
-        """Получить пользователя по ID"""
+        """Получить пользователя по ID (восстановление сессии по токену — без запроса к users)"""
         conn = self._get_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT * FROM users WHERE id = ?', (user_id,))
@@ -150,41 +173,22 @@ class AuthSystem:
         return None
     
     def generate_invite_code(self, parent_id: int, child_name: str = None) -> str:
-        """Сгенерировать код приглашения для ребёнка"""
-        code = 'FAM-' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-        expires_at = (datetime.now() + timedelta(days=7)).isoformat()
-        
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute('''
-                INSERT INTO invitations (parent_id, invite_code, child_name, expires_at)
-                VALUES (?, ?, ?, ?)
-            ''', (parent_id, code, child_name, expires_at))
-            
-            conn.commit()
-            conn.close()
-            return code
-            
-        except Exception as e:
-            conn.close()
-            raise e
+        """Сгенерировать код приглашения для ребёнка (core.invites: код без коллизий)"""
+        from core.invites import create_invite
+        return create_invite(parent_id, child_name)
     
     def accept_invitation(self, invite_code: str, child_id: int) -> bool:
         """Принять приглашение и связать с родителем"""
+        from core.invites import claim_invite
         conn = self._get_connection()
         cursor = conn.cursor()
         
         try:
-            # Проверяем код
-            cursor.execute('''
-                SELECT * FROM invitations 
-                WHERE invite_code = ? AND status = 'pending' 
-                AND expires_at > datetime('now')
-            ''', (invite_code,))
-            invite = cursor.fetchone()
+            # Проверяем код и сразу помечаем использованным (опечатки отсекаются без БД)
+            invite = claim_invite(cursor, invite_code)
             
             if not invite:
+                conn.rollback()
                 conn.close()
                 return False
             
@@ -194,13 +198,9 @@ class AuthSystem:
                 VALUES (?, ?, 'active')
             ''', (invite['parent_id'], child_id))
             
-            # Обновляем статус приглашения
-            cursor.execute('''
-                UPDATE invitations SET status = 'used' WHERE id = ?
-            ''', (invite['id'],))
-            
             conn.commit()
             conn.close()
+            on_invitation_accepted(child_id)
             return True
             
         except Exception as e:
@@ -208,6 +208,7 @@ class AuthSystem:
             conn.close()
             raise e
     
+    @cached_read_model(ttl=60, tags=lambda children, parent_id: [FAMILY_TAG] + [points_tag(c['id']) for c in children])
     def get_children_for_parent(self, parent_id: int) -> List[Dict]:
         """Получить всех детей родителя"""
         conn = self._get_connection()
@@ -246,6 +247,7 @@ class AuthSystem:
             conn.close()
             raise e
     
+    @cached_read_model(ttl=300, tags=lambda parents, child_id: [FAMILY_TAG])
     def get_parents_for_child(self, child_id: int) -> List[Dict]:
         """Получить всех родителей ребёнка"""
         conn = self._get_connection()
@@ -268,25 +270,17 @@ class AuthSystem:
     
     def update_child_points(self, child_id: int, points_to_add: int) -> bool:
         """Обновить баллы ребёнка"""
+        from data.points_ledger import record, ADJUSTMENT
         conn = self._get_connection()
         cursor = conn.cursor()
         try:
-            # Получаем текущие баллы
-            cursor.execute('SELECT points FROM users WHERE id = ?', (child_id,))
-            row = cursor.fetchone()
-            current_points = row['points'] if row else 0
-            
-            new_points = current_points + points_to_add
-            new_level = new_points // 100 + 1
-            
-            cursor.execute('''
-                UPDATE users 
-                SET points = ?, level = ?, last_active = ?
-                WHERE id = ?
-            ''', (new_points, new_level, date.today().isoformat(), child_id))
-            
+            # Через журнал баллов: изменение и баланс после пишутся одной транзакцией
+            balance = record(cursor, child_id, points_to_add, ADJUSTMENT, active=True)
             conn.commit()
             conn.close()
+            if balance is None:
+                return False
+            on_points_changed(child_id)
             return True
             
         except Exception as e:
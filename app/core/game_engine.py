@@ -1,53 +1,144 @@
 """
 Ядро игровой логики FamilyQuest
 """
-from dataclasses import dataclass
-from datetime import datetime, date
+from dataclasses import dataclass, replace
+from datetime import datetime, date, timedelta
 from typing import List, Dict, Optional
 from core.achievements import AchievementSystem
 from utils.logger import logger
 import random
 import json
 import sqlite3
+import time
+from utils.profiler import profiled
+from utils.avatars import avatar_ref
+from data.models import Task, Child  # noqa: F401 (модели жили здесь, импорт из core.game_engine работает)
+from data.row_mapping import TASK_ROWS, CHILD_ROWS
+from utils.cache import (cached_read_model, points_tag, tasks_tag, achievements_tag, tag_versions,
+                         on_task_completed, on_tasks_changed, on_points_changed, on_family_changed,
+                         FAMILY_TAG)
+
+class TaskStore:
+    """Задания в памяти с индексами: по id, по ребёнку и по (ребёнок, выполнено)
+    
+    Индексы обновляются при добавлении (add), выполнении (mark_completed)
+    и перезагрузке (replace), поэтому поиск задания и счётчики — O(1).
+    Порядок заданий — порядок добавления (как у прежнего списка).
+    
+    Выполненные задания, которых нет в памяти (их не загружают вместе с
+    открытыми), учитываются через set_completed_counts — счётчики из БД.
+    """
+    
+    def __init__(self, tasks: List[Task] = ()):
+        self.replace(tasks)
+    
+    def replace(self, tasks: List[Task]):
+        """Перезагрузка: заменить все задания"""
+        self._by_id: Dict[int, Task] = {}
+        self._by_child: Dict[int, Dict[int, Task]] = {}
+        self._by_status: Dict[tuple, Dict[int, Task]] = {}
+        self._completed_outside: Dict[int, int] = {}
+        for task in tasks:
+            self.add(task)
+    
+    def add(self, task: Task):
+        old = self._by_id.get(task.id)
+        if old is not None:
+            self._unindex(old)
+        self._by_id[task.id] = task
+        self._by_child.setdefault(task.child_id, {})[task.id] = task
+        self._by_status.setdefault((task.child_id, bool(task.completed)), {})[task.id] = task
+    
+    def _unindex(self, task: Task):
+        self._by_child.get(task.child_id, {}).pop(task.id, None)
+        self._by_status.get((task.child_id, bool(task.completed)), {}).pop(task.id, None)
+    
+    def get(self, task_id: int) -> Optional[Task]:
+        return self._by_id.get(task_id)
+    
+    def mark_completed(self, task: Task, photo_url: str = None) -> Task:
+        """Отметить задание выполненным: новая запись занимает место старой в индексах"""
+        done = replace(task, completed=True, completed_at=datetime.now(), photo_url=photo_url)
+        if task.id in self._by_id:
+            self.add(done)
+        return done
+    
+    def set_completed_counts(self, counts: Dict[int, int]):
+        """Сколько всего выполнено у каждого ребёнка по данным БД"""
+        self._completed_outside = {
+            child_id: max(count - len(self._by_status.get((child_id, True), ())), 0)
+            for child_id, count in counts.items()
+        }
+    
+    def for_child(self, child_id: int, completed: bool = None) -> List[Task]:
+        if completed is None:
+            return list(self._by_child.get(child_id, {}).values())
+        return list(self._by_status.get((child_id, completed), {}).values())
+    
+    def count(self, child_id: int = None, completed: bool = None) -> int:
+        """Число заданий (O(1) для одного ребёнка; без child_id — по всем детям)"""
+        if child_id is None:
+            child_ids = set(self._by_child) | set(self._completed_outside)
+            return sum(self.count(c, completed) for c in child_ids)
+        if completed is None:
+            in_memory = len(self._by_child.get(child_id, ()))
+        else:
+            in_memory = len(self._by_status.get((child_id, completed), ()))
+        if completed is False:
+            return in_memory
+        return in_memory + self._completed_outside.get(child_id, 0)
+    
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+    
+    def __len__(self):
+        return len(self._by_id)
 
-@dataclass
-class Task:
-    def __init__(self, id, title, description, category, points, difficulty, emoji, 
-                 photo_required, child_id, due_date=None, completed=False, 
-                 completed_at=None, photo_url=None, created_at=None):
-        self.id = id
-        self.title = title
-        self.description = description
-        self.category = category
-        self.points = points
-        self.difficulty = difficulty
-        self.emoji = emoji
-        self.photo_required = photo_required
-        self.child_id = child_id
-        self.due_date = due_date
-        self.completed = completed
-        self.completed_at = completed_at
-        self.photo_url = photo_url
-        self.created_at = created_at
 
+FAMILY_TTL = 60     # секунд: данные семьи из других процессов видны не позже чем через минуту
+RECENT_DAYS = 7     # за сколько дней держим выполненные задания
 
 @dataclass
-class Child:
-    def __init__(self, id, name, age, avatar, interests, points, level, streak_days, last_active, parent_id=None):
-        self.id = id
-        self.name = name
-        self.age = age
-        self.avatar = avatar
-        self.interests = interests if isinstance(interests, list) else []
-        self.points = points
-        self.level = level
-        self.streak_days = streak_days
-        self.last_active = last_active
-        self.parent_id = parent_id  # Добавлено поле для родителя
-        
+class FamilyData:
+    """Семья родителя, загруженная одним проходом (GameEngine.load_family_bulk)"""
+    parent_id: int
+    children: Dict[int, Child]
+    open_tasks: Dict[int, List[Task]]            # child_id -> невыполненные задания
+    recent_completions: Dict[int, List[Task]]    # child_id -> выполненные за RECENT_DAYS дней
+    completed_counts: Dict[int, int]             # child_id -> всего выполнено
+    achievements: Dict[int, List[Dict]]          # child_id -> разблокированные достижения
+    loaded_at: float
+    versions: tuple                              # версии тегов кэша на момент загрузки
+    
+    def tags(self) -> List[str]:
+        return [FAMILY_TAG] + [
+            tag for child_id in self.children
+            for tag in (points_tag(child_id), tasks_tag(child_id), achievements_tag(child_id))
+        ]
+    
+    def is_fresh(self) -> bool:
+        """Не устарели ли данные: TTL и сбросы кэша по тегам семьи (без запросов к БД)"""
+        return (time.monotonic() - self.loaded_at < FAMILY_TTL
+                and tag_versions(self.tags()) == self.versions)
+
+@dataclass
+class ChildSnapshot:
+    """Когда загружены запись ребёнка и первая страница его заданий (GameEngine.load_child_data)"""
+    child_id: int
+    loaded_at: float
+    versions: tuple                              # версии тегов кэша на момент загрузки
+    
+    def tags(self) -> List[str]:
+        return [points_tag(self.child_id), tasks_tag(self.child_id)]
+    
+    def is_fresh(self) -> bool:
+        """Не устарели ли данные: TTL и сбросы кэша по тегам ребёнка (без запросов к БД)"""
+        return (time.monotonic() - self.loaded_at < FAMILY_TTL
+                and tag_versions(self.tags()) == self.versions)
+
 class GameEngine:
     def __init__(self):
-        self.tasks: List[Task] = []
+        self.task_store = TaskStore()
         self.children: Dict[int, Child] = {}
         self.categories = {
             "creative": {"name": "Творчество", "emoji": "🎨"},
@@ -58,6 +149,17 @@ class GameEngine:
             "nature": {"name": "Природа", "emoji": "🌱"},
         }
         self.achievement_system = None
+        self.family: Optional[FamilyData] = None
+        self.child_snapshot: Optional[ChildSnapshot] = None
+    
+    @property
+    def tasks(self) -> List[Task]:
+        """Все задания в памяти (копия списка; изменять — через task_store)"""
+        return list(self.task_store)
+    
+    @tasks.setter
+    def tasks(self, tasks: List[Task]):
+        self.task_store.replace(tasks)
         
     def add_child(self, name: str, age: int, interests: List[str], parent_id: int = None) -> Child:
         """Добавить ребёнка (только в память)"""
@@ -66,7 +168,7 @@ class GameEngine:
             id=child_id,
             name=name,
             age=age,
-            avatar=f"https://api.dicebear.com/7.x/adventurer/svg?seed={name}",
+            avatar=avatar_ref(name),
             interests=interests,
             points=0,
             level=1,
@@ -79,19 +181,19 @@ class GameEngine:
     
     def create_task(self, **kwargs) -> Task:
         """Создать задание (только в память)"""
-        task_id = len(self.tasks) + 1
+        task_id = len(self.task_store) + 1
         task = Task(id=task_id, created_at=datetime.now(), **kwargs)
-        self.tasks.append(task)
+        self.task_store.add(task)
         return task
     
     def complete_task(self, task_id: int, child_id: int, photo_url: str = None) -> Dict:
         """Отметить задание выполненным (базовая версия)"""
         logger.info(f"✅ Task {task_id} completed by child {child_id}")
         
-        # Находим задание в памяти
-        task = next((t for t in self.tasks if t.id == task_id), None)
-        if not task:
-            logger.warning(f"Task {task_id} not found in memory")
+        # Находим задание в памяти (списки постраничные — иначе читаем из БД)
+        task = self.task_store.get(task_id) or self.load_task(task_id)
+        if not task or task.child_id != child_id:
+            logger.warning(f"Task {task_id} not found")
             return {'points': 0, 'new_achievements': []}
         
         if task.completed:
@@ -100,38 +202,33 @@ class GameEngine:
         
         # Обновляем в БД
         from data.database import get_connection
+        from data.points_ledger import record, TASK
         conn = get_connection()
         cursor = conn.cursor()
         
         try:
-            # Обновляем задание
+            # Обновляем задание (completed = 0: выполненное в другой вкладке второй раз не засчитается)
             cursor.execute('''
                 UPDATE tasks 
                 SET completed = 1, completed_at = ?, photo_url = ?
-                WHERE id = ? AND user_id = ?
+                WHERE id = ? AND user_id = ? AND completed = 0
             ''', (datetime.now().isoformat(), photo_url, task_id, child_id))
             
-            # Обновляем баллы ребёнка в таблице users
-            cursor.execute('''
-                UPDATE users 
-                SET points = points + ?, 
-                    level = ((points + ?) / 100) + 1,
-                    last_active = ?
-                WHERE id = ?
-            ''', (task.points, task.points, date.today().isoformat(), child_id))
+            # Начисляем баллы через журнал (он же обновляет users)
+            balance = record(cursor, child_id, task.points, TASK, task_id, active=True) if cursor.rowcount == 1 else None
+            if balance is None:
+                conn.rollback()
+                conn.close()
+                logger.warning(f"Task {task_id} already completed")
+                return {'points': 0, 'new_achievements': []}
             
             conn.commit()
+            on_task_completed(child_id)
             
             # Обновляем данные в памяти
-            task.completed = True
-            task.completed_at = datetime.now()
-            task.photo_url = photo_url
+            self.task_store.mark_completed(task, photo_url)
             
-            child = self.children.get(child_id)
-            if child:
-                child.points += task.points
-                child.level = self.calculate_level(child.points)
-                child.last_active = date.today()
+            self._set_points_in_memory(child_id, balance, active=True)
             
             conn.close()
             return {'points': task.points, 'new_achievements': []}
@@ -142,6 +239,25 @@ class GameEngine:
             conn.close()
             return {'points': 0, 'new_achievements': []}
     
+    def _set_points_in_memory(self, child_id: int, total: int, active: bool = False) -> Optional[Child]:
+        """Баланс ребёнка в памяти — как в БД после записи в журнал (Child неизменяем — заменяем запись)"""
+        child = self.children.get(child_id)
+        if not child:
+            return None
+        child = replace(child, points=total, level=self.calculate_level(total),
+                        last_active=date.today() if active else child.last_active)
+        self.children[child_id] = child
+        return child
+    
+    def purchase_reward(self, child_id: int, reward_id: int, request_key: str = None):
+        """Купить награду (core.rewards) и обновить баланс в памяти"""
+        from core.rewards import purchase_reward
+        
+        result = purchase_reward(child_id, reward_id, request_key)
+        if result.balance is not None:
+            self._set_points_in_memory(child_id, result.balance)
+        return result
+    
     def calculate_level(self, points: int) -> int:
         """Расчёт уровня на основе баллов"""
         return points // 100 + 1
@@ -164,18 +280,7 @@ class GameEngine:
         
         return incomplete_tasks
     
-    def _safe_json_loads(self, json_str):
-        """Безопасная загрузка JSON с обработкой ошибок"""
-        if not json_str:
-            return []
-        if isinstance(json_str, list):
-            return json_str
-        try:
-            return json.loads(json_str)
-        except (json.JSONDecodeError, TypeError):
-            # Если не удалось распарсить, возвращаем пустой список
-            return []
-    
+    @profiled('load_children_from_db')
     def load_children_from_db(self, parent_id: int = None):
         """Загрузить детей из БД (фильтр по родителю)"""
         from data.database import get_connection
@@ -195,26 +300,7 @@ class GameEngine:
                 # Загружаем всех детей (для обратной совместимости)
                 cursor.execute('SELECT * FROM users WHERE user_type = "child"')
             
-            self.children = {}
-            for row in cursor.fetchall():
-                child_data = dict(row)
-                # Безопасно преобразуем interests из JSON
-                child_data['interests'] = self._safe_json_loads(child_data.get('interests'))
-                
-                # Создаём объект Child
-                child = Child(
-                    id=child_data['id'],
-                    name=child_data['name'],
-                    age=child_data['age'],
-                    avatar=child_data.get('avatar', f"https://api.dicebear.com/7.x/adventurer/svg?seed={child_data['name']}"),
-                    interests=child_data['interests'],
-                    points=child_data.get('points', 0),
-                    level=child_data.get('level', 1),
-                    streak_days=child_data.get('streak_days', 0),
-                    last_active=datetime.fromisoformat(child_data['last_active']).date() if child_data.get('last_active') else date.today(),
-                    parent_id=parent_id
-                )
-                self.children[child.id] = child
+            self.children = {child.id: child for child in CHILD_ROWS.fetchall(cursor, parent_id=parent_id)}
             
         except sqlite3.Error as e:
             logger.error(f"Database error in load_children_from_db: {e}")
@@ -230,7 +316,7 @@ class GameEngine:
         
         try:
             interests_json = json.dumps(interests, ensure_ascii=False)
-            avatar = f"https://api.dicebear.com/7.x/adventurer/svg?seed={name}"
+            avatar = avatar_ref(name)
             last_active = date.today().isoformat()
             
             cursor.execute('''
@@ -248,6 +334,8 @@ class GameEngine:
                 ''', (parent_id, child_id))
             
             conn.commit()
+            if parent_id:
+                on_family_changed()
             
             # Создаём объект в памяти
             child = Child(
@@ -301,6 +389,7 @@ class GameEngine:
             
             task_id = cursor.lastrowid
             conn.commit()
+            on_tasks_changed(task_data['child_id'])
             
             # Обновляем список в памяти
             task = Task(
@@ -319,7 +408,7 @@ class GameEngine:
                 photo_url=None,
                 created_at=datetime.now()
             )
-            self.tasks.append(task)
+            self.task_store.add(task)
             
             return task_id
             
@@ -330,6 +419,27 @@ class GameEngine:
         finally:
             conn.close()
     
+    def load_task(self, task_id: int) -> Optional[Task]:
+        """Прочитать одно задание из БД и положить его в task_store"""
+        from data.database import get_connection
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('SELECT * FROM tasks WHERE id = ?', (task_id,))
+            task = TASK_ROWS.fetchone(cursor)
+            if task:
+                self.task_store.add(task)
+            return task
+            
+        except sqlite3.Error as e:
+            logger.error(f"Database error in load_task: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    @profiled('load_tasks_from_db')
     def load_tasks_from_db(self, child_id: int) -> List[Task]:
         """Загрузить задания ребёнка из БД"""
         from data.database import get_connection
@@ -344,26 +454,7 @@ class GameEngine:
                 WHERE user_id = ? AND completed = 0
                 ORDER BY created_at DESC
             ''', (child_id,))
-            
-            for row in cursor.fetchall():
-                task_data = dict(row)
-                task = Task(
-                    id=task_data['id'],
-                    title=task_data['title'],
-                    description=task_data['description'],
-                    category=task_data['category'],
-                    points=task_data['points'],
-                    difficulty=task_data['difficulty'],
-                    emoji=task_data['emoji'],
-                    photo_required=bool(task_data['photo_required']),
-                    child_id=task_data['user_id'],
-                    due_date=task_data.get('due_date'),
-                    completed=bool(task_data['completed']),
-                    completed_at=task_data.get('completed_at'),
-                    photo_url=task_data.get('photo_url'),
-                    created_at=datetime.fromisoformat(task_data['created_at']) if task_data['created_at'] else datetime.now()
-                )
-                tasks.append(task)
+            tasks = TASK_ROWS.fetchall(cursor)
             
         except sqlite3.Error as e:
             logger.error(f"Database error in load_tasks_from_db: {e}")
@@ -380,6 +471,7 @@ class GameEngine:
     def complete_task_with_achievements(self, task_id: int, child_id: int, photo_url: str = None) -> Dict:
         """Расширенная версия с проверкой достижений"""
         from data.database import get_connection
+        from data.points_ledger import record, ledger_balance, TASK
         
         conn = get_connection()
         cursor = conn.cursor()
@@ -394,53 +486,36 @@ class GameEngine:
             points = row['points']
             
             if points > 0:
-                # Обновляем задание
+                # Обновляем задание (completed = 0: второй раз не засчитается)
                 cursor.execute('''
                     UPDATE tasks 
                     SET completed = 1, completed_at = ?, photo_url = ?
-                    WHERE id = ?
-                ''', (datetime.now().isoformat(), photo_url, task_id))
+                    WHERE id = ? AND user_id = ? AND completed = 0
+                ''', (datetime.now().isoformat(), photo_url, task_id, child_id))
                 
-                # Обновляем баллы ребёнка
-                cursor.execute('''
-                    UPDATE users 
-                    SET points = points + ?, 
-                        level = ((points + ?) / 100) + 1,
-                        last_active = ?
-                    WHERE id = ?
-                ''', (points, points, date.today().isoformat(), child_id))
+                # Начисляем баллы через журнал
+                if cursor.rowcount != 1 or record(cursor, child_id, points, TASK, task_id, active=True) is None:
+                    conn.rollback()
+                    return {'points': 0, 'new_achievements': []}
                 
                 conn.commit()
                 
                 # Собираем статистику для проверки достижений
                 stats = self._collect_stats(child_id, conn)
                 
-                # Проверяем новые достижения
+                # Проверяем новые достижения (бонусные баллы начисляет AchievementSystem, тоже через журнал)
                 new_achievements = []
                 if self.achievement_system:
                     new_achievements = self.achievement_system.check_and_unlock(child_id, stats)
-                    
-                    # Добавляем бонусные баллы за достижения
-                    for ach in new_achievements:
-                        cursor.execute('''
-                            UPDATE users 
-                            SET points = points + ? 
-                            WHERE id = ?
-                        ''', (ach.get('reward_points', 0), child_id))
-                        conn.commit()
+                
+                on_task_completed(child_id)
                 
                 # Обновляем данные в памяти
-                task = next((t for t in self.tasks if t.id == task_id), None)
+                task = self.task_store.get(task_id)
                 if task:
-                    task.completed = True
-                    task.completed_at = datetime.now()
-                    task.photo_url = photo_url
+                    self.task_store.mark_completed(task, photo_url)
                 
-                child = self.children.get(child_id)
-                if child:
-                    child.points += points
-                    child.level = self.calculate_level(child.points)
-                    child.last_active = date.today()
+                self._set_points_in_memory(child_id, ledger_balance(cursor, child_id), active=True)
                 
                 return {
                     'points': points,
@@ -469,14 +544,14 @@ class GameEngine:
         try:
             # Общее количество выполненных заданий
             cursor.execute('''
-                SELECT COUNT(*) FROM tasks 
+                SELECT COUNT(*) FROM tasks_all
                 WHERE user_id = ? AND completed = 1
             ''', (child_id,))
             total_tasks = cursor.fetchone()[0] or 0
             
             # Задания по категориям
             cursor.execute('''
-                SELECT category, COUNT(*) FROM tasks 
+                SELECT category, COUNT(*) FROM tasks_all
                 WHERE user_id = ? AND completed = 1
                 GROUP BY category
             ''', (child_id,))
@@ -510,47 +585,53 @@ class GameEngine:
             if close_conn:
                 conn.close()
     
-    def load_child_data(self, child_id: int):
-        """Загрузить данные конкретного ребёнка"""
+    def load_child(self, child_id: int) -> Optional[Child]:
+        """Прочитать ребёнка из БД (без заданий и без изменения self.children)"""
         from data.database import get_connection
         
         conn = get_connection()
         cursor = conn.cursor()
         
         try:
-            # Загружаем данные ребёнка
             cursor.execute('''
                 SELECT id, name, age, avatar, interests, points, level, streak_days, last_active 
                 FROM users WHERE id = ? AND user_type = 'child'
             ''', (child_id,))
-            row = cursor.fetchone()
-            
-            if row:
-                child_data = dict(row)
-                # Безопасно преобразуем interests из JSON
-                child_data['interests'] = self._safe_json_loads(child_data.get('interests'))
-                
-                child = Child(
-                    id=child_data['id'],
-                    name=child_data['name'],
-                    age=child_data['age'],
-                    avatar=child_data.get('avatar', f"https://api.dicebear.com/7.x/adventurer/svg?seed={child_data['name']}"),
-                    interests=child_data['interests'],
-                    points=child_data.get('points', 0),
-                    level=child_data.get('level', 1),
-                    streak_days=child_data.get('streak_days', 0),
-                    last_active=datetime.fromisoformat(child_data['last_active']).date() if child_data.get('last_active') else date.today()
-                )
-                self.children = {child.id: child}
-                
-                # Загружаем задания ребёнка
-                self.tasks = self.load_tasks_from_db(child_id)
+            return CHILD_ROWS.fetchone(cursor)
             
         except sqlite3.Error as e:
-            logger.error(f"Database error in load_child_data: {e}")
+            logger.error(f"Database error in load_child: {e}")
+            return None
         finally:
             conn.close()
-
+    
+    @profiled('load_child_data')
+    def load_child_data(self, child_id: int, force: bool = False):
+        """Загрузить данные конкретного ребёнка
+        
+        Пока данные свежие (ChildSnapshot.is_fresh: баллы и задания ребёнка не
+        менялись, FAMILY_TTL не истёк), rerun-ы не обращаются к БД — как
+        load_family_bulk у родителя. Записи в памяти при этом уже актуальны:
+        пути записи обновляют их сами (_set_points_in_memory, task_store).
+        """
+        snapshot = self.child_snapshot
+        if (not force and snapshot and snapshot.child_id == child_id
+                and child_id in self.children and snapshot.is_fresh()):
+            return
+        
+        from data.task_pages import open_tasks_page
+        # Версии тегов фиксируем до чтения: запись, пришедшая во время загрузки, их устарит
+        snapshot = ChildSnapshot(child_id, time.monotonic(), ())
+        snapshot.versions = tag_versions(snapshot.tags())
+        child = self.load_child(child_id)
+        if child:
+            self.children = {child.id: child}
+            
+            # Первая страница заданий: остальные догружаются списком по кнопке «Показать ещё»
+            self.tasks = open_tasks_page(child_id).tasks
+            self.child_snapshot = snapshot
+    
+    @profiled('load_family_data')
     def load_family_data(self, parent_id: int):
         """Загрузить данные всей семьи для родителя"""
         from data.database import get_connection
@@ -566,51 +647,154 @@ class GameEngine:
                 WHERE fr.parent_id = ? AND u.user_type = 'child'
             ''', (parent_id,))
             
-            self.children = {}
-            for row in cursor.fetchall():
-                child_data = dict(row)
-                # Безопасно преобразуем interests из JSON
-                child_data['interests'] = self._safe_json_loads(child_data.get('interests'))
-                
-                child = Child(
-                    id=child_data['id'],
-                    name=child_data['name'],
-                    age=child_data['age'],
-                    avatar=child_data.get('avatar', f"https://api.dicebear.com/7.x/adventurer/svg?seed={child_data['name']}"),
-                    interests=child_data['interests'],
-                    points=child_data.get('points', 0),
-                    level=child_data.get('level', 1),
-                    streak_days=child_data.get('streak_days', 0),
-                    last_active=datetime.fromisoformat(child_data['last_active']).date() if child_data.get('last_active') else date.today(),
-                    parent_id=parent_id
-                )
-                self.children[child.id] = child
+            self.children = {child.id: child for child in CHILD_ROWS.fetchall(cursor, parent_id=parent_id)}
             
         except sqlite3.Error as e:
             logger.error(f"Database error in load_family_data: {e}")
         finally:
             conn.close()
     
+    @profiled('load_family_bulk')
+    def load_family_bulk(self, parent_id: int, force: bool = False) -> Optional[FamilyData]:
+        """Загрузить всю семью родителя одним проходом
+        
+        Дети, их невыполненные задания, выполненные за RECENT_DAYS дней, счётчики
+        выполненных и достижения — пять запросов с IN (...) на одном соединении,
+        сколько бы детей ни было. Пока данные свежие (FamilyData.is_fresh),
+        повторный вызов не обращается к БД. Переключение ребёнка — select_child.
+        """
+        if not force and self.family and self.family.parent_id == parent_id and self.family.is_fresh():
+            self.children = self.family.children
+            return self.family
+        
+        from data.database import get_connection
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute('''
+                SELECT u.* FROM users u
+                JOIN family_relations fr ON u.id = fr.child_id
+                WHERE fr.parent_id = ? AND u.user_type = 'child'
+                ORDER BY u.name
+            ''', (parent_id,))
+            children = {child.id: child for child in CHILD_ROWS.fetchall(cursor, parent_id=parent_id)}
+            
+            family = FamilyData(
+                parent_id=parent_id,
+                children=children,
+                open_tasks={child_id: [] for child_id in children},
+                recent_completions={child_id: [] for child_id in children},
+                completed_counts=dict.fromkeys(children, 0),
+                achievements={child_id: [] for child_id in children},
+                loaded_at=time.monotonic(),
+                versions=(),
+            )
+            # Версии тегов фиксируем до чтения заданий: запись, пришедшая во время загрузки, их устарит
+            family.versions = tag_versions(family.tags())
+            
+            if children:
+                ids = list(children)
+                placeholders = ",".join("?" * len(ids))
+                
+                cursor.execute(f'''
+                    SELECT * FROM tasks
+                    WHERE user_id IN ({placeholders}) AND completed = 0
+                    ORDER BY created_at DESC
+                ''', ids)
+                for task in TASK_ROWS.fetchall(cursor):
+                    family.open_tasks[task.child_id].append(task)
+                
+                since = (datetime.now() - timedelta(days=RECENT_DAYS)).isoformat()
+                cursor.execute(f'''
+                    SELECT * FROM tasks_all
+                    WHERE user_id IN ({placeholders}) AND completed = 1 AND completed_at >= ?
+                    ORDER BY completed_at DESC
+                ''', ids + [since])
+                for task in TASK_ROWS.fetchall(cursor):
+                    family.recent_completions[task.child_id].append(task)
+                
+                cursor.execute(f'''
+                    SELECT user_id, COUNT(*) FROM tasks_all
+                    WHERE user_id IN ({placeholders}) AND completed = 1
+                    GROUP BY user_id
+                ''', ids)
+                for child_id, count in cursor.fetchall():
+                    family.completed_counts[child_id] = count
+                
+                cursor.execute(f'''
+                    SELECT a.child_id, a.achievement_id, a.unlocked_at, d.name, d.description, d.emoji, d.reward_points
+                    FROM achievements a
+                    JOIN achievements_def d ON a.achievement_id = d.id
+                    WHERE a.child_id IN ({placeholders})
+                    ORDER BY a.unlocked_at DESC
+                ''', ids)
+                for row in cursor.fetchall():
+                    achievement = dict(row)
+                    family.achievements[achievement.pop('child_id')].append(achievement)
+            
+            self.family = family
+            self.children = family.children
+            return family
+            
+        except sqlite3.Error as e:
+            logger.error(f"Database error in load_family_bulk: {e}")
+            return None
+        finally:
+            conn.close()
+    
+    def select_child(self, child_id: int):
+        """Сделать ребёнка текущим: задания берутся из загруженной семьи, без запросов к БД"""
+        if self.family and child_id in self.family.children:
+            self.children = self.family.children
+            self.task_store.replace(self.family.open_tasks[child_id])
+            self.task_store.set_completed_counts(self.family.completed_counts)
+        else:
+            self.load_child_data(child_id)
+    
+    def completed_count(self, child_id: int = None) -> int:
+        """Сколько заданий выполнено: у ребёнка или (без child_id) у всей семьи"""
+        return self.task_store.count(child_id, completed=True)
+    
+    @cached_read_model(ttl=30, tags=lambda rows, child_id: [FAMILY_TAG] + [points_tag(r['id']) for r in rows])
+    def get_family_leaderboard(self, child_id: int) -> Optional[List[Dict]]:
+        """Турнирная таблица семьи ребёнка: он сам и дети его родителей (по убыванию баллов)"""
+        from data.database import get_connection
+        
+        conn = get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT u.id, u.name, u.points, u.level FROM users u
+                WHERE u.user_type = 'child' AND (u.id = ? OR u.id IN (
+                    SELECT sibling.child_id FROM family_relations own
+                    JOIN family_relations sibling ON sibling.parent_id = own.parent_id
+                    WHERE own.child_id = ?
+                ))
+                ORDER BY u.points DESC, u.name
+            ''', (child_id, child_id)).fetchall()
+            return [dict(row) for row in rows]
+        except sqlite3.Error as e:
+            logger.error(f"Database error in get_family_leaderboard: {e}")
+            return None
+        finally:
+            conn.close()
+    
     def update_child_points(self, child_id: int, points_to_add: int):
         """Обновить баллы ребёнка (используется из других модулей)"""
-        child = self.children.get(child_id)
-        if child:
-            child.points += points_to_add
-            child.level = self.calculate_level(child.points)
-            
-            # Обновляем в БД
-            from data.database import get_connection
-            conn = get_connection()
-            cursor = conn.cursor()
-            try:
-                cursor.execute('''
-                    UPDATE users 
-                    SET points = points + ?, level = ?
-                    WHERE id = ?
-                ''', (points_to_add, child.level, child_id))
-                conn.commit()
-            except sqlite3.Error as e:
-                logger.error(f"Database error in update_child_points: {e}")
-                conn.rollback()
-            finally:
-                conn.close()
\ No newline at end of file
+        from data.database import get_connection
+        from data.points_ledger import record, ADJUSTMENT
+        
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            balance = record(cursor, child_id, points_to_add, ADJUSTMENT)
+            conn.commit()
+            if balance is not None:
+                on_points_changed(child_id)
+                self._set_points_in_memory(child_id, balance)
+        except sqlite3.Error as e:
+            logger.error(f"Database error in update_child_points: {e}")
+            conn.rollback()
+        finally:
+            conn.close()
\ No newline at end of file
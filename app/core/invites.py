@@ -0,0 +1,251 @@
+"""
+Коды приглашений: без коллизий, с контрольным символом, срок — в эпохах
+
+Код выводится из id строки invitations взаимно однозначно:
+    id -> перестановка Фейстеля на 30 битах (ключ из app_settings)
+       -> 6 символов base32 Крокфорда + контрольный символ (Luhn mod 32)
+    FAM-7KQ2MXD
+Двух одинаковых кодов быть не может (разные id — разные коды), поэтому
+не нужно ни угадывать свободный код, ни ловить нарушение UNIQUE.
+Перестановка прячет порядок: соседние id дают непохожие коды.
+
+parse_code() без БД отбрасывает опечатки (контрольный символ ловит
+любую замену одного символа и почти любую перестановку соседних) и
+возвращает id, так что проверка кода — поиск по первичному ключу.
+O/I/L читаются как 0/1/1, регистр, пробелы и дефисы не важны. Старые
+случайные коды FAM-XXXXXX ищутся по invite_code, пока не истекут.
+
+Срок действия хранится целым числом (expires_epoch, секунды UTC) с
+индексом (status, expires_epoch): сравнение не зависит от формата дат.
+Фоновый чистильщик (start_invite_sweeper) пачками помечает просроченные
+приглашения 'expired' и удаляет просроченные дольше INVITE_RETENTION_DAYS.
+FQ_INVITE_SWEEP=0 — не запускать.
+"""
+import hashlib
+import hmac
+import os
+import re
+import secrets
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from data.database import get_connection, get_app_secret
+from utils.logger import logger
+
+INVITE_PREFIX = "FAM-"
+INVITE_TTL_DAYS = 7
+INVITE_RETENTION_DAYS = 30          # Сколько хранить просроченные приглашения
+INVITE_SWEEP_ENABLED = os.getenv("FQ_INVITE_SWEEP", "1") == "1"
+INVITE_SWEEP_BATCH = 500
+INVITE_SWEEP_INTERVAL = 3600        # Секунд между прогонами чистильщика
+SECRET_KEY = "invite_code_secret"
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"   # base32 Крокфорда (без I, L, O, U)
+_VALUES = {char: value for value, char in enumerate(ALPHABET)}
+_VALUES.update({'O': 0, 'I': 1, 'L': 1})
+PAYLOAD_CHARS = 6
+_HALF_BITS = PAYLOAD_CHARS * 5 // 2
+_HALF_MASK = (1 << _HALF_BITS) - 1
+MAX_INVITE_ID = (1 << (PAYLOAD_CHARS * 5)) - 1
+_ROUNDS = 4
+_LEGACY_CODE = re.compile(r"^FAM-[A-Z0-9]{6}$")
+
+_key: Optional[bytes] = None
+_key_lock = threading.Lock()
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def _secret() -> bytes:
+    global _key
+    if _key is None:
+        with _key_lock:
+            if _key is None:
+                _key = get_app_secret(SECRET_KEY)
+    return _key
+
+def _round(value: int, index: int) -> int:
+    digest = hmac.new(_secret(), bytes([index]) + value.to_bytes(4, 'big'), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], 'big') & _HALF_MASK
+
+def _permute(value: int) -> int:
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for index in range(_ROUNDS):
+        left, right = right, left ^ _round(right, index)
+    return (left << _HALF_BITS) | right
+
+def _unpermute(value: int) -> int:
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for index in reversed(range(_ROUNDS)):
+        left, right = right ^ _round(left, index), left
+    return (left << _HALF_BITS) | right
+
+
+def _check_char(values) -> str:
+    """Контрольный символ Luhn mod 32"""
+    total, factor = 0, 2
+    for value in reversed(values):
+        addend = factor * value
+        total += addend // 32 + addend % 32
+        factor = 1 if factor == 2 else 2
+    return ALPHABET[(32 - total % 32) % 32]
+
+def encode_invite_id(invite_id: int) -> str:
+    """Код приглашения для id строки invitations"""
+    if not 0 < invite_id <= MAX_INVITE_ID:
+        raise ValueError(f"id приглашения вне диапазона кодов: {invite_id}")
+    value = _permute(invite_id)
+    values = [(value >> (5 * shift)) & 31 for shift in reversed(range(PAYLOAD_CHARS))]
+    payload = "".join(ALPHABET[v] for v in values)
+    return f"{INVITE_PREFIX}{payload}{_check_char(values)}"
+
+def parse_code(code: str) -> Optional[int]:
+    """id приглашения по коду или None (опечатка, чужой формат) — без БД"""
+    if not code:
+        return None
+    text = re.sub(r"[\s-]", "", code.upper())
+    if text.startswith("FAM"):
+        text = text[3:]
+    if len(text) != PAYLOAD_CHARS + 1:
+        return None
+    try:
+        values = [_VALUES[char] for char in text]
+    except KeyError:
+        return None
+    if _check_char(values[:-1]) != ALPHABET[values[-1]]:
+        return None
+    value = 0
+    for v in values[:-1]:
+        value = (value << 5) | v
+    return _unpermute(value)
+
+
+def _expiry(ttl_days: int) -> Tuple[str, int]:
+    expires = datetime.now() + timedelta(days=ttl_days)
+    return expires.isoformat(), int(expires.timestamp())
+
+def create_invite(parent_id: int, child_name: str = None, ttl_days: int = INVITE_TTL_DAYS) -> str:
+    """Новое приглашение родителя; возвращает код"""
+    expires_at, expires_epoch = _expiry(ttl_days)
+    _secret()   # Ключ создаётся отдельной записью — до нашей транзакции, иначе она его заблокирует
+    conn = get_connection()
+    try:
+        # Код зависит от id: вставляем с временным уникальным значением и сразу заменяем
+        cursor = conn.execute('''
+            INSERT INTO invitations (parent_id, invite_code, child_name, expires_at, expires_epoch)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (parent_id, f"pending-{secrets.token_hex(8)}", child_name, expires_at, expires_epoch))
+        code = encode_invite_id(cursor.lastrowid)
+        conn.execute("UPDATE invitations SET invite_code = ? WHERE id = ?", (code, cursor.lastrowid))
+        conn.commit()
+        return code
+    except (sqlite3.Error, ValueError):
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+def _find_pending(cursor, code: str) -> Optional[Dict]:
+    invite_id = parse_code(code)
+    now = int(time.time())
+    if invite_id is not None:
+        cursor.execute('''
+            SELECT * FROM invitations WHERE id = ? AND status = 'pending' AND expires_epoch > ?
+        ''', (invite_id, now))
+        row = cursor.fetchone()
+        # Сверяем сам код: защита от кода, выпущенного с другим ключом
+        return dict(row) if row and row['invite_code'] == encode_invite_id(invite_id) else None
+    code = (code or "").strip().upper()
+    if _LEGACY_CODE.match(code):
+        cursor.execute('''
+            SELECT * FROM invitations WHERE invite_code = ? AND status = 'pending' AND expires_epoch > ?
+        ''', (code, now))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+    return None
+
+def get_invite(code: str) -> Optional[Dict]:
+    """Действующее приглашение по коду (опечатки отсекаются без запроса к БД)"""
+    if parse_code(code) is None and not _LEGACY_CODE.match((code or "").strip().upper()):
+        return None
+    conn = get_connection()
+    try:
+        return _find_pending(conn.cursor(), code)
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_invite: {e}")
+        return None
+    finally:
+        conn.close()
+
+def claim_invite(cursor, code: str) -> Optional[Dict]:
+    """Отметить приглашение использованным в транзакции вызывающего
+    
+    Условный UPDATE: из двух одновременных попыток код примет только одна.
+    """
+    invite = _find_pending(cursor, code)
+    if not invite:
+        return None
+    cursor.execute('''
+        UPDATE invitations SET status = 'used'
+        WHERE id = ? AND status = 'pending' AND expires_epoch > ?
+    ''', (invite['id'], int(time.time())))
+    return invite if cursor.rowcount == 1 else None
+
+
+def _in_batches(conn, sql: str, before: int, batch_size: int) -> int:
+    """Выполнять запрос пачками (каждая — короткая транзакция), пока есть строки"""
+    total = 0
+    while True:
+        count = conn.execute(sql, (before, batch_size)).rowcount
+        conn.commit()
+        total += count
+        if count < batch_size:
+            return total
+
+def sweep_invitations(batch_size: int = INVITE_SWEEP_BATCH,
+                      retention_days: int = INVITE_RETENTION_DAYS) -> Tuple[int, int]:
+    """Пометить просроченные и удалить давно просроченные; (помечено, удалено)"""
+    now = int(time.time())
+    expired = purged = 0
+    conn = get_connection()
+    try:
+        expired = _in_batches(conn, '''
+            UPDATE invitations SET status = 'expired' WHERE id IN (
+                SELECT id FROM invitations WHERE status = 'pending' AND expires_epoch <= ? LIMIT ?
+            )
+        ''', now, batch_size)
+        purged = _in_batches(conn, '''
+            DELETE FROM invitations WHERE id IN (
+                SELECT id FROM invitations WHERE status = 'expired' AND expires_epoch <= ? LIMIT ?
+            )
+        ''', now - retention_days * 24 * 3600, batch_size)
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"Database error in sweep_invitations: {e}")
+    finally:
+        conn.close()
+    
+    if expired or purged:
+        logger.info(f"✉️ Приглашения: просрочено {expired}, удалено {purged}")
+    return expired, purged
+
+def _sweeper_loop():
+    while True:
+        sweep_invitations()
+        time.sleep(INVITE_SWEEP_INTERVAL)
+
+def start_invite_sweeper() -> bool:
+    """Запустить фоновую чистку приглашений (один поток на процесс)"""
+    global _sweeper
+    if not INVITE_SWEEP_ENABLED:
+        return False
+    if _sweeper is None:
+        with _sweeper_lock:
+            if _sweeper is None:
+                _sweeper = threading.Thread(target=_sweeper_loop, name="fq-invite-sweeper", daemon=True)
+                _sweeper.start()
+    return True
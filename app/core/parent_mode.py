@@ -6,40 +6,17 @@ from datetime import datetime, timedelta
 import sqlite3
 import hashlib
 from ui.components import safe_rerun
+from utils.profiler import profiled
 
 class ParentMode:
     def __init__(self, db_path):
         """Инициализация с путём к БД вместо соединения"""
-        self.db_path = db_path
-        self._init_settings()
+        self.db_path = db_path  # Таблицу app_settings и PIN по умолчанию создаёт data.bootstrap
     
     def _get_connection(self):
         """Создать новое соединение с БД для текущего потока"""
-        conn = sqlite3.connect(self.db_path)
-        return conn
-    
-    def _init_settings(self):
-        """Инициализация настроек"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # Создаём таблицу если нет
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS app_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Добавляем PIN по умолчанию
-        cursor.execute('''
-            INSERT OR IGNORE INTO app_settings (key, value)
-            VALUES ('parent_pin', '1234')
-        ''')
-        
-        conn.commit()
-        conn.close()
+        from data.database import get_connection
+        return get_connection()
     
     def check_pin(self, pin: str) -> bool:
         """Проверка PIN-кода"""
@@ -118,6 +95,7 @@ def render_parent_login():
                 else:
                     st.error("❌ Неверный PIN-код")
 
+@profiled('render_parent_panel')
 def render_parent_panel(engine, parent_mode):
     """Рендеринг панели родителя"""
     st.markdown("""
@@ -149,8 +127,7 @@ def render_parent_panel(engine, parent_mode):
                     st.metric("Уровень", child.level)
                 with col2:
                     st.metric("Дней подряд", child.streak_days)
-                    st.metric("Заданий выполнено", 
-                             len([t for t in engine.tasks if hasattr(t, 'child_id') and t.child_id == child.id and t.completed]))
+                    st.metric("Заданий выполнено", engine.completed_count(child.id))
                 
                 if st.button(f"🔄 Сбросить прогресс {child.name}", key=f"reset_{child.id}"):
                     if st.session_state.get(f"confirm_reset_{child.id}", False):
@@ -206,7 +183,7 @@ def render_parent_panel(engine, parent_mode):
         st.info("📊 Скоро здесь появится график активности")
         
         # Общая статистика
-        total_tasks = sum(1 for t in engine.tasks if hasattr(t, 'completed') and t.completed)
+        total_tasks = engine.completed_count()
         total_points = sum(c.points for c in engine.children.values())
         
         col1, col2, col3 = st.columns(3)
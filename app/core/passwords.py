@@ -0,0 +1,173 @@
+"""
+Хеширование паролей: настраиваемый KDF, соль на пользователя, перехеширование
+
+Хеш хранится одной строкой вместе с алгоритмом, параметрами и солью:
+    scrypt$N$r$p$<соль>$<хеш>
+    pbkdf2_sha256$<итерации>$<соль>$<хеш>
+(соль и хеш — base64). Старые хеши (sha256 без соли, 64 hex-символа)
+тоже проверяются, но needs_rehash() для них истинно: при успешном входе
+AuthSystem.login перезаписывает хеш текущим KDF. То же происходит, если
+сменились алгоритм или стоимость (FQ_PASSWORD_KDF, FQ_SCRYPT_*,
+FQ_PBKDF2_ITERATIONS).
+
+KDF — дорогая по CPU (и для scrypt — по памяти) операция. Она выполняется
+в небольшом пуле потоков (FQ_PASSWORD_WORKERS): hashlib отпускает GIL,
+так что остальные сессии не стоят, а пачка одновременных входов не
+запускает десятки scrypt разом — лишние ждут в очереди пула.
+
+Успешные проверки запоминаются на VERIFY_CACHE_TTL секунд (повторный вход
+после переподключения не считает KDF заново). В кэше нет ни паролей, ни
+хешей: ключ — HMAC от (хеш из БД, пароль) на случайном ключе процесса,
+он живёт только в памяти. Смена пароля меняет хеш, а значит, и ключ.
+
+Бенчмарк входов в секунду: benchmarks/password_logins.py
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+PASSWORD_KDF = os.getenv("FQ_PASSWORD_KDF", "scrypt")
+# scrypt: N=2^14, r=8, p=5 — вариант OWASP с небольшой памятью (16 МБ на хеш)
+SCRYPT_N = int(os.getenv("FQ_SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = int(os.getenv("FQ_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("FQ_SCRYPT_P", "5"))
+PBKDF2_ITERATIONS = int(os.getenv("FQ_PBKDF2_ITERATIONS", "600000"))
+SALT_BYTES = 16
+KEY_BYTES = 32
+PASSWORD_WORKERS = int(os.getenv("FQ_PASSWORD_WORKERS", "2"))
+VERIFY_CACHE_TTL = 300
+VERIFY_CACHE_SIZE = 1024
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+_verified: "OrderedDict[bytes, float]" = OrderedDict()
+_verified_lock = threading.Lock()
+_cache_key = secrets.token_bytes(32)
+
+_dummy_hash: Optional[str] = None
+
+
+def _b64(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text.encode('ascii'))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem с запасом: по умолчанию OpenSSL разрешает только 32 МБ
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p,
+                          maxmem=256 * r * (n + p + 2), dklen=KEY_BYTES)
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations, dklen=KEY_BYTES)
+
+def _is_legacy(stored: str) -> bool:
+    """Старый формат: sha256(password) без соли"""
+    return len(stored) == 64 and all(c in "0123456789abcdef" for c in stored)
+
+
+def _hash(password: str) -> str:
+    salt = secrets.token_bytes(SALT_BYTES)
+    if PASSWORD_KDF == "pbkdf2_sha256":
+        key = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return f"pbkdf2_sha256${PBKDF2_ITERATIONS}${_b64(salt)}${_b64(key)}"
+    if PASSWORD_KDF != "scrypt":
+        raise ValueError(f"Неизвестный KDF паролей: {PASSWORD_KDF}")
+    key = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+    return f"scrypt${SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64(salt)}${_b64(key)}"
+
+def _verify(password: str, stored: str) -> bool:
+    if _is_legacy(stored):
+        return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+    try:
+        algorithm, *params = stored.split("$")
+        if algorithm == "scrypt":
+            n, r, p, salt, key = params
+            computed = _scrypt(password, _unb64(salt), int(n), int(r), int(p))
+        elif algorithm == "pbkdf2_sha256":
+            iterations, salt, key = params
+            computed = _pbkdf2(password, _unb64(salt), int(iterations))
+        else:
+            return False
+        return hmac.compare_digest(computed, _unb64(key))
+    except (ValueError, TypeError):
+        return False  # Повреждённый или неизвестный формат (например, 'temporary_hash')
+
+
+def get_password_executor() -> ThreadPoolExecutor:
+    """Пул потоков для KDF (создаётся при первом обращении)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_WORKERS, thread_name_prefix="fq-kdf")
+    return _executor
+
+def hash_password(password: str) -> str:
+    """Хеш пароля текущим KDF со случайной солью (считается в пуле KDF)"""
+    return get_password_executor().submit(_hash, password).result()
+
+
+def _cache_token(password: str, stored: str) -> bytes:
+    return hmac.new(_cache_key, f"{stored}\0{password}".encode('utf-8'), hashlib.sha256).digest()
+
+def _cached(token: bytes) -> bool:
+    with _verified_lock:
+        expires = _verified.get(token)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del _verified[token]
+            return False
+        _verified.move_to_end(token)
+        return True
+
+def _remember(token: bytes):
+    with _verified_lock:
+        _verified[token] = time.monotonic() + VERIFY_CACHE_TTL
+        _verified.move_to_end(token)
+        while len(_verified) > VERIFY_CACHE_SIZE:
+            _verified.popitem(last=False)
+
+def verify_password(password: str, stored: Optional[str]) -> bool:
+    """Совпадает ли пароль с хешем из БД (любого поддерживаемого формата)"""
+    if not stored:
+        return False
+    token = _cache_token(password, stored)
+    if _cached(token):
+        return True
+    ok = get_password_executor().submit(_verify, password, stored).result()
+    if ok:
+        _remember(token)
+    return ok
+
+def verify_dummy(password: str):
+    """Проверка против заведомо чужого хеша: вход с неизвестным логином длится столько же"""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = hash_password(secrets.token_hex(16))
+    verify_password(password, _dummy_hash)
+
+def needs_rehash(stored: str) -> bool:
+    """Хеш старого формата, другого KDF или с другой стоимостью"""
+    if not stored or _is_legacy(stored):
+        return True
+    algorithm, *params = stored.split("$")
+    if algorithm != PASSWORD_KDF:
+        return True
+    if algorithm == "scrypt":
+        return params[:3] != [str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    return params[:1] != [str(PBKDF2_ITERATIONS)]
+
+def clear_verify_cache():
+    with _verified_lock:
+        _verified.clear()
@@ -0,0 +1,163 @@
+"""
+Магазин наград: каталог, атомарная покупка, история покупок
+
+Каталог — таблица rewards: общие награды (parent_id IS NULL, заполняются
+миграцией из DEFAULT_REWARDS) и награды, которые завели родители ребёнка.
+
+Покупка (purchase_reward) — одна короткая транзакция BEGIN IMMEDIATE:
+    UPDATE users SET points = points - cost WHERE id = ? AND points >= cost
+(проверка баланса и списание — один оператор, data.points_ledger.debit),
+строка в points_ledger и строка в rewards_history. Если баллов не хватает,
+UPDATE не затрагивает ни одной строки и ничего не записывается, так что
+одновременные нажатия (две вкладки, два устройства) не потратят больше,
+чем есть. Повтор того же нажатия (тот же request_key) второй раз не
+списывает — возвращается результат первой покупки.
+
+Стресс-тест одновременных покупок: benchmarks/rewards_concurrency.py
+"""
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from core.points_system import Reward, RewardType
+from data.database import get_connection
+from data.points_ledger import PURCHASE, debit, find_entry
+from utils.cache import cached_read_model, points_tag, on_points_changed, on_rewards_changed, REWARDS_TAG, FAMILY_TAG
+from utils.logger import logger
+
+# Общий каталог (пишется в rewards при создании таблицы)
+DEFAULT_REWARDS = [
+    {"name": "30 мин в YouTube", "cost": 50, "emoji": "📱", "type": RewardType.SCREEN_TIME, "quantity": 30},
+    {"name": "Мороженое", "cost": 30, "emoji": "🍦", "type": RewardType.REAL_REWARD, "quantity": 1},
+    {"name": "Поход в кино", "cost": 200, "emoji": "🎬", "type": RewardType.REAL_REWARD, "quantity": 1},
+    {"name": "Новая игра", "cost": 500, "emoji": "🎮", "type": RewardType.REAL_REWARD, "quantity": 1},
+]
+
+
+@dataclass(frozen=True)
+class PurchaseResult:
+    status: str                     # 'ok', 'duplicate', 'insufficient', 'unavailable', 'error'
+    reward: Optional[Reward] = None
+    balance: Optional[int] = None   # Баланс после покупки
+    
+    @property
+    def ok(self) -> bool:
+        return self.status in ('ok', 'duplicate')
+
+
+def seed_default_rewards(cursor):
+    """Записать общий каталог (вызывается из миграции в data.bootstrap)"""
+    cursor.executemany('''
+        INSERT INTO rewards (parent_id, name, type, cost, description, emoji, quantity)
+        VALUES (NULL, ?, ?, ?, '', ?, ?)
+    ''', [(r['name'], r['type'].value, r['cost'], r['emoji'], r['quantity']) for r in DEFAULT_REWARDS])
+
+def _to_reward(row) -> Reward:
+    try:
+        reward_type = RewardType(row['type'])
+    except ValueError:
+        reward_type = RewardType.REAL_REWARD
+    return Reward(id=row['id'], name=row['name'], type=reward_type, cost=row['cost'],
+                  description=row['description'] or "", emoji=row['emoji'] or "🎁",
+                  quantity=row['quantity'] or 1)
+
+
+@cached_read_model(ttl=300, tags=lambda rewards, child_id: [REWARDS_TAG, FAMILY_TAG])
+def get_catalog(child_id: int) -> Optional[List[Reward]]:
+    """Награды, доступные ребёнку: общий каталог и награды его родителей (по цене)"""
+    conn = get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT * FROM rewards
+            WHERE active = 1 AND (parent_id IS NULL OR parent_id IN (
+                SELECT parent_id FROM family_relations WHERE child_id = ?
+            ))
+            ORDER BY cost, id
+        ''', (child_id,)).fetchall()
+        return [_to_reward(row) for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_catalog: {e}")
+        return None
+    finally:
+        conn.close()
+
+def add_reward(parent_id: int, name: str, cost: int, emoji: str = "🎁", description: str = "",
+               reward_type: RewardType = RewardType.REAL_REWARD, quantity: int = 1) -> Optional[int]:
+    """Родитель добавляет награду в каталог своих детей; возвращает id"""
+    conn = get_connection()
+    try:
+        cursor = conn.execute('''
+            INSERT INTO rewards (parent_id, name, type, cost, description, emoji, quantity)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (parent_id, name, reward_type.value, cost, description, emoji, quantity))
+        conn.commit()
+        on_rewards_changed()
+        return cursor.lastrowid
+    except sqlite3.Error as e:
+        logger.error(f"Database error in add_reward: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def purchase_reward(child_id: int, reward_id: int, request_key: str = None) -> PurchaseResult:
+    """Купить награду: списать баллы и записать покупку одной транзакцией"""
+    conn = get_connection()
+    try:
+        # IMMEDIATE: блокировка записи сразу, покупки одного ребёнка идут по очереди
+        conn.execute("BEGIN IMMEDIATE")
+        cursor = conn.cursor()
+        # Те же условия, что у каталога: чужую награду по id не купить
+        row = cursor.execute('''
+            SELECT * FROM rewards
+            WHERE id = ? AND active = 1 AND (parent_id IS NULL OR parent_id IN (
+                SELECT parent_id FROM family_relations WHERE child_id = ?
+            ))
+        ''', (reward_id, child_id)).fetchone()
+        reward = _to_reward(row) if row else None
+        
+        if request_key:
+            entry = find_entry(cursor, request_key)
+            if entry:
+                conn.rollback()
+                return PurchaseResult('duplicate', reward, entry['balance_after'])
+        if reward is None:
+            conn.rollback()
+            return PurchaseResult('unavailable')
+        
+        balance = debit(cursor, child_id, reward.cost, PURCHASE, reward.id, request_key)
+        if balance is None:
+            conn.rollback()
+            return PurchaseResult('insufficient', reward)
+        cursor.execute('''
+            INSERT INTO rewards_history (child_id, reward_id, reward_name, points_spent)
+            VALUES (?, ?, ?, ?)
+        ''', (child_id, reward.id, reward.name, reward.cost))
+        conn.commit()
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"Database error in purchase_reward: {e}")
+        return PurchaseResult('error')
+    finally:
+        conn.close()
+    
+    on_points_changed(child_id)
+    logger.info(f"🎁 Child {child_id} bought reward {reward.id} for {reward.cost} points")
+    return PurchaseResult('ok', reward, balance)
+
+
+@cached_read_model(ttl=300, tags=lambda rows, child_id, limit=10: [points_tag(child_id)])
+def get_purchases(child_id: int, limit: int = 10) -> Optional[List[Dict]]:
+    """Последние покупки ребёнка"""
+    conn = get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT id, reward_id, reward_name, points_spent, created_at FROM rewards_history
+            WHERE child_id = ? ORDER BY id DESC LIMIT ?
+        ''', (child_id, limit)).fetchall()
+        return [dict(row) for row in rows]
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_purchases: {e}")
+        return None
+    finally:
+        conn.close()
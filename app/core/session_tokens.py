@@ -0,0 +1,207 @@
+"""
+Подписанные токены сессии: вход переживает перезагрузку страницы
+
+Токен — base64url(JSON-полезная нагрузка) + "." + HMAC-SHA256 подписи:
+    [id пользователя, тип, версия сессий, выдан, истекает, id токена]
+Проверка (validate_token) — только в памяти: подпись, срок и список
+отзыва. Ни users, ни пароль для неё не нужны.
+
+Отзыв:
+    revoke_token(token)          — выход: отзывается один токен;
+    revoke_user_sessions(user)   — «выйти везде» (например, после смены
+                                   пароля): users.session_version растёт, и
+                                   все токены с меньшей версией недействительны.
+Список отзыва живёт в памяти процесса и пишется в session_revocations;
+записи других процессов подтягиваются не чаще раза в REVOCATION_SYNC
+секунд (один запрос по первичному ключу, только новые строки). Записи
+старше срока жизни токенов удаляются — отозванный токен уже истёк сам.
+
+Ключ подписи — FQ_SESSION_SECRET или случайный ключ, созданный один раз
+и сохранённый в app_settings (общий для процессов и перезапусков).
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+from data.database import get_connection, get_app_secret
+from utils.logger import logger
+
+SESSION_TTL = int(os.getenv("FQ_SESSION_TTL", str(7 * 24 * 3600)))   # Секунд
+RENEW_AFTER = SESSION_TTL // 2      # Токен старше — перевыпускается при восстановлении сессии
+REVOCATION_SYNC = 15                # Секунд между подтягиванием отзывов других процессов
+SECRET_KEY = "session_secret"
+
+
+@dataclass(frozen=True)
+class SessionClaims:
+    user_id: int
+    user_type: str
+    version: int
+    issued_at: int
+    expires_at: int
+    token_id: str
+    
+    def needs_renewal(self, now: float = None) -> bool:
+        return (now or time.time()) - self.issued_at >= RENEW_AFTER
+
+
+_secret: Optional[bytes] = None
+_secret_lock = threading.Lock()
+
+
+def _signing_key() -> bytes:
+    """Ключ подписи (читается из окружения или app_settings один раз на процесс)"""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                _secret = _load_secret()
+    return _secret
+
+def _load_secret() -> bytes:
+    configured = os.getenv("FQ_SESSION_SECRET")
+    if configured:
+        return configured.encode('utf-8')
+    return get_app_secret(SECRET_KEY)
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode('ascii').rstrip('=')
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def _sign(payload: str) -> str:
+    return _b64(hmac.new(_signing_key(), payload.encode('ascii'), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, user_type: str, version: int = 0) -> str:
+    """Новый токен сессии пользователя"""
+    now = int(time.time())
+    payload = _b64(json.dumps([user_id, user_type, version or 0, now, now + SESSION_TTL,
+                               secrets.token_hex(8)], separators=(',', ':')).encode('utf-8'))
+    return f"{payload}.{_sign(payload)}"
+
+def decode_token(token: str) -> Optional[SessionClaims]:
+    """Поля токена, если подпись верна (срок и отзыв не проверяются)"""
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(signature, _sign(payload)):
+            return None
+        return SessionClaims(*json.loads(_unb64(payload)))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+def validate_token(token: Optional[str]) -> Optional[SessionClaims]:
+    """Поля действующего токена или None (подделан, истёк или отозван)"""
+    if not token:
+        return None
+    claims = decode_token(token)
+    if claims is None:
+        logger.warning("Токен сессии с неверной подписью")
+        return None
+    if claims.expires_at <= time.time():
+        return None
+    if _revocations.is_revoked(claims):
+        return None
+    return claims
+
+
+class RevocationList:
+    """Отозванные токены и минимальные версии сессий пользователей (в памяти)"""
+    
+    def __init__(self):
+        self._tokens: Dict[str, int] = {}        # id токена -> когда истекает
+        self._min_versions: Dict[int, int] = {}  # пользователь -> минимальная действующая версия
+        self._synced_id = 0
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+    
+    def is_revoked(self, claims: SessionClaims) -> bool:
+        self._sync()
+        return (claims.token_id in self._tokens
+                or claims.version < self._min_versions.get(claims.user_id, 0))
+    
+    def _apply(self, user_id: int, token_id: Optional[str], min_version: Optional[int], expires_at: int):
+        if token_id:
+            self._tokens[token_id] = expires_at
+        if min_version is not None:
+            self._min_versions[user_id] = max(self._min_versions.get(user_id, 0), min_version)
+    
+    def add(self, user_id: int, token_id: str = None, min_version: int = None):
+        """Отозвать (сразу в памяти этого процесса и в БД — для остальных)"""
+        expires_at = int(time.time()) + SESSION_TTL
+        with self._lock:
+            self._apply(user_id, token_id, min_version, expires_at)
+        conn = get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO session_revocations (user_id, token_id, min_version, expires_epoch)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, token_id, min_version, expires_at))
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Database error in RevocationList.add: {e}")
+        finally:
+            conn.close()
+    
+    def _sync(self, force: bool = False):
+        """Подтянуть отзывы других процессов и выбросить истёкшие"""
+        now = time.time()
+        if not force and now - self._synced_at < REVOCATION_SYNC:
+            return
+        with self._lock:
+            if not force and now - self._synced_at < REVOCATION_SYNC:
+                return
+            self._synced_at = now
+            conn = get_connection()
+            try:
+                rows = conn.execute('''
+                    SELECT id, user_id, token_id, min_version, expires_epoch FROM session_revocations
+                    WHERE id > ? ORDER BY id
+                ''', (self._synced_id,)).fetchall()
+                for row_id, user_id, token_id, min_version, expires_at in rows:
+                    self._apply(user_id, token_id, min_version, expires_at)
+                    self._synced_id = row_id
+                conn.execute("DELETE FROM session_revocations WHERE expires_epoch <= ?", (int(now),))
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Database error in RevocationList._sync: {e}")
+            finally:
+                conn.close()
+            self._tokens = {token_id: expires for token_id, expires in self._tokens.items() if expires > now}
+
+
+_revocations = RevocationList()
+
+
+def revoke_token(token: str):
+    """Выход: токен больше не восстанавливает сессию"""
+    claims = decode_token(token) if token else None
+    if claims:
+        _revocations.add(claims.user_id, token_id=claims.token_id)
+
+def revoke_user_sessions(user_id: int) -> Optional[int]:
+    """Отозвать все токены пользователя; возвращает новую версию сессий"""
+    conn = get_connection()
+    try:
+        conn.execute("UPDATE users SET session_version = COALESCE(session_version, 0) + 1 WHERE id = ?", (user_id,))
+        row = conn.execute("SELECT session_version FROM users WHERE id = ?", (user_id,)).fetchone()
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Database error in revoke_user_sessions: {e}")
+        return None
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    _revocations.add(user_id, min_version=row[0])
+    return row[0]
@@ -0,0 +1,138 @@
+"""
+Архивирование выполненных заданий
+
+В tasks остаются открытые задания и недавняя история: выполненные задания
+старше ARCHIVE_AFTER_DAYS дней переносятся в tasks_archive (та же схема,
+id сохраняется). Запросы к открытым заданиям (completed = 0) читают
+небольшую таблицу, а не страницы с историей за годы.
+
+Чтение истории, статистики и экспорт идут через представление tasks_all
+(tasks UNION ALL tasks_archive): перенос строки в архив для них незаметен,
+поэтому кэш read-моделей после переноса не сбрасывается. Постраничная
+история (data.task_pages) по tasks_all сливает два индекса
+(idx_tasks_history_keyset и idx_tasks_archive_history) без сортировки.
+
+Перенос — пачками по ARCHIVE_BATCH строк, каждая в своей короткой
+транзакции с паузой между ними, чтобы не держать блокировку записи.
+Фоновый поток (start_archiver) запускается один раз на процесс и
+повторяет перенос раз в ARCHIVE_INTERVAL секунд; время последнего
+прогона хранится в app_settings, так что несколько процессов на одной
+БД не делают одну и ту же работу. FQ_ARCHIVE=0 — не запускать.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from data.database import get_connection
+from utils.logger import logger
+
+ARCHIVE_ENABLED = os.getenv("FQ_ARCHIVE", "1") == "1"
+ARCHIVE_AFTER_DAYS = int(os.getenv("FQ_ARCHIVE_DAYS", "90"))
+ARCHIVE_BATCH = 500
+ARCHIVE_PAUSE = 0.05            # Секунд между пачками (дать дорогу записи из сессий)
+ARCHIVE_INTERVAL = 6 * 3600     # Секунд между фоновыми прогонами
+LAST_RUN_KEY = "tasks_archived_at"
+
+# Колонки tasks, которые переносятся в tasks_archive (archived_at заполняется сам)
+ARCHIVED_COLUMNS = ("id, user_id, created_by, title, description, category, points, difficulty, emoji, "
+                    "photo_required, due_date, completed, completed_at, photo_url, created_at")
+
+_archiver = None
+_archiver_lock = threading.Lock()
+
+
+def _archive_batch(conn, cutoff: str, batch_size: int) -> int:
+    """Перенести одну пачку; возвращает число перенесённых заданий"""
+    # IMMEDIATE: блокировка записи берётся сразу, выбранные строки не изменятся до COMMIT
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        ids = [row[0] for row in conn.execute('''
+            SELECT id FROM tasks
+            WHERE completed = 1 AND completed_at < ?
+            ORDER BY completed_at, id
+            LIMIT ?
+        ''', (cutoff, batch_size))]
+        if ids:
+            placeholders = ",".join("?" * len(ids))
+            conn.execute(f'''
+                INSERT OR IGNORE INTO tasks_archive ({ARCHIVED_COLUMNS})
+                SELECT {ARCHIVED_COLUMNS} FROM tasks WHERE id IN ({placeholders})
+            ''', ids)
+            conn.execute(f"DELETE FROM tasks WHERE id IN ({placeholders})", ids)
+        conn.commit()
+        return len(ids)
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+
+def archive_completed_tasks(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH,
+                            max_batches: int = None, pause: float = ARCHIVE_PAUSE) -> int:
+    """Перенести в архив задания, выполненные раньше чем older_than_days дней назад
+    
+    Возвращает число перенесённых заданий. max_batches ограничивает работу
+    одного прогона (остальное перенесёт следующий).
+    """
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+    moved = batches = 0
+    started = time.perf_counter()
+    conn = get_connection()
+    try:
+        while max_batches is None or batches < max_batches:
+            count = _archive_batch(conn, cutoff, batch_size)
+            moved += count
+            batches += 1
+            if count < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+        conn.execute('''
+            INSERT INTO app_settings (key, value, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+        ''', (LAST_RUN_KEY, datetime.now().isoformat()))
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Database error in archive_completed_tasks: {e}")
+    finally:
+        conn.close()
+    
+    if moved:
+        logger.info(f"🗃️ В архив перенесено заданий: {moved} ({batches} пачек, "
+                    f"{(time.perf_counter() - started) * 1000:.0f} мс)")
+    return moved
+
+
+def _last_run():
+    conn = get_connection()
+    try:
+        row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (LAST_RUN_KEY,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+    except (sqlite3.Error, ValueError) as e:
+        logger.error(f"Database error in archive _last_run: {e}")
+        return None
+    finally:
+        conn.close()
+
+def _archiver_loop():
+    while True:
+        last_run = _last_run()
+        if last_run is None or datetime.now() - last_run >= timedelta(seconds=ARCHIVE_INTERVAL):
+            archive_completed_tasks()
+            wait = ARCHIVE_INTERVAL
+        else:
+            wait = ARCHIVE_INTERVAL - (datetime.now() - last_run).total_seconds()
+        time.sleep(max(wait, 60))
+
+def start_archiver() -> bool:
+    """Запустить фоновое архивирование (один поток на процесс)"""
+    global _archiver
+    if not ARCHIVE_ENABLED:
+        return False
+    if _archiver is None:
+        with _archiver_lock:
+            if _archiver is None:
+                _archiver = threading.Thread(target=_archiver_loop, name="fq-archiver", daemon=True)
+                _archiver.start()
+    return True
@@ -0,0 +1,127 @@
+"""
+Асинхронный фасад чтения: методы репозиториев как корутины
+
+Как в aiosqlite, запросы выполняются не в потоке вызывающего, а в общем
+пуле FQ_DB_WORKERS потоков, поэтому фасадом можно пользоваться из
+асинхронного кода, не блокируя цикл событий. Каждый вызов в пуле
+открывает своё соединение (get_connection), как и остальной код, и
+использует те же методы репозиториев (вместе с их кэшем read-моделей).
+
+Быстрее от пула не становится: запросы страницы короткие, а сборка
+объектов Task идёт в Python под GIL, так что одновременно выполняется
+только время внутри SQLite. benchmarks/family_overview.py показывает, что
+обзор семьи через фасад идёт так же, как те же запросы по очереди
+(~0.95x). Быстрая загрузка семьи — GameEngine.load_family_bulk (пять
+запросов с IN (...) на одном соединении); фасад в приложении используется
+только для ребёнка, которого нет в загруженной семье.
+
+Для синхронного кода (скрипт Streamlit) есть обёртка run_sync и готовые
+функции load_child_overview / load_family_overview.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from data.database import get_connection
+
+DB_WORKERS = int(os.getenv("FQ_DB_WORKERS", "4"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Общий пул потоков для запросов к БД (создаётся при первом обращении)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="fq-db")
+    return _executor
+
+
+class AsyncRepository:
+    """Чтение данных семьи: каждый метод — корутина, запрос выполняется в пуле БД"""
+
+    def __init__(self, executor: ThreadPoolExecutor = None):
+        self._executor = executor
+
+    async def run(self, func, *args):
+        """Выполнить синхронную функцию в пуле БД"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor or get_db_executor(), func, *args)
+
+    async def children_for_parent(self, parent_id: int) -> List[Dict]:
+        from core.auth_system import AuthSystem
+        return await self.run(AuthSystem().get_children_for_parent, parent_id)
+
+    async def child(self, child_id: int):
+        """Ребёнок (core.game_engine.Child) или None"""
+        from core.game_engine import GameEngine
+        return await self.run(GameEngine().load_child, child_id)
+
+    async def open_tasks(self, child_id: int) -> List:
+        """Невыполненные задания ребёнка (core.game_engine.Task)"""
+        from core.game_engine import GameEngine
+        return await self.run(GameEngine().load_tasks_from_db, child_id)
+
+    async def unlocked_achievements(self, child_id: int) -> List[Dict]:
+        from core.achievements import AchievementSystem
+
+        def load():
+            conn = get_connection()
+            try:
+                return AchievementSystem(conn).get_unlocked_achievements(child_id)
+            finally:
+                conn.close()
+
+        return await self.run(load)
+
+    async def child_overview(self, child_id: int) -> Dict:
+        """Ребёнок, его задания и достижения — три запроса в пуле (ждём все вместе)"""
+        child, tasks, achievements = await asyncio.gather(
+            self.child(child_id),
+            self.open_tasks(child_id),
+            self.unlocked_achievements(child_id),
+        )
+        return {'child': child, 'tasks': tasks, 'achievements': achievements}
+
+    async def family_overview(self, parent_id: int) -> Dict[int, Dict]:
+        """Обзор всех детей родителя: child_id -> child_overview"""
+        children = await self.children_for_parent(parent_id)
+        overviews = await asyncio.gather(*(self.child_overview(c['id']) for c in children))
+        return {c['id']: overview for c, overview in zip(children, overviews)}
+
+
+def run_sync(coro):
+    """Выполнить корутину из синхронного кода и вернуть результат"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    # В этом потоке уже крутится цикл событий — выполняем в отдельном потоке
+    result = {}
+
+    def target():
+        try:
+            result['value'] = asyncio.run(coro)
+        except BaseException as e:
+            result['error'] = e
+
+    thread = threading.Thread(target=target, name="fq-db-sync")
+    thread.start()
+    thread.join()
+    if 'error' in result:
+        raise result['error']
+    return result['value']
+
+def load_child_overview(child_id: int) -> Dict:
+    """Синхронная обёртка AsyncRepository.child_overview"""
+    return run_sync(AsyncRepository().child_overview(child_id))
+
+def load_family_overview(parent_id: int) -> Dict[int, Dict]:
+    """Синхронная обёртка AsyncRepository.family_overview"""
+    return run_sync(AsyncRepository().family_overview(parent_id))
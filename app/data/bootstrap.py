@@ -0,0 +1,318 @@
+"""
+Подготовка БД один раз на процесс, а не в каждой сессии
+
+Схема версионируется через PRAGMA user_version. При старте процесса
+достаточно прочитать версию (и хеш определений достижений): если всё
+актуально, ни одного DDL-запроса не выполняется. Иначе под файловой
+блокировкой (несколько процессов на одной БД) применяются недостающие
+миграции из MIGRATIONS и перезаписываются определения достижений.
+Там же БД переводится в режим WAL (FQ_DB_WAL=0 — оставить как есть).
+
+Новая миграция — новая функция в конец MIGRATIONS; старые не меняются.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from core.achievements import achievements_digest, seed_achievements
+from data.database import DB_PATH, create_schema, get_connection
+from utils.logger import logger
+
+ACHIEVEMENTS_DIGEST_KEY = "achievements_def_digest"
+WAL_MODE = os.getenv("FQ_DB_WAL", "1") == "1"
+
+_bootstrapped = False
+_bootstrap_lock = threading.Lock()
+
+
+def _migration_base_schema(cursor):
+    """Базовая схема (все таблицы, что раньше создавал init_database)"""
+    create_schema(cursor)
+
+def _migration_family_indexes(cursor):
+    """Индексы для загрузки семьи запросами user_id IN (...) / child_id IN (...)"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_user_completed ON tasks (user_id, completed)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_achievements_child ON achievements (child_id)")
+
+def _migration_task_keyset_indexes(cursor):
+    """Индексы постраничных списков заданий (data.task_pages): ключ сортировки + id"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_open_keyset ON tasks (user_id, completed, created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_history_keyset ON tasks (user_id, completed, completed_at, id)")
+    # Покрывается idx_tasks_open_keyset (тот же префикс)
+    cursor.execute("DROP INDEX IF EXISTS idx_tasks_user_completed")
+
+def _migration_tasks_archive(cursor):
+    """Архив выполненных заданий (data.archive) и представление tasks_all поверх обеих таблиц"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id INTEGER PRIMARY KEY,     -- id из tasks (AUTOINCREMENT: не переиспользуется)
+            user_id INTEGER NOT NULL,
+            created_by INTEGER,
+            title TEXT NOT NULL,
+            description TEXT,
+            category TEXT,
+            points INTEGER,
+            difficulty TEXT,
+            emoji TEXT,
+            photo_required INTEGER DEFAULT 0,
+            due_date TEXT,
+            completed INTEGER DEFAULT 1,
+            completed_at TEXT,
+            photo_url TEXT,
+            created_at TEXT,
+            archived_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+    # История ребёнка по времени выполнения (тот же ключ, что idx_tasks_history_keyset)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_archive_history ON tasks_archive (user_id, completed_at, id)")
+    # Поиск кандидатов в архив: только выполненные, по дате выполнения
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tasks_completed_at ON tasks (completed_at) WHERE completed = 1")
+    columns = ("id, user_id, created_by, title, description, category, points, difficulty, emoji, "
+               "photo_required, due_date, completed, completed_at, photo_url, created_at")
+    cursor.execute(f'''
+        CREATE VIEW IF NOT EXISTS tasks_all AS
+        SELECT {columns} FROM tasks
+        UNION ALL
+        SELECT {columns} FROM tasks_archive
+    ''')
+
+def _migration_session_tokens(cursor):
+    """Отзыв токенов сессии (core.session_tokens) и версия сессий пользователя"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS session_revocations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            token_id TEXT,              -- отозван один токен
+            min_version INTEGER,        -- или все токены пользователя с меньшей версией
+            expires_epoch INTEGER NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_session_revocations_expires ON session_revocations (expires_epoch)")
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(users)")}
+    if 'session_version' not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN session_version INTEGER DEFAULT 0")
+
+def _migration_invite_expiry_epoch(cursor):
+    """Срок приглашений целым числом (core.invites) и индекс для проверки и чистки"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(invitations)")}
+    if 'expires_epoch' not in columns:
+        cursor.execute("ALTER TABLE invitations ADD COLUMN expires_epoch INTEGER")
+    # expires_at писался как datetime.now().isoformat() (местное время) — переводим в Python
+    rows = cursor.execute("SELECT id, expires_at FROM invitations WHERE expires_epoch IS NULL").fetchall()
+    epochs = []
+    for invite_id, expires_at in rows:
+        try:
+            epochs.append((int(datetime.fromisoformat(expires_at).timestamp()), invite_id))
+        except (TypeError, ValueError):
+            epochs.append((0, invite_id))  # Без срока или в непонятном формате — считаем истёкшим
+    cursor.executemany("UPDATE invitations SET expires_epoch = ? WHERE id = ?", epochs)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_invitations_status_expires ON invitations (status, expires_epoch)")
+
+def _migration_rewards_store(cursor):
+    """Каталог наград (core.rewards), журнал баллов (data.points_ledger) и ссылка покупки на награду"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rewards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            parent_id INTEGER,          -- NULL: общий каталог
+            name TEXT NOT NULL,
+            type TEXT NOT NULL DEFAULT 'real_reward',
+            cost INTEGER NOT NULL CHECK (cost > 0),
+            description TEXT,
+            emoji TEXT,
+            quantity INTEGER DEFAULT 1,
+            active INTEGER DEFAULT 1,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rewards_parent ON rewards (parent_id, active)")
+    if cursor.execute("SELECT COUNT(*) FROM rewards").fetchone()[0] == 0:
+        from core.rewards import seed_default_rewards
+        seed_default_rewards(cursor)
+    
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS points_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            child_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            balance_after INTEGER NOT NULL,
+            reason TEXT NOT NULL,
+            ref_id INTEGER,             -- награда, задание, достижение (по reason)
+            request_key TEXT,           -- ключ идемпотентности
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (child_id) REFERENCES users (id)
+        )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_points_ledger_child ON points_ledger (child_id, id)")
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_points_ledger_request
+        ON points_ledger (request_key) WHERE request_key IS NOT NULL
+    ''')
+    # Журнал только дописывается
+    for action in ("UPDATE", "DELETE"):
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS points_ledger_no_{action.lower()}
+            BEFORE {action} ON points_ledger
+            BEGIN SELECT RAISE(ABORT, 'points_ledger is append-only'); END
+        ''')
+    # Начальный баланс: сумма журнала с самого начала совпадает с users.points
+    cursor.execute('''
+        INSERT INTO points_ledger (child_id, delta, balance_after, reason)
+        SELECT id, COALESCE(points, 0), COALESCE(points, 0), 'opening' FROM users
+        WHERE user_type = 'child' AND id NOT IN (SELECT child_id FROM points_ledger)
+    ''')
+    
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(rewards_history)")}
+    if 'reward_id' not in columns:
+        cursor.execute("ALTER TABLE rewards_history ADD COLUMN reward_id INTEGER REFERENCES rewards (id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rewards_history_child ON rewards_history (child_id, id)")
+
+def _migration_points_snapshots(cursor):
+    """Снимки баланса по журналу (data.points_ledger) и выравнивание журнала по users.points"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS points_snapshots (
+            child_id INTEGER PRIMARY KEY,
+            ledger_id INTEGER NOT NULL,     -- последнее событие, вошедшее в снимок
+            balance INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            taken_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (child_id) REFERENCES users (id)
+        )
+    ''')
+    # До этой версии задания и достижения начисляли баллы в обход журнала — дописываем разницу
+    cursor.execute('''
+        INSERT INTO points_ledger (child_id, delta, balance_after, reason)
+        SELECT u.id, COALESCE(u.points, 0) - COALESCE(l.total, 0), COALESCE(u.points, 0), 'reconcile'
+        FROM users u
+        LEFT JOIN (SELECT child_id, SUM(delta) AS total FROM points_ledger GROUP BY child_id) l ON l.child_id = u.id
+        WHERE u.user_type = 'child' AND COALESCE(u.points, 0) != COALESCE(l.total, 0)
+    ''')
+    cursor.execute('''
+        INSERT OR REPLACE INTO points_snapshots (child_id, ledger_id, balance, level)
+        SELECT child_id, MAX(id), SUM(delta), SUM(delta) / 100 + 1 FROM points_ledger GROUP BY child_id
+    ''')
+
+def _migration_export_resume_key(cursor):
+    """Позиция продолжения экспорта (utils.export_jobs): ключ последней записанной строки"""
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(export_jobs)")}
+    if 'resume_key' not in columns:
+        cursor.execute("ALTER TABLE export_jobs ADD COLUMN resume_key TEXT")
+
+# (версия, описание, функция(cursor)) — по возрастанию версии
+MIGRATIONS: List[Tuple[int, str, Callable]] = [
+    (1, "базовая схема", _migration_base_schema),
+    (2, "индексы заданий и достижений по ребёнку", _migration_family_indexes),
+    (3, "индексы постраничных списков заданий", _migration_task_keyset_indexes),
+    (4, "архив выполненных заданий", _migration_tasks_archive),
+    (5, "отзыв токенов сессии", _migration_session_tokens),
+    (6, "срок приглашений в секундах эпохи", _migration_invite_expiry_epoch),
+    (7, "магазин наград и журнал баллов", _migration_rewards_store),
+    (8, "снимки баланса и сверка журнала баллов", _migration_points_snapshots),
+    (9, "ключ продолжения экспорта", _migration_export_resume_key),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Эксклюзивная блокировка между процессами (файл рядом с БД)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def schema_version(conn) -> int:
+    """Версия схемы в файле БД (0 — новая или созданная до версионирования)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _seed_digest(conn) -> str:
+    try:
+        row = conn.execute("SELECT value FROM app_settings WHERE key = ?", (ACHIEVEMENTS_DIGEST_KEY,)).fetchone()
+    except sqlite3.OperationalError:
+        return None  # Таблицы ещё нет
+    return row[0] if row else None
+
+def _is_current(conn) -> bool:
+    return schema_version(conn) >= SCHEMA_VERSION and _seed_digest(conn) == achievements_digest()
+
+def _upgrade(conn):
+    """Применить недостающие миграции и обновить определения достижений"""
+    version = schema_version(conn)
+    for target, description, migrate in MIGRATIONS:
+        if target <= version:
+            continue
+        logger.info(f"🗄️ Миграция БД {version} → {target}: {description}")
+        cursor = conn.cursor()
+        migrate(cursor)
+        cursor.execute(f"PRAGMA user_version = {int(target)}")
+        conn.commit()
+        version = target
+    
+    digest = achievements_digest()
+    if _seed_digest(conn) != digest:
+        cursor = conn.cursor()
+        seed_achievements(cursor)
+        cursor.execute('''
+            INSERT INTO app_settings (key, value, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+        ''', (ACHIEVEMENTS_DIGEST_KEY, digest))
+        conn.commit()
+        logger.info("🗄️ Определения достижений обновлены")
+
+def bootstrap_database(force: bool = False) -> bool:
+    """Проверить и при необходимости обновить схему (в процессе — только один раз)"""
+    global _bootstrapped
+    if _bootstrapped and not force:
+        return True
+    
+    with _bootstrap_lock:
+        if _bootstrapped and not force:
+            return True
+        
+        started = time.perf_counter()
+        conn = get_connection()
+        try:
+            if not _is_current(conn):
+                # Повторная проверка под блокировкой: другой процесс мог уже всё сделать
+                with _file_lock(Path(f"{DB_PATH}.lock")):
+                    if not _is_current(conn):
+                        _upgrade(conn)
+            if WAL_MODE:
+                # Читатели не ждут писателей (параллельные запросы data.async_repository)
+                conn.execute("PRAGMA journal_mode=WAL")
+            _bootstrapped = True
+            logger.info(f"✅ БД готова: {DB_PATH} (схема v{SCHEMA_VERSION}, "
+                        f"{(time.perf_counter() - started) * 1000:.1f} мс)")
+        except (sqlite3.Error, OSError) as e:
+            conn.rollback()
+            logger.error(f"Database error in bootstrap_database: {e}")
+        finally:
+            conn.close()
+    
+    return _bootstrapped
@@ -3,19 +3,92 @@
 """
 import sqlite3
 import json
+import os
+import time
 from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 import streamlit as st
+from utils.avatars import avatar_ref
+from utils.cache import on_points_changed, on_task_completed
 
-DB_PATH = Path(__file__).parent.parent.parent / "familyquest.db"
-_INITIALIZED = False  # Флаг для отслеживания инициализации
+# Путь можно переопределить (бенчмарки, отдельная копия БД): FQ_DB_PATH=/path/to.db
+DB_PATH = Path(os.getenv("FQ_DB_PATH") or Path(__file__).parent.parent.parent / "familyquest.db")
+
+# Подписчики на выполненные запросы: listener(sql, seconds)
+_QUERY_LISTENERS = []
+# Обработчики новых соединений: hook(conn)
+_CONNECTION_HOOKS = []
+
+def add_query_listener(listener):
+    """Подписаться на выполнение SQL (профилирование, трассировка)"""
+    if listener not in _QUERY_LISTENERS:
+        _QUERY_LISTENERS.append(listener)
+
+def remove_query_listener(listener):
+    """Отписаться от выполнения SQL"""
+    if listener in _QUERY_LISTENERS:
+        _QUERY_LISTENERS.remove(listener)
+
+def add_connection_hook(hook):
+    """Вызывать hook(conn) для каждого нового соединения из get_connection"""
+    if hook not in _CONNECTION_HOOKS:
+        _CONNECTION_HOOKS.append(hook)
+
+def remove_connection_hook(hook):
+    """Убрать обработчик новых соединений"""
+    if hook in _CONNECTION_HOOKS:
+        _CONNECTION_HOOKS.remove(hook)
+
+def _notify_query(sql, seconds):
+    for listener in list(_QUERY_LISTENERS):
+        try:
+            listener(sql, seconds)
+        except Exception:
+            pass  # Инструментирование не должно ломать запрос
+
+class TimedCursor(sqlite3.Cursor):
+    """Курсор, замеряющий время execute/executemany"""
+    
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _notify_query(sql, time.perf_counter() - start)
+    
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _notify_query(sql, time.perf_counter() - start)
+
+class TimedConnection(sqlite3.Connection):
+    """Соединение, у которого все курсоры — TimedCursor"""
+    
+    def cursor(self, factory=TimedCursor):
+        return super().cursor(factory)
+    
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+    
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
 
 def get_connection():
     """Получить НОВОЕ соединение с БД для текущего потока"""
-    DB_PATH = Path(__file__).parent.parent.parent / "familyquest.db"
-    conn = sqlite3.connect(str(DB_PATH))
+    if _QUERY_LISTENERS:
+        # Замеры включаем, только когда кто-то слушает — иначе обычное соединение
+        conn = sqlite3.connect(str(DB_PATH), factory=TimedConnection)
+    else:
+        conn = sqlite3.connect(str(DB_PATH))
     conn.row_factory = sqlite3.Row
+    for hook in list(_CONNECTION_HOOKS):
+        try:
+            hook(conn)
+        except Exception:
+            pass  # Инструментирование не должно ломать соединение
     # ВАЖНО: не кэшируем соединения!
     return conn
     
@@ -23,189 +96,211 @@ def get_db_path():
     """Вернуть путь к файлу БД"""
     return str(DB_PATH)
 
-def init_database():
-    """Создать таблицы, если их нет (безопасная версия)"""
-    global _INITIALIZED
-    
-    # Если уже инициализировали в этой сессии — пропускаем
-    if _INITIALIZED:
-        return
+def get_app_secret(key: str) -> bytes:
+    """Случайный ключ приложения из app_settings (создаётся при первом обращении)
     
+    Общий для всех процессов на этой БД и переживает перезапуск.
+    """
+    conn = get_connection()
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Таблица users (родители и дети) с ВСЕМИ необходимыми полями
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                name TEXT NOT NULL,
-                user_type TEXT NOT NULL,  -- 'child' или 'parent'
-                age INTEGER,              -- для детей
-                interests TEXT,            -- для детей (JSON)
-                avatar TEXT,
-                points INTEGER DEFAULT 0,   -- баллы (для детей)
-                level INTEGER DEFAULT 1,    -- уровень (для детей)
-                streak_days INTEGER DEFAULT 0,  -- дней подряд (для детей)
-                last_active TEXT,            -- последняя активность (для детей)
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблица для связи родителей и детей (через user_id)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS family_relations (
-                parent_id INTEGER,
-                child_id INTEGER,
-                status TEXT DEFAULT 'active',
-                connected_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (parent_id) REFERENCES users (id),
-                FOREIGN KEY (child_id) REFERENCES users (id),
-                PRIMARY KEY (parent_id, child_id)
-            )
-        ''')
-        
-        # Таблица для заданий
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,  -- Кому назначено (child)
-                created_by INTEGER,         -- Кто создал (parent, может быть NULL)
-                title TEXT NOT NULL,
-                description TEXT,
-                category TEXT,
-                points INTEGER,
-                difficulty TEXT,
-                emoji TEXT,
-                photo_required INTEGER DEFAULT 0,
-                due_date TEXT,
-                completed INTEGER DEFAULT 0,
-                completed_at TEXT,
-                photo_url TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id),
-                FOREIGN KEY (created_by) REFERENCES users (id)
-            )
-        ''')
-        
-        # Таблица для приглашений
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS invitations (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                parent_id INTEGER NOT NULL,
-                invite_code TEXT UNIQUE NOT NULL,
-                child_name TEXT,
-                status TEXT DEFAULT 'pending',
-                expires_at TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (parent_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Таблица истории наград
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS rewards_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                child_id INTEGER,
-                reward_name TEXT,
-                points_spent INTEGER,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (child_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Таблица достижений
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS achievements (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                child_id INTEGER,
-                achievement_id TEXT,
-                unlocked_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (child_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Таблица определений достижений
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS achievements_def (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL,
-                description TEXT,
-                emoji TEXT,
-                condition_type TEXT,
-                condition_value INTEGER,
-                reward_points INTEGER
-            )
-        ''')
-        
-        # Таблица child_parent (для обратной совместимости)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS child_parent (
-                child_id INTEGER,
-                parent_id INTEGER,
-                status TEXT DEFAULT 'active',
-                connected_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (child_id) REFERENCES users (id),
-                FOREIGN KEY (parent_id) REFERENCES users (id),
-                PRIMARY KEY (child_id, parent_id)
-            )
-        ''')
-        
-        # Таблица children (для обратной совместимости со старым кодом)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS children (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                age INTEGER NOT NULL,
-                avatar TEXT,
-                interests TEXT,
-                points INTEGER DEFAULT 0,
-                level INTEGER DEFAULT 1,
-                streak_days INTEGER DEFAULT 0,
-                last_active TEXT,
-                parent_id INTEGER,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (parent_id) REFERENCES users (id)
-            )
-        ''')
-        
-        # Таблица родителей (для обратной совместимости)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS parents (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                pin TEXT NOT NULL,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Таблица app_settings
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS app_settings (
-                key TEXT PRIMARY KEY,
-                value TEXT,
-                updated_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Добавляем PIN по умолчанию, если нет
-        cursor.execute('''
-            INSERT OR IGNORE INTO app_settings (key, value)
-            VALUES ('parent_pin', '1234')
-        ''')
-        
+        # INSERT OR IGNORE: если ключ уже создал другой процесс, берём его
+        conn.execute('''
+            INSERT OR IGNORE INTO app_settings (key, value, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+        ''', (key, os.urandom(32).hex()))
         conn.commit()
+        return conn.execute("SELECT value FROM app_settings WHERE key = ?", (key,)).fetchone()[0].encode('ascii')
+    finally:
         conn.close()
-        
-        _INITIALIZED = True
-        print(f"✅ База данных инициализирована: {DB_PATH}")
-        
-    except Exception as e:
-        print(f"❌ Ошибка инициализации БД: {e}")
-        _INITIALIZED = False
+
+def create_schema(cursor):
+    """Создать таблицы, если их нет (DDL базовой схемы; вызывается из data.bootstrap)"""
+    # Таблица users (родители и дети) с ВСЕМИ необходимыми полями
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            name TEXT NOT NULL,
+            user_type TEXT NOT NULL,  -- 'child' или 'parent'
+            age INTEGER,              -- для детей
+            interests TEXT,            -- для детей (JSON)
+            avatar TEXT,
+            points INTEGER DEFAULT 0,   -- баллы (для детей)
+            level INTEGER DEFAULT 1,    -- уровень (для детей)
+            streak_days INTEGER DEFAULT 0,  -- дней подряд (для детей)
+            last_active TEXT,            -- последняя активность (для детей)
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Таблица для связи родителей и детей (через user_id)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS family_relations (
+            parent_id INTEGER,
+            child_id INTEGER,
+            status TEXT DEFAULT 'active',
+            connected_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_id) REFERENCES users (id),
+            FOREIGN KEY (child_id) REFERENCES users (id),
+            PRIMARY KEY (parent_id, child_id)
+        )
+    ''')
+    
+    # Таблица для заданий
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS tasks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,  -- Кому назначено (child)
+            created_by INTEGER,         -- Кто создал (parent, может быть NULL)
+            title TEXT NOT NULL,
+            description TEXT,
+            category TEXT,
+            points INTEGER,
+            difficulty TEXT,
+            emoji TEXT,
+            photo_required INTEGER DEFAULT 0,
+            due_date TEXT,
+            completed INTEGER DEFAULT 0,
+            completed_at TEXT,
+            photo_url TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id),
+            FOREIGN KEY (created_by) REFERENCES users (id)
+        )
+    ''')
+    
+    # Таблица для приглашений
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS invitations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            parent_id INTEGER NOT NULL,
+            invite_code TEXT UNIQUE NOT NULL,
+            child_name TEXT,
+            status TEXT DEFAULT 'pending',
+            expires_at TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Таблица истории наград
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rewards_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            child_id INTEGER,
+            reward_name TEXT,
+            points_spent INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (child_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Таблица достижений
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS achievements (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            child_id INTEGER,
+            achievement_id TEXT,
+            unlocked_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (child_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Таблица определений достижений
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS achievements_def (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            description TEXT,
+            emoji TEXT,
+            condition_type TEXT,
+            condition_value INTEGER,
+            reward_points INTEGER
+        )
+    ''')
+    
+    # Таблица child_parent (для обратной совместимости)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS child_parent (
+            child_id INTEGER,
+            parent_id INTEGER,
+            status TEXT DEFAULT 'active',
+            connected_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (child_id) REFERENCES users (id),
+            FOREIGN KEY (parent_id) REFERENCES users (id),
+            PRIMARY KEY (child_id, parent_id)
+        )
+    ''')
+    
+    # Таблица children (для обратной совместимости со старым кодом)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS children (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            age INTEGER NOT NULL,
+            avatar TEXT,
+            interests TEXT,
+            points INTEGER DEFAULT 0,
+            level INTEGER DEFAULT 1,
+            streak_days INTEGER DEFAULT 0,
+            last_active TEXT,
+            parent_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Таблица родителей (для обратной совместимости)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS parents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            pin TEXT NOT NULL,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Таблица app_settings
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS app_settings (
+            key TEXT PRIMARY KEY,
+            value TEXT,
+            updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Таблица фоновых задач экспорта
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS export_jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,           -- children / tasks / achievements / report
+            params TEXT,                  -- параметры (JSON)
+            requested_by INTEGER,
+            status TEXT DEFAULT 'queued', -- queued / running / done / failed
+            total_rows INTEGER DEFAULT 0,
+            rows_written INTEGER DEFAULT 0,
+            bytes_written INTEGER DEFAULT 0,
+            file_name TEXT,
+            checksum TEXT,                -- SHA-256 готового файла
+            error TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            finished_at TEXT,
+            FOREIGN KEY (requested_by) REFERENCES users (id)
+        )
+    ''')
+    
+    # Добавляем PIN по умолчанию, если нет
+    cursor.execute('''
+        INSERT OR IGNORE INTO app_settings (key, value)
+        VALUES ('parent_pin', '1234')
+    ''')
+
+def init_database():
+    """Подготовить БД (один раз на процесс, см. data.bootstrap.bootstrap_database)"""
+    from data.bootstrap import bootstrap_database
+    bootstrap_database()
 
 class ChildRepository:
     """Работа с детьми в БД"""
@@ -217,7 +312,7 @@ class ChildRepository:
         cursor = conn.cursor()
         
         interests_json = json.dumps(interests, ensure_ascii=False)
-        avatar = f"https://api.dicebear.com/7.x/adventurer/svg?seed={name}"
+        avatar = avatar_ref(name)
         last_active = datetime.now().date().isoformat()
         
         if parent_id:
@@ -298,6 +393,7 @@ class ChildRepository:
         
         conn.commit()
         conn.close()
+        on_points_changed(child_id)
     
     @staticmethod
     def update_streak(child_id: int, streak_days: int):
@@ -375,27 +471,20 @@ class TaskRepository:
         points = task['points']
         user_id = task['user_id']
         
-        # Обновляем задание
+        # Обновляем задание и начисляем баллы через журнал — одной транзакцией
+        from data.points_ledger import record, TASK
         cursor.execute('''
             UPDATE tasks 
             SET completed = 1, completed_at = ?, photo_url = ?
-            WHERE id = ?
+            WHERE id = ? AND completed = 0
         ''', (datetime.now().isoformat(), photo_url, task_id))
+        if cursor.rowcount != 1 or record(cursor, user_id, points, TASK, task_id, active=True) is None:
+            conn.rollback()
+            conn.close()
+            return 0
         
         conn.commit()
         conn.close()
-        
-        # Начисляем баллы ребёнку через users
-        conn2 = get_connection()
-        cursor2 = conn2.cursor()
-        cursor2.execute('''
-            UPDATE users 
-            SET points = points + ?, 
-                level = (points + ?) / 100 + 1,
-                last_active = ?
-            WHERE id = ?
-        ''', (points, points, datetime.now().date().isoformat(), user_id))
-        conn2.commit()
-        conn2.close()
+        on_task_completed(user_id)
         
         return points
\ No newline at end of file
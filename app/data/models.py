@@ -1,25 +1,66 @@
 """
-Модели данных для SQLite
+Модели данных: ребёнок и задание
+
+Неизменяемые записи со __slots__ (без __dict__ у каждого объекта): родитель
+держит в сессии задания всей семьи, и на 100 тысячах заданий это заметно
+(benchmarks/task_memory.py). Изменение — через dataclasses.replace,
+который возвращает новую запись.
+
+from_row собирает запись прямо из sqlite3.Row (без промежуточного dict).
 """
 from dataclasses import dataclass
 from datetime import datetime, date
-from typing import Optional, List
-import sqlite3
+from typing import Optional, Tuple
 import json
 
-@dataclass
+from utils.avatars import avatar_ref
+
+
+def parse_interests(value) -> Tuple[str, ...]:
+    """interests из БД (JSON-строка) или из кода (список) → кортеж"""
+    if not value:
+        return ()
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return ()
+    return tuple(value) if isinstance(value, (list, tuple)) else ()
+
+
+@dataclass(frozen=True, slots=True)
 class Child:
     id: Optional[int]
     name: str
     age: int
     avatar: str
-    interests: str
+    interests: Tuple[str, ...]
     points: int
     level: int
     streak_days: int
-    last_active: str
-    created_at: str
-    parent_id: Optional[int] = None  # <-- ДОБАВЛЯЕМ
+    last_active: date
+    parent_id: Optional[int] = None
+    
+    def __post_init__(self):
+        if not isinstance(self.interests, tuple):
+            object.__setattr__(self, 'interests', parse_interests(self.interests))
+    
+    @classmethod
+    def from_row(cls, row, parent_id: int = None) -> "Child":
+        """Из строки таблицы users (sqlite3.Row)"""
+        last_active = row['last_active']
+        return cls(
+            row['id'],
+            row['name'],
+            row['age'],
+            row['avatar'] or avatar_ref(row['name']),
+            parse_interests(row['interests']),
+            row['points'] or 0,
+            row['level'] or 1,
+            row['streak_days'] or 0,
+            datetime.fromisoformat(last_active).date() if last_active else date.today(),
+            parent_id,
+        )
     
     @classmethod
     def from_dict(cls, data):
@@ -28,13 +69,12 @@ class Child:
             name=data['name'],
             age=data['age'],
             avatar=data['avatar'],
-            interests=data['interests'],
-            points=data['points'],
-            level=data['level'],
-            streak_days=data['streak_days'],
-            last_active=data['last_active'],
-            created_at=data['created_at'],
-            parent_id=data.get('parent_id')  # <-- ДОБАВЛЯЕМ
+            interests=data.get('interests'),
+            points=data.get('points', 0),
+            level=data.get('level', 1),
+            streak_days=data.get('streak_days', 0),
+            last_active=data.get('last_active') or date.today(),
+            parent_id=data.get('parent_id')
         )
     
     def to_dict(self):
@@ -43,16 +83,16 @@ class Child:
             'name': self.name,
             'age': self.age,
             'avatar': self.avatar,
-            'interests': self.interests,
+            'interests': list(self.interests),
             'points': self.points,
             'level': self.level,
             'streak_days': self.streak_days,
             'last_active': self.last_active,
-            'created_at': self.created_at,
-            'parent_id': self.parent_id  # <-- ДОБАВЛЯЕМ
+            'parent_id': self.parent_id
         }
 
-@dataclass
+
+@dataclass(frozen=True, slots=True)
 class Task:
     id: Optional[int]
     title: str
@@ -63,12 +103,33 @@ class Task:
     emoji: str
     photo_required: bool
     child_id: int
-    due_date: Optional[str]
-    completed: bool
-    completed_at: Optional[str]
-    photo_url: Optional[str]
-    created_at: str
-
+    due_date: Optional[str] = None
+    completed: bool = False
+    completed_at: Optional[str] = None
+    photo_url: Optional[str] = None
+    created_at: Optional[datetime] = None
+    
+    @classmethod
+    def from_row(cls, row) -> "Task":
+        """Из строки таблицы tasks (sqlite3.Row)"""
+        created_at = row['created_at']
+        return cls(
+            row['id'],
+            row['title'],
+            row['description'],
+            row['category'],
+            row['points'],
+            row['difficulty'],
+            row['emoji'],
+            bool(row['photo_required']),
+            row['user_id'],
+            row['due_date'],
+            bool(row['completed']),
+            row['completed_at'],
+            row['photo_url'],
+            datetime.fromisoformat(created_at) if created_at else datetime.now(),
+        )
+    
     def to_dict(self):
         return {
             'id': self.id,
@@ -0,0 +1,235 @@
+"""
+Журнал баллов: каждое изменение баланса ребёнка — событие в points_ledger
+
+Журнал только дописывается (UPDATE и DELETE запрещены триггерами). В
+строке — изменение (delta), причина, ссылка на источник (награда,
+задание) и баланс после изменения (balance_after). Все пути, меняющие
+баллы, идут через record() (начисление и ручная правка) или debit()
+(списание с проверкой баланса) в транзакции вызывающего.
+
+Баланс по журналу — снимок плюс короткий хвост:
+    points_snapshots.balance + SUM(delta) строк после снимка
+Снимок ребёнка переписывается каждые SNAPSHOT_EVERY событий, поэтому
+хвост короткий и читается по индексу (child_id, id). users.points и
+users.level — проекция журнала, которую пишет тот же путь; если она
+разошлась с журналом (старый код в обход журнала, ручная правка БД),
+запись её исправляет. Проекцию всех детей пачками сверяет
+reconcile_points() — фоновый поток (start_reconciler) раз в сутки.
+
+request_key — ключ идемпотентности: повтор операции с тем же ключом
+находится по уникальному индексу и второй раз не применяется.
+FQ_RECONCILE=0 — не запускать сверку в фоне.
+"""
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+from typing import Dict, Optional, Tuple
+
+from data.database import get_connection
+from utils.cache import cached_read_model, points_tag, on_points_changed
+from utils.logger import logger
+
+OPENING = "opening"         # Баланс на момент появления журнала (миграция 7)
+PURCHASE = "purchase"       # Покупка награды (core.rewards)
+TASK = "task"               # Выполнено задание
+ACHIEVEMENT = "achievement" # Бонус за достижение
+ADJUSTMENT = "adjustment"   # Ручное начисление или списание
+RECONCILE = "reconcile"     # Выравнивание журнала по users.points (миграция 8)
+
+SNAPSHOT_EVERY = 50             # Событий в хвосте, после которых снимок переписывается
+RECONCILE_ENABLED = os.getenv("FQ_RECONCILE", "1") == "1"
+RECONCILE_BATCH = 500
+RECONCILE_INTERVAL = 24 * 3600  # Секунд между фоновыми сверками
+
+_reconciler = None
+_reconciler_lock = threading.Lock()
+
+
+def _level(points: int) -> int:
+    return points // 100 + 1
+
+def _ledger_state(cursor, child_id: int) -> Tuple[int, int]:
+    """(баланс по журналу, событий после снимка)"""
+    snapshot = cursor.execute("SELECT ledger_id, balance FROM points_snapshots WHERE child_id = ?",
+                              (child_id,)).fetchone()
+    ledger_id, balance = (snapshot[0], snapshot[1]) if snapshot else (0, 0)
+    tail_sum, tail_len = cursor.execute('''
+        SELECT COALESCE(SUM(delta), 0), COUNT(*) FROM points_ledger WHERE child_id = ? AND id > ?
+    ''', (child_id, ledger_id)).fetchone()
+    return balance + tail_sum, tail_len
+
+def _snapshot(cursor, child_id: int, ledger_id: int, balance: int):
+    cursor.execute('''
+        INSERT INTO points_snapshots (child_id, ledger_id, balance, level, taken_at)
+        VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(child_id) DO UPDATE SET
+            ledger_id = excluded.ledger_id, balance = excluded.balance,
+            level = excluded.level, taken_at = excluded.taken_at
+    ''', (child_id, ledger_id, balance, _level(balance)))
+
+def _append(cursor, child_id: int, delta: int, reason: str, ref_id: int = None,
+            request_key: str = None) -> int:
+    """Дописать событие после изменения users.points; возвращает баланс по журналу"""
+    balance, tail_len = _ledger_state(cursor, child_id)
+    balance += delta
+    cursor.execute('''
+        INSERT INTO points_ledger (child_id, delta, balance_after, reason, ref_id, request_key)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', (child_id, delta, balance, reason, ref_id, request_key))
+    if tail_len + 1 >= SNAPSHOT_EVERY:
+        _snapshot(cursor, child_id, cursor.lastrowid, balance)
+    _sync_projection(cursor, child_id, balance)
+    return balance
+
+def _sync_projection(cursor, child_id: int, balance: int):
+    """Исправить users.points, если проекция разошлась с журналом"""
+    projected = cursor.execute("SELECT points FROM users WHERE id = ?", (child_id,)).fetchone()[0]
+    if projected != balance:
+        logger.warning(f"Баллы ребёнка {child_id}: users.points={projected}, журнал={balance} — исправлено")
+        cursor.execute("UPDATE users SET points = ?, level = ? WHERE id = ?", (balance, _level(balance), child_id))
+
+def record(cursor, child_id: int, delta: int, reason: str, ref_id: int = None,
+           request_key: str = None, active: bool = False) -> Optional[int]:
+    """Начислить (или снять без проверки) баллы в транзакции вызывающего
+    
+    active — ребёнок что-то сделал сам (обновляется last_active).
+    Возвращает баланс после или None: не ребёнок или request_key уже был.
+    """
+    if request_key and find_entry(cursor, request_key):
+        return None
+    cursor.execute('''
+        UPDATE users
+        SET points = points + ?, level = ((points + ?) / 100) + 1,
+            last_active = COALESCE(?, last_active)
+        WHERE id = ? AND user_type = 'child'
+    ''', (delta, delta, date.today().isoformat() if active else None, child_id))
+    if cursor.rowcount != 1:
+        return None
+    return _append(cursor, child_id, delta, reason, ref_id, request_key)
+
+def debit(cursor, child_id: int, amount: int, reason: str, ref_id: int = None,
+          request_key: str = None) -> Optional[int]:
+    """Списать баллы, если их хватает (в транзакции вызывающего)
+    
+    Проверка и списание — один условный UPDATE: между ними никто не
+    вклинится. Проверяется баланс по журналу: проекция перед этим
+    выравнивается. Возвращает баланс после или None, если баллов не хватило.
+    """
+    if cursor.execute("SELECT 1 FROM users WHERE id = ? AND user_type = 'child'", (child_id,)).fetchone():
+        _sync_projection(cursor, child_id, ledger_balance(cursor, child_id))
+    cursor.execute('''
+        UPDATE users
+        SET points = points - ?, level = ((points - ?) / 100) + 1
+        WHERE id = ? AND user_type = 'child' AND points >= ?
+    ''', (amount, amount, child_id, amount))
+    if cursor.rowcount != 1:
+        return None
+    return _append(cursor, child_id, -amount, reason, ref_id, request_key)
+
+def find_entry(cursor, request_key: str) -> Optional[Dict]:
+    """Строка журнала, записанная с этим ключом идемпотентности"""
+    row = cursor.execute("SELECT * FROM points_ledger WHERE request_key = ?", (request_key,)).fetchone()
+    return dict(row) if row else None
+
+def ledger_balance(cursor, child_id: int) -> int:
+    """Баланс по журналу: снимок плюс хвост"""
+    return _ledger_state(cursor, child_id)[0]
+
+
+@cached_read_model(ttl=60, tags=lambda balance, child_id: [points_tag(child_id)])
+def get_balance(child_id: int) -> Optional[int]:
+    """Текущий баланс ребёнка по журналу"""
+    conn = get_connection()
+    try:
+        return ledger_balance(conn.cursor(), child_id)
+    except sqlite3.Error as e:
+        logger.error(f"Database error in get_balance: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+# Пачка детей (keyset по id): users.points, снимок + хвост и, при full, полная сумма журнала
+_RECONCILE_SQL = '''
+    SELECT u.id, COALESCE(u.points, 0), {tail}, {ledger} FROM users u
+    LEFT JOIN points_snapshots s ON s.child_id = u.id
+    WHERE u.user_type = 'child' AND u.id > ?
+    ORDER BY u.id LIMIT ?
+'''
+_TAIL = '''COALESCE(s.balance, 0) + COALESCE((
+    SELECT SUM(l.delta) FROM points_ledger l WHERE l.child_id = u.id AND l.id > COALESCE(s.ledger_id, 0)
+), 0)'''
+_FULL = "COALESCE((SELECT SUM(l.delta) FROM points_ledger l WHERE l.child_id = u.id), 0)"
+
+def reconcile_points(batch_size: int = RECONCILE_BATCH, repair: bool = True, full: bool = False) -> Dict:
+    """Сверить users.points с журналом у всех детей
+    
+    repair — исправить проекцию по журналу (журнал — источник истины).
+    full — ещё и сверить снимок плюс хвост с полной суммой журнала
+    (испорченный снимок при repair переписывается по полной сумме).
+    Каждая пачка — короткая транзакция.
+    """
+    sql = _RECONCILE_SQL.format(tail=_TAIL, ledger=_FULL if full else _TAIL)
+    checked = repaired = 0
+    mismatched = []
+    last_id = 0
+    started = time.perf_counter()
+    conn = get_connection()
+    try:
+        while True:
+            # IMMEDIATE: между сверкой и исправлением пачки баллы никто не поменяет
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(sql, (last_id, batch_size)).fetchall()
+            drifted = [(child_id, points, tail, ledger) for child_id, points, tail, ledger in rows
+                       if points != ledger or tail != ledger]
+            if repair and drifted:
+                cursor = conn.cursor()
+                for child_id, points, tail, ledger in drifted:
+                    if points != ledger:
+                        cursor.execute("UPDATE users SET points = ?, level = ? WHERE id = ?",
+                                       (ledger, _level(ledger), child_id))
+                    if tail != ledger:
+                        last_entry = cursor.execute("SELECT MAX(id) FROM points_ledger WHERE child_id = ?",
+                                                    (child_id,)).fetchone()[0]
+                        _snapshot(cursor, child_id, last_entry, ledger)
+                repaired += len(drifted)
+            conn.commit()
+            
+            checked += len(rows)
+            mismatched += [{'child_id': c, 'points': p, 'ledger': l, 'snapshot': t} for c, p, t, l in drifted]
+            if len(rows) < batch_size:
+                break
+            last_id = rows[-1][0]
+    except sqlite3.Error as e:
+        conn.rollback()
+        logger.error(f"Database error in reconcile_points: {e}")
+    finally:
+        conn.close()
+    
+    for item in mismatched:
+        logger.warning(f"Баллы ребёнка {item['child_id']}: users.points={item['points']}, "
+                       f"журнал={item['ledger']}, снимок с хвостом={item['snapshot']}")
+        if repair:
+            on_points_changed(item['child_id'])
+    logger.info(f"🧮 Сверка баллов: {checked} детей, расхождений {len(mismatched)}, "
+                f"исправлено {repaired} ({(time.perf_counter() - started) * 1000:.0f} мс)")
+    return {'checked': checked, 'mismatched': mismatched, 'repaired': repaired}
+
+def _reconciler_loop():
+    while True:
+        reconcile_points()
+        time.sleep(RECONCILE_INTERVAL)
+
+def start_reconciler() -> bool:
+    """Запустить фоновую сверку баллов (один поток на процесс)"""
+    global _reconciler
+    if not RECONCILE_ENABLED:
+        return False
+    if _reconciler is None:
+        with _reconciler_lock:
+            if _reconciler is None:
+                _reconciler = threading.Thread(target=_reconciler_loop, name="fq-reconciler", daemon=True)
+                _reconciler.start()
+    return True
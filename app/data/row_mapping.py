@@ -0,0 +1,175 @@
+"""
+Сборка записей data.models прямо из строк курсора
+
+Обычный путь — sqlite3.Row, затем dict(row), json.loads, fromisoformat и
+конструктор поле за полем. Здесь для каждого набора колонок запроса один
+раз генерируется функция-план: поля записи берутся из кортежа строки по
+заранее вычисленным индексам, без Row и без dict. План ставится курсору
+как row_factory на время fetchall/fetchone.
+
+Разбор дорогих полей (interests из JSON, даты) откладывается до первого
+обращения: записи из запросов — подклассы Task/Child, у которых эти поля
+хранят сырую строку из БД и разбирают её в свойстве (результат
+запоминается). Для кода это те же Task/Child.
+
+    cursor.execute("SELECT * FROM tasks WHERE user_id = ?", (child_id,))
+    tasks = TASK_ROWS.fetchall(cursor)
+    children = CHILD_ROWS.fetchall(cursor, parent_id=parent_id)
+
+Бенчмарк против прежнего пути: benchmarks/row_mapping.py
+"""
+import dataclasses
+import threading
+import types
+from datetime import datetime, date
+from typing import Callable, Dict, List, Tuple
+
+from data.models import Task, Child, parse_interests
+from utils.avatars import avatar_ref
+
+
+def _slot(cls, name: str):
+    """Дескриптор слота поля (у ленивых полей он перекрыт свойством подкласса)"""
+    for klass in cls.__mro__:
+        attr = klass.__dict__.get(name)
+        if isinstance(attr, types.MemberDescriptorType):
+            return attr
+    raise AttributeError(f"{cls.__name__}.{name} — не слот")
+
+def _lazy(cls, name: str, parse: Callable):
+    """Свойство поверх слота: строка из БД разбирается при первом чтении"""
+    slot = _slot(cls, name)
+    
+    def get(self):
+        value = slot.__get__(self)
+        if value is None or isinstance(value, str):
+            value = parse(value)
+            slot.__set__(self, value)
+        return value
+    
+    def set(self, value):
+        # Только из __init__ (записи неизменяемы: обычное присваивание запрещено)
+        slot.__set__(self, value)
+    
+    return property(get, set)
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else datetime.now()
+
+def _parse_date(value):
+    return datetime.fromisoformat(value).date() if value else date.today()
+
+
+class _RowTask(Task):
+    """Task из запроса: created_at разбирается при обращении"""
+    __slots__ = ()
+    created_at = _lazy(Task, 'created_at', _parse_datetime)
+
+
+class _RowChild(Child):
+    """Child из запроса: interests и last_active разбираются при обращении"""
+    __slots__ = ()
+    interests = _lazy(Child, 'interests', parse_interests)
+    last_active = _lazy(Child, 'last_active', _parse_date)
+    
+    def __post_init__(self):
+        pass  # interests приводится в свойстве (и dataclasses.replace передаёт уже кортеж)
+
+
+class RowMapper:
+    """Сборщик записей одного типа по плану для набора колонок запроса
+    
+    fields: поле записи -> выражение Python, в котором {колонка} заменяется
+    значением колонки из строки; поля, которых нет в fields, берутся из
+    одноимённой колонки. Имена без фигурных скобок — константы, переданные
+    в fetchall/fetchone (например, parent_id). Если колонки нет в запросе,
+    поле получает значение по умолчанию из модели.
+    """
+    
+    def __init__(self, cls, fields: Dict[str, str] = None, helpers: Dict[str, object] = None):
+        self.cls = cls
+        self.fields = fields or {}
+        self.helpers = helpers or {}
+        self._plans: Dict[Tuple, Callable] = {}
+        self._lock = threading.Lock()
+    
+    def _compile(self, columns: Tuple[str, ...], constants: Tuple[str, ...]) -> Callable:
+        """make(*константы) -> row_factory; исходник генерируется под набор колонок"""
+        cells = {name: f"row[{i}]" for i, name in enumerate(columns)}
+        namespace = dict(self.helpers, _cls=self.cls)
+        args = []
+        for field in dataclasses.fields(self.cls):
+            expr = self.fields.get(field.name, "{%s}" % field.name)
+            try:
+                arg = expr.format_map(cells)
+            except KeyError:
+                arg = None  # Колонки нет в запросе
+            if arg is None or (arg.isidentifier() and arg not in constants):
+                if field.default is dataclasses.MISSING:
+                    raise ValueError(f"{self.cls.__name__}.{field.name}: нет колонки или константы для {expr}")
+                arg = f"_default_{field.name}"
+                namespace[arg] = field.default
+            args.append(arg)
+        
+        # Запись собирается без __init__: значения кладутся прямо в слоты
+        # (у ленивых полей — сырая строка из БД), это втрое быстрее
+        # конструктора неизменяемого dataclass
+        lines = [f"def make({', '.join(constants)}):",
+                 "    def build(cursor, row):",
+                 "        record = _new(_cls)"]
+        for field, arg in zip(dataclasses.fields(self.cls), args):
+            namespace[f"_set_{field.name}"] = _slot(self.cls, field.name).__set__
+            lines.append(f"        _set_{field.name}(record, {arg})")
+        lines += ["        return record", "    return build", ""]
+        namespace['_new'] = object.__new__
+        source = "\n".join(lines)
+        exec(compile(source, f"<row plan {self.cls.__name__}>", "exec"), namespace)
+        return namespace['make']
+    
+    def plan(self, cursor, **constants) -> Callable:
+        """row_factory для текущего запроса курсора"""
+        columns = tuple(d[0] for d in cursor.description)
+        key = (columns, tuple(constants))
+        make = self._plans.get(key)
+        if make is None:
+            with self._lock:
+                make = self._plans.get(key)
+                if make is None:
+                    make = self._plans[key] = self._compile(*key)
+        return make(*constants.values())
+    
+    def fetchall(self, cursor, **constants) -> List:
+        if cursor.description is None:
+            return []
+        previous = cursor.row_factory
+        cursor.row_factory = self.plan(cursor, **constants)
+        try:
+            return cursor.fetchall()
+        finally:
+            cursor.row_factory = previous
+    
+    def fetchone(self, cursor, **constants):
+        if cursor.description is None:
+            return None
+        previous = cursor.row_factory
+        cursor.row_factory = self.plan(cursor, **constants)
+        try:
+            return cursor.fetchone()
+        finally:
+            cursor.row_factory = previous
+
+
+TASK_ROWS = RowMapper(_RowTask, {
+    'photo_required': "bool({photo_required})",
+    'child_id': "{user_id}",
+    'completed': "bool({completed})",
+})
+
+CHILD_ROWS = RowMapper(_RowChild, {
+    'avatar': "{avatar} or _avatar_ref({name})",
+    'points': "{points} or 0",
+    'level': "{level} or 1",
+    'streak_days': "{streak_days} or 0",
+    'parent_id': "parent_id",
+}, helpers={'_avatar_ref': avatar_ref})
@@ -0,0 +1,142 @@
+"""
+Постраничные списки заданий (keyset-пагинация)
+
+Страница продолжается не с OFFSET, а с позиции последнего показанного
+задания: WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC.
+Такой запрос читает из индекса только строки своей страницы, сколько бы
+заданий ни было до неё, и не сбивается, когда задания выполняются или
+добавляются между загрузками страниц.
+
+Позиция передаётся непрозрачным токеном (next_token страницы). Токен
+привязан к списку (открытые / история, категория) и ребёнку: с чужим
+списком он не сработает, а повреждённый токен просто даёт первую страницу.
+
+Списки:
+    open_tasks_page  — невыполненные, новые сверху (по created_at, id)
+    history_page     — выполненные, последние сверху (по completed_at, id),
+                       вместе с архивом (представление tasks_all)
+Оба принимают category — тот же список по одной категории.
+"""
+import base64
+import json
+import sqlite3
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from data.database import get_connection
+from data.models import Task
+from data.row_mapping import TASK_ROWS
+from utils.cache import cached_read_model, tasks_tag
+from utils.logger import logger
+
+TASK_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+
+@dataclass(frozen=True)
+class TaskPage:
+    tasks: List[Task]
+    next_token: Optional[str]    # None — это последняя страница
+    
+    @property
+    def has_more(self) -> bool:
+        return self.next_token is not None
+
+
+# Список: (таблица, условие по completed, колонка ключа сортировки).
+# История читается через tasks_all — вместе с архивом (data.archive)
+_VIEWS = {
+    'open': ("tasks", "completed = 0", "created_at"),
+    'history': ("tasks_all", "completed = 1", "completed_at"),
+}
+
+
+def encode_token(view: str, child_id: int, category: Optional[str], key, task_id: int) -> str:
+    payload = json.dumps([view, child_id, category, key, task_id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_token(token: str, view: str, child_id: int, category: Optional[str]):
+    """(ключ, id) последнего задания прошлой страницы или None, если токен не подходит"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        token_view, token_child, token_category, key, task_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        logger.warning(f"Повреждённый токен страницы заданий: {token[:40]}")
+        return None
+    if (token_view, token_child, token_category) != (view, child_id, category):
+        logger.warning(f"Токен страницы от другого списка: {token_view}/{token_child}/{token_category}")
+        return None
+    return key, task_id
+
+
+def _page(view: str, child_id: int, token: Optional[str], limit: int, category: Optional[str]) -> TaskPage:
+    table, completed_clause, key_column = _VIEWS[view]
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    
+    where = ["user_id = ?", completed_clause]
+    params: list = [child_id]
+    if category:
+        where.append("category = ?")
+        params.append(category)
+    position = decode_token(token, view, child_id, category) if token else None
+    if position:
+        where.append(f"({key_column}, id) < (?, ?)")
+        params.extend(position)
+    
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        # На одну строку больше страницы: так видно, есть ли следующая
+        cursor.execute(f'''
+            SELECT * FROM {table}
+            WHERE {" AND ".join(where)}
+            ORDER BY {key_column} DESC, id DESC
+            LIMIT ?
+        ''', params + [limit + 1])
+        rows = cursor.fetchall()
+        build = TASK_ROWS.plan(cursor)
+        columns = [d[0] for d in cursor.description]
+    except sqlite3.Error as e:
+        logger.error(f"Database error in task page ({view}): {e}")
+        return TaskPage([], None)
+    finally:
+        conn.close()
+    
+    tasks = [build(None, row) for row in rows[:limit]]
+    if len(rows) <= limit:
+        return TaskPage(tasks, None)
+    # Ключ в токене — сырое значение колонки: SQLite сравнивает именно его
+    last = rows[limit - 1]
+    key = last[columns.index(key_column)]
+    return TaskPage(tasks, encode_token(view, child_id, category, key, last[columns.index('id')]))
+
+
+def open_tasks_page(child_id: int, token: str = None, limit: int = TASK_PAGE_SIZE,
+                    category: str = None) -> TaskPage:
+    """Невыполненные задания ребёнка, новые сверху"""
+    return _page('open', child_id, token, limit, category)
+
+def history_page(child_id: int, token: str = None, limit: int = TASK_PAGE_SIZE,
+                 category: str = None) -> TaskPage:
+    """Выполненные задания ребёнка, последние сверху"""
+    return _page('history', child_id, token, limit, category)
+
+
+@cached_read_model(ttl=60, tags=lambda counts, child_id: [tasks_tag(child_id)])
+def task_counts(child_id: int) -> Optional[Dict[str, int]]:
+    """{'open': невыполненных, 'completed': выполненных} — для подписей без загрузки всех заданий"""
+    conn = get_connection()
+    try:
+        rows = conn.execute('''
+            SELECT completed, COUNT(*) FROM tasks_all WHERE user_id = ? GROUP BY completed
+        ''', (child_id,)).fetchall()
+        counts = {'open': 0, 'completed': 0}
+        for completed, count in rows:
+            counts['completed' if completed else 'open'] += count
+        return counts
+    except sqlite3.Error as e:
+        logger.error(f"Database error in task_counts: {e}")
+        return None
+    finally:
+        conn.close()
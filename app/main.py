@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 import traceback
 import logging
 import sys
+import time
 
 # ДОЛЖНО БЫТЬ ПЕРВОЙ КОМАНДОЙ STREAMLIT
 st.set_page_config(
@@ -16,7 +17,19 @@ st.set_page_config(
 )
 
 # Импортируем логгер первым делом
-from utils.logger import logger, log_rerun, display_rerun_log
+from utils.logger import (
+    logger, log_rerun, display_rerun_log, render_log_level_control,
+    start_rerun_context, should_log_event, log_event
+)
+from utils.profiler import start_rerun, finish_rerun, render_profiler_panel
+from utils.query_tracer import begin_trace_scope, end_trace_scope, render_query_tracer_panel
+from utils.cache import render_cache_panel
+
+# Контекст для структурированных логов: id сессии, id этого rerun и пользователь
+_rerun_started = time.perf_counter()
+start_rerun_context(st.session_state, user_id=(st.session_state.get('current_user') or {}).get('id'))
+start_rerun()  # Замеры секций и SQL (только если профилирование включено)
+begin_trace_scope('rerun')  # Повторы запросов за rerun (только при FQ_SQL_TRACE)
 
 # Логируем запуск приложения
 logger.info("=" * 50)
@@ -24,15 +37,6 @@ logger.info("🚀 FamilyQuest starting...")
 logger.info(f"Streamlit version: {st.__version__}")
 logger.info("=" * 50)
 
-# Настройка логирования для консоли
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
-
 # Функция для отслеживания rerun
 def debug_rerun():
     """Детальное логирование причин rerun"""
@@ -47,18 +51,23 @@ def debug_rerun():
         delta = (now - st.session_state.debug_last_time).total_seconds()
         st.session_state.debug_last_time = now
         
-        logger.debug(f"🔄 Rerun #{st.session_state.debug_rerun_count} (прошло {delta:.2f}с)")
-        
-        # Логируем, какие виджеты могли вызвать rerun
-        form_keys = [k for k in st.session_state.keys() if 'FormSubmitter' in k]
-        if form_keys:
-            logger.debug(f"📝 Формы в session_state: {form_keys}")
-        
-        # Проверяем изменения в критических переменных
-        watch_vars = ['show_ai_task', 'show_quest', 'show_story', 'generated_task']
-        for var in watch_vars:
-            if var in st.session_state:
-                logger.debug(f"   {var} = {st.session_state[var]}")
+        # Подробности пишем только для отобранной доли rerun (FQ_LOG_SAMPLE)
+        if should_log_event('debug_rerun'):
+            extra = {'event': 'debug_rerun', 'sampled': True}
+            logger.debug(f"🔄 Rerun #{st.session_state.debug_rerun_count} (прошло {delta:.2f}с)",
+                         extra={**extra, 'rerun_count': st.session_state.debug_rerun_count,
+                                'since_last_ms': round(delta * 1000, 1)})
+            
+            # Логируем, какие виджеты могли вызвать rerun
+            form_keys = [k for k in st.session_state.keys() if 'FormSubmitter' in k]
+            if form_keys:
+                logger.debug(f"📝 Формы в session_state: {form_keys}", extra=extra)
+            
+            # Проверяем изменения в критических переменных
+            watch_vars = ['show_ai_task', 'show_quest', 'show_story', 'generated_task']
+            for var in watch_vars:
+                if var in st.session_state:
+                    logger.debug(f"   {var} = {st.session_state[var]}", extra=extra)
         
         # Если rerun слишком частые
         if st.session_state.debug_rerun_count > 10 and delta < 0.5:
@@ -76,37 +85,33 @@ else:
     st.session_state.script_run_counter += 1
     logger.info(f"🔄 Script run #{st.session_state.script_run_counter}")
 
-# Логируем состояние сессии
-logger.debug(f"Session state keys: {list(st.session_state.keys())}")
+# Логируем состояние сессии (список ключей строим, только если DEBUG включён)
+if logger.isEnabledFor(logging.DEBUG):
+    logger.debug(f"Session state keys: {list(st.session_state.keys())}")
 
 # ИМПОРТЫ МОДУЛЕЙ
-from core.game_engine import GameEngine
-from core.points_system import PointsCalculator
-from ui.tabs.daily_tasks import render_daily_tasks
-from ui.tabs.rewards import render_rewards
-from ui.tabs.profile import render_profile
-from ui.tabs.family import render_family
-from ui.tabs.parent_dashboard import render_parent_dashboard
+from core.game_engine import GameEngine, RECENT_DAYS
 from ui.components import render_sidebar, load_css, render_add_child_form
-from ui.tabs.create_task import render_create_task, render_task_library
-from ui.tabs.achievements import render_achievements
-from ui.tabs.ai_tasks import render_ai_tasks
-from ui.tabs.child_connection import render_child_connection
-from ui.effects import add_custom_css
+from ui.navigation import select_view, render_child_views, render_create_task, render_task_library
+from ui.effects import add_custom_css, play_pending_effects, render_effects_toggle
 from core.parent_mode import ParentMode, render_parent_login, render_parent_panel
-from data.database import init_database, get_db_path, get_connection
+from data.database import get_db_path, get_connection
+from data.bootstrap import bootstrap_database
+from utils.background import start_background_jobs
 from typing import Optional, Dict, List
-from ui.auth.login_page import render_login_page
+from ui.auth.session import restore_session, end_session
 from core.auth_system import AuthSystem
 
-# Инициализация базы данных
-if 'db_initialized' not in st.session_state:
-    init_database()
-    st.session_state.db_initialized = True
+# Схема БД: проверяется один раз на процесс (data.bootstrap), новые сессии DDL не выполняют
+bootstrap_database()
+# Архив старых заданий, чистка приглашений и сверка баллов с журналом — фоновые потоки,
+# тоже по одному на процесс; их модули загружаются в фоне, а не при старте
+start_background_jobs()
 
 # === СИСТЕМА АУТЕНТИФИКАЦИИ ===
-# Проверяем, залогинен ли пользователь
-if 'current_user' not in st.session_state:
+# Проверяем, залогинен ли пользователь (после перезагрузки страницы — по токену сессии из cookie)
+if not restore_session():
+    from ui.auth.login_page import render_login_page
     render_login_page()
     st.stop()  # Останавливаем выполнение дальше
 
@@ -124,11 +129,12 @@ if current_user['user_type'] == 'child':
     # Устанавливаем текущего ребёнка
     st.session_state.current_child = current_user['id']
 else:
-    # Для родителя загружаем всех его детей
-    st.session_state.engine.load_family_data(current_user['id'])
-    # Если есть дети, устанавливаем первого как текущего
-    if st.session_state.engine.children:
-        st.session_state.current_child = list(st.session_state.engine.children.keys())[0]
+    # Для родителя — вся семья одним проходом (пока данные свежие, без запросов к БД)
+    st.session_state.engine.load_family_bulk(current_user['id'])
+    # Если текущий ребёнок не выбран (или больше не в семье), выбираем первого
+    if st.session_state.engine.children and \
+            st.session_state.get('current_child') not in st.session_state.engine.children:
+        st.session_state.current_child = next(iter(st.session_state.engine.children))
 
 # Инициализация родительского режима
 if 'parent_mode' not in st.session_state:
@@ -146,16 +152,14 @@ with col2:
     st.markdown(f"**{user_type_emoji} {current_user['user_type']}**")
 with col3:
     if st.button("🚪 Выйти"):
-        # Очищаем все данные сессии
-        keys_to_delete = ['current_user', 'current_child', 'engine', 'parent_authenticated']
-        for key in keys_to_delete:
-            if key in st.session_state:
-                del st.session_state[key]
+        # Отзываем токен и очищаем все данные сессии
+        end_session()
         st.rerun()
 
 # Загрузка стилей
 load_css()
 add_custom_css()
+play_pending_effects()
 
 # Родительский режим (только для родителей)
 if current_user['user_type'] == 'parent':
@@ -178,6 +182,10 @@ if st.checkbox("🔧 Показать отладочную информацию"
                 st.rerun()
         
         display_rerun_log()
+        render_log_level_control()
+        render_profiler_panel()
+        render_query_tracer_panel()
+        render_cache_panel()
         
         # Показываем ключевые переменные сессии
         st.subheader("📊 Session State")
@@ -202,117 +210,99 @@ if current_user['user_type'] == 'child':
     if st.session_state.current_child not in st.session_state.engine.children:
         st.error("Ошибка загрузки профиля. Пожалуйста, перезайдите.")
         if st.button("🔄 Перезайти"):
-            del st.session_state.current_user
+            end_session()
             st.rerun()
     else:
         # Боковая панель
         render_sidebar(st.session_state.engine, st.session_state.current_child)
         
-        # Вкладки для ребёнка
-        tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs([
-            "📋 Задания",
-            "✨ Создать",
-            "🤖 ИИ-задания",
-            "🏆 Достижения",
-            "🎁 Награды",
-            "👤 Профиль",
-            "👨‍👩‍👧 Семья",
-            "🔗 Подключить"
-        ])
-        
-        with tab1:
-            render_daily_tasks(st.session_state.engine, st.session_state.current_child)
-        
-        with tab2:
-            subtab1, subtab2 = st.tabs(["✏️ Своё задание", "📚 Готовые шаблоны"])
-            with subtab1:
-                render_create_task(st.session_state.engine, st.session_state.current_child)
-            with subtab2:
-                render_task_library(st.session_state.engine, st.session_state.current_child)
-        
-        with tab3:
-            render_ai_tasks(st.session_state.engine, st.session_state.current_child)
-        
-        with tab4:
-            render_achievements(st.session_state.engine, st.session_state.current_child)
-        
-        with tab5:
-            render_rewards(st.session_state.engine, st.session_state.current_child)
-        
-        with tab6:
-            render_profile(st.session_state.engine, st.session_state.current_child)
-        
-        with tab7:
-            render_family(st.session_state.engine, st.session_state.current_child)
-        
-        with tab8:
-            render_child_connection(st.session_state.engine, st.session_state.current_child)
+        # Разделы ребёнка (выполняется только выбранный)
+        render_child_views(st.session_state.engine, st.session_state.current_child)
 
 else:
     # === ИНТЕРФЕЙС ДЛЯ РОДИТЕЛЯ ===
     
     st.subheader("👨‍👩‍👧‍👦 Панель родителя")
     
-    # Получаем детей родителя
     auth = AuthSystem(get_db_path())
-    children = auth.get_children_for_parent(current_user['id'])
+    children = list(st.session_state.engine.children.values())
     
     if children:
         st.success(f"👋 У вас {len(children)} детей")
         
         # Выбор ребёнка для просмотра
-        child_options = {f"{c['name']} ({c['age']} лет)": c['id'] for c in children}
-        selected_child_name = st.selectbox("Выберите ребёнка", options=list(child_options.keys()))
+        child_options = {f"{c.name} ({c.age} лет)": c.id for c in children}
+        child_ids = list(child_options.values())
+        selected_child_name = st.selectbox(
+            "Выберите ребёнка", options=list(child_options.keys()),
+            index=child_ids.index(st.session_state.current_child) if st.session_state.current_child in child_ids else 0
+        )
         selected_child_id = child_options[selected_child_name]
         
-        # Обновляем текущего ребёнка
-        if st.session_state.current_child != selected_child_id:
-            st.session_state.current_child = selected_child_id
-            # Загружаем данные выбранного ребёнка в engine
-            st.session_state.engine.load_child_data(selected_child_id)
-            st.rerun()
+        # Переключение мгновенное: задания ребёнка уже загружены вместе с семьёй
+        st.session_state.current_child = selected_child_id
+        st.session_state.engine.select_child(selected_child_id)
         
-        # Вкладки для родителя
-        tab1, tab2, tab3, tab4 = st.tabs([
+        # Разделы родителя (выполняется только выбранный)
+        parent_view = select_view([
             "📊 Прогресс",
             "📝 Задания",
             "🔗 Пригласить",
             "⚙️ Настройки"
-        ])
+        ], key="parent_view")
         
-        with tab1:
+        if parent_view == "📊 Прогресс":
             st.subheader("📊 Прогресс ребёнка")
             
-            # Получаем данные о ребёнке
-            child = st.session_state.engine.children.get(selected_child_id)
+            family = st.session_state.engine.family
+            if family and selected_child_id in family.children:
+                # Всё уже загружено load_family_bulk
+                child = family.children[selected_child_id]
+                open_tasks = family.open_tasks[selected_child_id]
+                achievements = family.achievements[selected_child_id]
+                completed_tasks = family.completed_counts[selected_child_id]
+            else:
+                # Ребёнка нет в загруженной семье — читаем его обзор отдельно (data.async_repository)
+                from data.async_repository import load_child_overview
+                overview = load_child_overview(selected_child_id)
+                child = overview['child'] or st.session_state.engine.children.get(selected_child_id)
+                open_tasks = overview['tasks']
+                achievements = overview['achievements']
+                completed_tasks = st.session_state.engine.completed_count(selected_child_id)
+            
             if child:
-                col1, col2, col3 = st.columns(3)
+                col1, col2, col3, col4 = st.columns(4)
                 with col1:
                     st.metric("Баллы", child.points)
                 with col2:
                     st.metric("Уровень", child.level)
                 with col3:
                     st.metric("Дней подряд", child.streak_days)
+                with col4:
+                    st.metric("Достижения", len(achievements))
                 
                 # Статистика по заданиям
-                tasks = st.session_state.engine.get_daily_tasks(selected_child_id)
-                total_tasks = len(tasks)
-                completed_tasks = len([t for t in tasks if t.completed]) if tasks else 0
+                total_tasks = completed_tasks + len(open_tasks)
                 
                 if total_tasks > 0:
                     st.progress(completed_tasks / total_tasks, 
                                text=f"Выполнено {completed_tasks} из {total_tasks} заданий")
                 else:
                     st.info("У ребёнка пока нет заданий")
+                
+                if family and family.recent_completions.get(selected_child_id):
+                    st.markdown(f"#### ✅ Выполнено за {RECENT_DAYS} дней")
+                    for task in family.recent_completions[selected_child_id][:10]:
+                        st.write(f"{task.emoji} {task.title} — +{task.points}")
         
-        with tab2:
+        elif parent_view == "📝 Задания":
             st.subheader("📝 Управление заданиями")
             st.info("Здесь вы можете создавать задания для ребёнка")
             render_create_task(st.session_state.engine, selected_child_id)
             st.divider()
             render_task_library(st.session_state.engine, selected_child_id)
         
-        with tab3:
+        elif parent_view == "🔗 Пригласить":
             st.subheader("🔗 Пригласить ребёнка")
             
             if st.button("🎫 Сгенерировать код приглашения"):
@@ -331,8 +321,9 @@ else:
                 3. После подтверждения вы увидите его в списке детей
                 """)
         
-        with tab4:
+        elif parent_view == "⚙️ Настройки":
             st.subheader("⚙️ Настройки")
+            render_effects_toggle()
             
             # Смена пароля
             with st.form("change_password"):
@@ -355,11 +346,12 @@ else:
                         st.info("Функция смены пароля будет добавлена")
             
             if st.button("🚪 Выйти из аккаунта", use_container_width=True):
-                # Очищаем все данные сессии
-                keys_to_delete = ['current_user', 'current_child', 'engine', 'parent_authenticated']
-                for key in keys_to_delete:
-                    if key in st.session_state:
-                        del st.session_state[key]
+                # Отзываем токен и очищаем все данные сессии
+                end_session()
+                st.rerun()
+            if st.button("🔒 Выйти на всех устройствах", use_container_width=True,
+                         help="Отзывает все сессии аккаунта, например если вход остался на чужом устройстве"):
+                end_session(everywhere=True)
                 st.rerun()
     
     else:
@@ -373,4 +365,10 @@ else:
 
 # Footer
 st.markdown("---")
-st.markdown("🌟 *Каждое задание делает тебя сильнее!*")
\ No newline at end of file
+st.markdown("🌟 *Каждое задание делает тебя сильнее!*")
+
+log_event('rerun_finished', level=logging.DEBUG,
+          duration_ms=(time.perf_counter() - _rerun_started) * 1000,
+          user_type=current_user['user_type'])
+finish_rerun(st.session_state)
+end_trace_scope()
\ No newline at end of file
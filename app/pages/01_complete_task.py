@@ -34,10 +34,9 @@ def main():
     
     # Получаем задание
     task_id = st.session_state.selected_task_id_for_completion
-    tasks = engine.get_daily_tasks(child_id)
-    task = next((t for t in tasks if t.id == task_id), None)
+    task = engine.task_store.get(task_id) or engine.load_task(task_id)
     
-    if not task:
+    if not task or task.child_id != child_id:
         st.error("Задание не найдено")
         if st.button("← Вернуться к заданиям"):
             st.switch_page("app/main.py")
@@ -0,0 +1,78 @@
+"""
+Статические стили: минификация, хеш содержимого и однократная вставка за сессию
+
+CSS лежит в app/static/css. Вместо <style> в каждом rerun (он уходит в
+браузер при каждом запуске скрипта) стили один раз за сессию добавляются
+в <head> страницы; повторные rerun ничего не отправляют. Хеш содержимого —
+часть id тега: если стили поменялись, старый тег заменяется новым.
+
+FQ_CSS_INLINE=1 возвращает прежний способ (<style> в каждом rerun).
+"""
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from pathlib import Path
+from typing import Tuple
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+STATIC_DIR = Path(__file__).parent.parent / "static"
+CSS_DIR = STATIC_DIR / "css"
+CSS_INLINE = os.getenv("FQ_CSS_INLINE", "0") == "1"
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_SPACE_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"\s*([{};,>])\s*")
+# Объявление — текст до ';' или '}'; селектор (до '{') не трогаем: в нём
+# пробел перед ':' значим (".a :hover" — потомок, ".a:hover" — сам .a)
+_DECLARATION_RE = re.compile(r"[^{};]*[;}]")
+_COLON_RE = re.compile(r"\s*:\s*")
+
+
+def minify_css(css: str) -> str:
+    """Простая минификация: без комментариев, лишних пробелов и последних ';'"""
+    css = _COMMENT_RE.sub("", css)
+    css = _SPACE_RE.sub(" ", css)
+    css = _PUNCT_RE.sub(r"\1", css)
+    css = _DECLARATION_RE.sub(lambda m: _COLON_RE.sub(":", m.group()), css)
+    return css.replace(";}", "}").strip()
+
+@lru_cache(maxsize=None)
+def load_stylesheets(names: Tuple[str, ...]) -> Tuple[str, str]:
+    """Минифицированный бандл и хеш его содержимого (один раз на процесс)"""
+    css = "".join(minify_css((CSS_DIR / name).read_text(encoding="utf-8")) for name in names)
+    digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+    return css, digest
+
+def inject_css(group: str, *names: str):
+    """Подключить стили группы: один раз за сессию и заново — только если они изменились"""
+    css, digest = load_stylesheets(tuple(names))
+
+    if CSS_INLINE:
+        st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
+        return
+
+    injected = st.session_state.setdefault('_css_injected', {})
+    if injected.get(group) == digest:
+        return  # Уже в <head> страницы — ничего не отправляем
+
+    # Тег живёт в документе приложения, поэтому переживает rerun,
+    # даже когда сам компонент в следующий раз не отрисовывается
+    components.html(f"""
+    <script>
+    const doc = window.parent.document;
+    const id = "fq-css-{group}-{digest}";
+    if (!doc.getElementById(id)) {{
+        doc.querySelectorAll('style[data-fq-css="{group}"]').forEach(el => el.remove());
+        const style = doc.createElement("style");
+        style.id = id;
+        style.dataset.fqCss = "{group}";
+        style.textContent = {json.dumps(css)};
+        doc.head.appendChild(style);
+    }}
+    </script>
+    """, height=0)
+    injected[group] = digest
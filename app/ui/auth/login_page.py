@@ -4,6 +4,8 @@
 import streamlit as st
 from core.auth_system import AuthSystem
 from data.database import get_connection
+from ui.auth.session import start_session
+from core.invites import get_invite
 
 def render_login_page():
     """Главная страница аутентификации"""
@@ -36,7 +38,7 @@ def render_login_page():
             if st.form_submit_button("Войти", use_container_width=True):
                 user = auth.login(username, password)
                 if user:
-                    st.session_state.current_user = user
+                    start_session(user)
                     st.success(f"Добро пожаловать, {user['name']}!")
                     st.rerun()
                 else:
@@ -104,12 +106,16 @@ def render_login_page():
             st.warning("Сначала выйди из текущего аккаунта")
         else:
             with st.form("invite_form"):
-                invite_code = st.text_input("Введи код", placeholder="FAM-XXXXXX")
+                invite_code = st.text_input("Введи код", placeholder="FAM-XXXXXXX")
                 
                 if st.form_submit_button("Подключиться к родителям", use_container_width=True):
-                    st.session_state.pending_invite_code = invite_code
-                    st.session_state.show_invite_registration = True
-                    st.rerun()
+                    # Код проверяем до регистрации: опечатка отсекается без запроса к БД
+                    if get_invite(invite_code):
+                        st.session_state.pending_invite_code = invite_code
+                        st.session_state.show_invite_registration = True
+                        st.rerun()
+                    else:
+                        st.error("❌ Неверный или просроченный код")
     
     # Отдельная страница для регистрации по инвайту
     if st.session_state.get('show_invite_registration', False):
@@ -149,7 +155,7 @@ def render_login_page():
                             if auth.accept_invitation(st.session_state.pending_invite_code, user_id):
                                 # Автоматически логиним
                                 user = auth.login(username, password)
-                                st.session_state.current_user = user
+                                start_session(user)
                                 st.session_state.show_invite_registration = False
                                 del st.session_state.pending_invite_code
                                 st.success("✅ Ты подключён к родителям!")
@@ -0,0 +1,132 @@
+"""
+Сессия пользователя в Streamlit поверх подписанных токенов (core.session_tokens)
+
+После входа токен кладётся в session_state и в cookie браузера fq_session
+(SameSite=Strict, Secure на https): перезагрузка страницы или
+переподключение браузера открывает новую сессию Streamlit, и
+restore_session() поднимает пользователя по токену из cookie запроса
+WebSocket — без пароля. В адрес токен не попадает: ни в историю браузера,
+ни в логи прокси, ни в Referer. Проверка токена идёт в памяти; профиль
+берётся из кэша read-моделей (AuthSystem.get_user_by_id). Обычные rerun-ы
+токен не проверяют вовсе: пользователь уже в session_state.
+
+Streamlit не даёт выставить заголовок Set-Cookie, поэтому cookie пишет
+скрытый компонент, и флаг HttpOnly у неё выставить нельзя. Запись
+откладывается до следующего rerun (start_session/end_session обычно
+сразу вызывают st.rerun(), который не дал бы компоненту отрисоваться).
+
+Выход (end_session) отзывает токен этой сессии; end_session(everywhere=True)
+отзывает все токены пользователя (revoke_user_sessions).
+"""
+import json
+from http.cookies import SimpleCookie
+from typing import Dict, Optional
+import streamlit as st
+import streamlit.components.v1 as components
+
+from core.auth_system import AuthSystem
+from core.session_tokens import SESSION_TTL, issue_token, validate_token, revoke_token, revoke_user_sessions
+from utils.logger import logger
+
+SESSION_COOKIE = "fq_session"
+LEGACY_PARAM = "s"  # Раньше токен жил в адресе (?s=...)
+SESSION_KEYS = ['current_user', 'current_child', 'engine', 'parent_authenticated', 'session_token']
+
+
+def _get_cookie() -> Optional[str]:
+    """Токен из cookie запроса, которым браузер открыл WebSocket этой сессии"""
+    try:
+        from streamlit.web.server.websocket_headers import _get_websocket_headers
+        headers = _get_websocket_headers()
+    except Exception:
+        # Не под сервером Streamlit (AppTest, bare-режим) — cookie нет
+        return None
+    if not headers or not headers.get('Cookie'):
+        return None
+    cookie = SimpleCookie()
+    try:
+        cookie.load(headers['Cookie'])
+    except Exception:
+        return None
+    morsel = cookie.get(SESSION_COOKIE)
+    return morsel.value if morsel else None
+
+def _write_cookie(token: Optional[str]):
+    """Записать (или удалить) cookie сессии в браузере"""
+    max_age = SESSION_TTL if token else 0
+    components.html(f"""
+    <script>
+    const doc = window.parent.document;
+    const secure = window.parent.location.protocol === "https:" ? "; Secure" : "";
+    doc.cookie = "{SESSION_COOKIE}=" + {json.dumps(token or "")} +
+        "; Max-Age={max_age}; Path=/; SameSite=Strict" + secure;
+    </script>
+    """, height=0)
+
+def _queue_cookie(token: Optional[str]):
+    st.session_state['_session_cookie'] = token or ""
+
+def _drop_legacy_param():
+    """Убрать из адреса токен старого формата: он уже мог утечь, поэтому отзываем его"""
+    if hasattr(st, 'query_params'):
+        token = st.query_params.pop(LEGACY_PARAM, None)
+    else:
+        params = st.experimental_get_query_params()
+        token = (params.pop(LEGACY_PARAM, None) or [None])[0]
+        if token:
+            st.experimental_set_query_params(**params)
+    if token:
+        revoke_token(token)
+
+
+def start_session(user: Dict):
+    """Пользователь вошёл: сохранить его и выдать токен сессии"""
+    st.session_state.current_user = user
+    token = issue_token(user['id'], user['user_type'], user.get('session_version') or 0)
+    st.session_state.session_token = token
+    _queue_cookie(token)
+
+def restore_session() -> bool:
+    """Есть ли пользователь в сессии (при необходимости — поднять по токену из cookie)"""
+    pending = st.session_state.pop('_session_cookie', None)
+    if pending is not None:
+        _write_cookie(pending)
+    
+    if 'current_user' in st.session_state:
+        return True
+    
+    _drop_legacy_param()
+    token = _get_cookie()
+    # Cookie запроса не меняется до переподключения: отвергнутую не проверяем заново
+    if not token or token == st.session_state.get('_rejected_cookie'):
+        return False
+    claims = validate_token(token)
+    user = AuthSystem().get_user_by_id(claims.user_id) if claims else None
+    if not user or user['user_type'] != claims.user_type:
+        st.session_state['_rejected_cookie'] = token
+        if pending is None:
+            _write_cookie(None)
+        return False
+    
+    st.session_state.current_user = user
+    if claims.needs_renewal():
+        # Старый токен отзываем, чтобы в обращении был один
+        revoke_token(token)
+        token = issue_token(claims.user_id, claims.user_type, claims.version)
+        _write_cookie(token)
+    st.session_state.session_token = token
+    logger.info(f"🔑 Сессия пользователя {claims.user_id} восстановлена по токену")
+    return True
+
+def end_session(everywhere: bool = False):
+    """Выход: отозвать токен (или все токены пользователя) и очистить данные сессии"""
+    user = st.session_state.get('current_user')
+    if everywhere and user:
+        revoke_user_sessions(user['id'])
+        logger.info(f"🔑 Все сессии пользователя {user['id']} отозваны")
+    else:
+        revoke_token(st.session_state.get('session_token'))
+    _queue_cookie(None)
+    for key in SESSION_KEYS:
+        if key in st.session_state:
+            del st.session_state[key]
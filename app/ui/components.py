@@ -2,6 +2,12 @@
 Переиспользуемые компоненты интерфейса
 """
 import streamlit as st
+from utils.profiler import profiled
+from ui.assets import inject_css
+from utils.avatars import avatar_svg
+
+# st.fragment (1.37+) / st.experimental_fragment (1.33+); на старых версиях фрагментов нет
+_fragment_impl = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
 
 def safe_rerun():
     """Безопасный rerun для любой версии Streamlit"""
@@ -17,6 +23,38 @@ def safe_rerun():
             st.session_state.need_rerun = True
             st.stop()
 
+def fragment(func):
+    """Фрагмент: клик по виджету внутри перерисовывает только эту функцию
+    
+    Без поддержки фрагментов функция остаётся обычной (полный rerun).
+    """
+    if _fragment_impl is None:
+        return func
+    return _fragment_impl(func)
+
+def rerun_fragment():
+    """Перезапустить только текущий фрагмент (или всё приложение на старых версиях)"""
+    try:
+        st.rerun(scope="fragment")
+    except TypeError:
+        safe_rerun()
+
+def request_app_rerun():
+    """Из колбэка виджета во фрагменте: после него перерисовать всё приложение
+    
+    Колбэк сам вызвать st.rerun() не может — полный rerun делает
+    apply_app_rerun() в теле фрагмента. Без фрагментов колбэк и так
+    выполняется перед полным rerun, и ничего делать не нужно.
+    """
+    if _fragment_impl is not None:
+        st.session_state['_app_rerun_requested'] = True
+
+def apply_app_rerun():
+    """Полный rerun, если его запросил колбэк (request_app_rerun)"""
+    if st.session_state.pop('_app_rerun_requested', False):
+        safe_rerun()
+
+@profiled('render_sidebar')
 def render_sidebar(engine, child_id):
     """Отображение боковой панели с информацией о ребёнке"""
     child = engine.children.get(child_id)
@@ -25,25 +63,28 @@ def render_sidebar(engine, child_id):
         return
     
     with st.sidebar:
-        st.image(child.avatar if hasattr(child, 'avatar') else f"https://api.dicebear.com/7.x/adventurer/svg?seed={child.name}", width=100)
+        st.image(avatar_svg(getattr(child, 'avatar', None), child.name), width=100)
         st.markdown(f"### {child.name}")
-        
-        # Прогресс-бар уровня
-        points_in_level = child.points % 100
-        st.progress(points_in_level / 100)
-        st.caption(f"Уровень {child.level} • {points_in_level}%")
-        
-        # Метрики
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("⭐ Баллы", child.points)
-        with col2:
-            st.metric("🔥 Дней", child.streak_days)
+        render_sidebar_metrics(child)
         
         st.markdown("---")
         if child.interests:
             st.caption(f"🎯 Интересы: {', '.join(child.interests)}")
 
+def render_sidebar_metrics(child):
+    """Прогресс уровня и метрики ребёнка (в текущем контейнере — боковой панели)"""
+    # Прогресс-бар уровня
+    points_in_level = child.points % 100
+    st.progress(points_in_level / 100)
+    st.caption(f"Уровень {child.level} • {points_in_level}%")
+    
+    # Метрики
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("⭐ Баллы", child.points)
+    with col2:
+        st.metric("🔥 Дней", child.streak_days)
+
 def render_child_selector(engine):
     """Компонент для выбора и добавления детей"""
     st.markdown("### 👥 Дети")
@@ -130,45 +171,5 @@ def render_add_child_form(engine):
                 safe_rerun()
 
 def load_css():
-    """Загрузка кастомных CSS стилей"""
-    st.markdown("""
-    <style>
-        /* Основные стили */
-        .stButton > button {
-            width: 100%;
-            border-radius: 10px;
-            height: 3em;
-            font-size: 1.1em;
-        }
-        
-        /* Карточки заданий */
-        .task-card {
-            background: white;
-            padding: 1.5rem;
-            border-radius: 15px;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-            margin: 1rem 0;
-            transition: transform 0.2s;
-        }
-        .task-card:hover {
-            transform: translateY(-2px);
-            box-shadow: 0 6px 12px rgba(0,0,0,0.15);
-        }
-        
-        /* Анимации */
-        @keyframes bounce {
-            0%, 100% { transform: translateY(0); }
-            50% { transform: translateY(-5px); }
-        }
-        .emoji-bounce {
-            animation: bounce 1s infinite;
-        }
-        
-        /* Мобильная адаптация */
-        @media (max-width: 768px) {
-            .stButton > button {
-                font-size: 0.9em;
-            }
-        }
-    </style>
-    """, unsafe_allow_html=True)
\ No newline at end of file
+    """Загрузка кастомных CSS стилей (app/static/css/base.css, один раз за сессию)"""
+    inject_css("base", "base.css")
@@ -1,61 +1,132 @@
 """
 Визуальные и звуковые эффекты
+
+Анимации целиком на стороне браузера (CSS-классы из app/static/css):
+скрипт только отправляет разметку и сразу продолжает работу — никаких
+time.sleep в потоке сервера. Эффекты можно выключить для пользователя,
+тогда не отправляются ни разметка, ни CSS анимаций.
 """
 import streamlit as st
-import time
 import random
+import sqlite3
+
+from data.database import get_connection
+from ui.assets import inject_css
+from utils.logger import logger
+
+EFFECTS_SETTING_PREFIX = "effects_enabled:"
+
+def _current_user_id():
+    user = st.session_state.get('current_user')
+    return user['id'] if user else None
+
+def effects_enabled(user_id: int = None) -> bool:
+    """Включены ли эффекты у пользователя (читаем из БД один раз за сессию)"""
+    user_id = user_id if user_id is not None else _current_user_id()
+    if user_id is None:
+        return True
+    
+    cache = st.session_state.setdefault('effects_enabled', {})
+    if user_id in cache:
+        return cache[user_id]
+    
+    enabled = True
+    conn = get_connection()
+    try:
+        row = conn.execute(
+            'SELECT value FROM app_settings WHERE key = ?',
+            (f"{EFFECTS_SETTING_PREFIX}{user_id}",)
+        ).fetchone()
+        if row is not None:
+            enabled = row['value'] != '0'
+    except sqlite3.Error as e:
+        logger.error(f"Database error in effects_enabled: {e}")
+    finally:
+        conn.close()
+    
+    cache[user_id] = enabled
+    return enabled
+
+def set_effects_enabled(user_id: int, enabled: bool) -> bool:
+    """Сохранить настройку эффектов пользователя"""
+    conn = get_connection()
+    try:
+        conn.execute('''
+            INSERT INTO app_settings (key, value, updated_at)
+            VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at
+        ''', (f"{EFFECTS_SETTING_PREFIX}{user_id}", '1' if enabled else '0'))
+        conn.commit()
+    except sqlite3.Error as e:
+        logger.error(f"Database error in set_effects_enabled: {e}")
+        return False
+    finally:
+        conn.close()
+    
+    st.session_state.setdefault('effects_enabled', {})[user_id] = enabled
+    return True
+
+def render_effects_toggle():
+    """Переключатель эффектов текущего пользователя"""
+    user_id = _current_user_id()
+    if user_id is None:
+        return
+    
+    current = effects_enabled(user_id)
+    enabled = st.toggle("✨ Анимации и эффекты", value=current, key="effects_toggle",
+                        help="Выключите, чтобы страница работала легче")
+    if enabled != current:
+        set_effects_enabled(user_id, enabled)
+
+def queue_effect(name: str, message: str = None, **params):
+    """Показать эффект после st.rerun() (иначе rerun сотрёт его сразу)"""
+    st.session_state.setdefault('pending_effects', []).append((name, message, params))
+
+def play_pending_effects():
+    """Проиграть эффекты, отложенные до этого rerun"""
+    pending = st.session_state.pop('pending_effects', None)
+    if not pending:
+        return
+    
+    players = {
+        'success': play_success_effect,
+        'level_up': play_level_up_effect,
+        'achievement': play_achievement_effect,
+    }
+    for name, message, params in pending:
+        player = players.get(name)
+        if player:
+            player(**params)
+        if message:
+            st.success(message)
 
 def play_success_effect():
     """Эффект при успешном выполнении"""
-    col1, col2, col3 = st.columns(3)
-    with col2:
-        st.balloons()
-        st.markdown("""
-        <div style="
-            animation: bounce 0.5s;
-            text-align: center;
-            font-size: 3rem;
-        ">
-            🎉✨🌟
-        </div>
-        """, unsafe_allow_html=True)
-        time.sleep(0.5)
+    if not effects_enabled():
+        return
+    st.balloons()
+    st.markdown('<div class="fq-effect fq-success">🎉✨🌟</div>', unsafe_allow_html=True)
 
 def play_level_up_effect(level):
     """Эффект при повышении уровня"""
-    st.snow()
+    if effects_enabled():
+        st.snow()
     st.markdown(f"""
-    <div style="
-        animation: pulse 1s;
-        text-align: center;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 2rem;
-        border-radius: 20px;
-        margin: 1rem 0;
-    ">
+    <div class="fq-banner fq-level-up">
         <h1>🎊 УРОВЕНЬ {level} 🎊</h1>
-        <p style="font-size: 2rem;">⭐"Ты становишься сильнее!"⭐</p>
+        <p>⭐"Ты становишься сильнее!"⭐</p>
     </div>
     """, unsafe_allow_html=True)
 
 def play_achievement_effect(achievement_name):
     """Эффект при получении достижения"""
-    st.balloons()
-    st.snow()
+    if effects_enabled():
+        st.balloons()
+        st.snow()
     st.markdown(f"""
-    <div style="
-        animation: shake 0.5s;
-        text-align: center;
-        background: gold;
-        color: black;
-        padding: 1.5rem;
-        border-radius: 15px;
-        margin: 1rem 0;
-        border: 3px solid orange;
-    ">
+    <div class="fq-banner fq-achievement">
         <h2>🏆 НОВОЕ ДОСТИЖЕНИЕ! 🏆</h2>
-        <p style="font-size: 1.5rem;">{achievement_name}</p>
+        <p>{achievement_name}</p>
     </div>
     """, unsafe_allow_html=True)
 
@@ -73,37 +144,8 @@ def show_motivation_message():
     st.info(random.choice(messages))
 
 def add_custom_css():
-    """Добавление CSS-анимаций"""
-    st.markdown("""
-    <style>
-        @keyframes bounce {
-            0%, 100% { transform: translateY(0); }
-            50% { transform: translateY(-20px); }
-        }
-        
-        @keyframes pulse {
-            0% { transform: scale(1); }
-            50% { transform: scale(1.05); }
-            100% { transform: scale(1); }
-        }
-        
-        @keyframes shake {
-            0%, 100% { transform: translateX(0); }
-            25% { transform: translateX(-10px); }
-            75% { transform: translateX(10px); }
-        }
-        
-        @keyframes spin {
-            from { transform: rotate(0deg); }
-            to { transform: rotate(360deg); }
-        }
-        
-        .sparkle {
-            animation: spin 2s linear infinite;
-        }
-        
-        .glow {
-            animation: pulse 2s infinite;
-        }
-    </style>
-    """, unsafe_allow_html=True)
+    """Добавление CSS-анимаций (app/static/css; без анимаций, если эффекты выключены)"""
+    if effects_enabled():
+        inject_css("effects", "effects.css", "animations.css")
+    else:
+        inject_css("effects", "effects.css")
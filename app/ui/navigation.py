@@ -0,0 +1,81 @@
+"""
+Навигация по разделам: за один rerun выполняется только выбранный раздел
+
+st.tabs выполняет код всех вкладок при каждом rerun (скрыты они только в
+браузере), поэтому разделы переключаются радиокнопками, а отрисовывается
+лишь активный.
+
+Модули разделов импортируются при первом открытии раздела (lazy_view):
+тяжёлые зависимости вроде core.ai_generator (requests, urllib3, dotenv)
+не грузятся, пока до них не дошли, и не замедляют первый запуск и вход.
+"""
+import importlib
+from typing import Callable, Dict, List
+import streamlit as st
+
+
+class lazy_view:
+    """Функция отрисовки из модуля, который импортируется при первом вызове"""
+
+    def __init__(self, module: str, name: str):
+        self.module = module
+        self.name = name
+        self._func = None
+
+    def __call__(self, *args, **kwargs):
+        if self._func is None:
+            self._func = getattr(importlib.import_module(self.module), self.name)
+        return self._func(*args, **kwargs)
+
+    def __repr__(self):
+        return f"lazy_view({self.module}.{self.name})"
+
+
+render_create_task = lazy_view("ui.tabs.create_task", "render_create_task")
+render_task_library = lazy_view("ui.tabs.create_task", "render_task_library")
+
+
+def select_view(views: List[str], key: str) -> str:
+    """Переключатель разделов; выбор хранится в session_state и переживает rerun"""
+    state_key = f"{key}_active"
+    current = st.session_state.get(state_key)
+    if current not in views:
+        current = views[0]
+
+    selected = st.radio(
+        "Раздел",
+        options=views,
+        index=views.index(current),
+        horizontal=True,
+        key=f"{key}_selector",
+        label_visibility="collapsed"
+    )
+    # Отдельный ключ: состояние виджета Streamlit удаляет, если виджет
+    # пропал со страницы хотя бы на один rerun
+    st.session_state[state_key] = selected
+    return selected
+
+def _render_create(engine, child_id):
+    view = select_view(["✏️ Своё задание", "📚 Готовые шаблоны"], key="child_create_view")
+    if view == "✏️ Своё задание":
+        render_create_task(engine, child_id)
+    else:
+        render_task_library(engine, child_id)
+
+# Разделы ребёнка: подпись -> функция отрисовки (engine, child_id)
+CHILD_VIEWS: Dict[str, Callable] = {
+    "📋 Задания": lazy_view("ui.tabs.daily_tasks", "render_daily_tasks"),
+    "✨ Создать": _render_create,
+    "🤖 ИИ-задания": lazy_view("ui.tabs.ai_tasks", "render_ai_tasks"),
+    "📜 История": lazy_view("ui.tabs.history", "render_history"),
+    "🏆 Достижения": lazy_view("ui.tabs.achievements", "render_achievements"),
+    "🎁 Награды": lazy_view("ui.tabs.rewards", "render_rewards"),
+    "👤 Профиль": lazy_view("ui.tabs.profile", "render_profile"),
+    "👨‍👩‍👧 Семья": lazy_view("ui.tabs.family", "render_family"),
+    "🔗 Подключить": lazy_view("ui.tabs.child_connection", "render_child_connection"),
+}
+
+def render_child_views(engine, child_id):
+    """Разделы ребёнка: отрисовывается только выбранный"""
+    view = select_view(list(CHILD_VIEWS), key="child_view")
+    CHILD_VIEWS[view](engine, child_id)
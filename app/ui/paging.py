@@ -0,0 +1,48 @@
+"""
+Списки с кнопкой «Показать ещё» поверх постраничных запросов (data.task_pages)
+
+Загруженные страницы хранятся в session_state: rerun не перечитывает весь
+список, а «Показать ещё» догружает только следующую страницу по токену.
+Если задания ребёнка изменились (сброс тега кэша — выполнение, новое
+задание), список перечитывается одним запросом того же размера, что был
+показан, чтобы не откатываться к первой странице.
+"""
+from typing import Callable, Iterable, List
+import streamlit as st
+
+from data.task_pages import TASK_PAGE_SIZE, MAX_PAGE_SIZE
+from utils.cache import tag_versions
+
+
+def paged_items(key: str, fetch: Callable, tags: Iterable[str]) -> List:
+    """Загруженные элементы списка
+
+    fetch(token, limit) -> TaskPage; tags — теги кэша, при сбросе которых
+    список перечитывается.
+    """
+    versions = tag_versions(tags)
+    state = st.session_state.get(key)
+    if state is None or state['versions'] != versions:
+        shown = len(state['items']) if state else 0
+        page = fetch(None, min(max(TASK_PAGE_SIZE, shown), MAX_PAGE_SIZE))
+        state = st.session_state[key] = {
+            'items': list(page.tasks),
+            'next': page.next_token,
+            'versions': versions,
+        }
+    return state['items']
+
+def _load_more(key: str, fetch: Callable):
+    state = st.session_state.get(key)
+    if not state or not state['next']:
+        return
+    page = fetch(state['next'], TASK_PAGE_SIZE)
+    state['items'].extend(page.tasks)
+    state['next'] = page.next_token
+
+def render_load_more(key: str, fetch: Callable, label: str = "⬇️ Показать ещё"):
+    """Кнопка следующей страницы (если она есть); догрузка — в колбэке, до перерисовки"""
+    state = st.session_state.get(key)
+    if state and state['next']:
+        st.button(label, key=f"{key}_more", use_container_width=True,
+                  on_click=_load_more, args=(key, fetch))
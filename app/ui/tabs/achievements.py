@@ -2,7 +2,9 @@
 Вкладка с достижениями
 """
 import streamlit as st
+from utils.profiler import profiled
 
+@profiled('render_achievements')
 def render_achievements(engine, child_id):
     st.subheader("🏆 Мои достижения")
     
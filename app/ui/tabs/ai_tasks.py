@@ -3,11 +3,12 @@
 """
 import streamlit as st
 import json
-from core.ai_generator import AITaskGenerator
-from ui.effects import play_success_effect
+from ui.effects import queue_effect
 from datetime import datetime
 from utils.logger import logger, log_function_call
+from utils.profiler import profiled
 
+@profiled('render_ai_tasks')
 def render_ai_tasks(engine, child_id):
     """Основная функция вкладки AI-заданий"""
     st.subheader("🤖 Умные задания от ИИ")
@@ -19,6 +20,9 @@ def render_ai_tasks(engine, child_id):
     
     # Инициализируем генератор (только один раз)
     if 'ai_generator' not in st.session_state:
+        # Клиент GigaChat (requests, urllib3, dotenv) грузим только при первом открытии раздела
+        from core.ai_generator import AITaskGenerator
+        
         with st.spinner("🔄 Подключаюсь к GigaChat..."):
             try:
                 st.session_state.ai_generator = AITaskGenerator()
@@ -165,8 +169,8 @@ def render_display_mode(generator, child, engine):
                 "due_date": None
             }
             engine.save_task_to_db(task_data)
-            play_success_effect()
-            st.success("✅ Задание добавлено в список!")
+            # Эффект покажем после rerun — иначе он сразу исчезнет
+            queue_effect('success', message="✅ Задание добавлено в список!")
             st.session_state.ai_mode = 'input'
             if 'generated_task' in st.session_state:
                 del st.session_state.generated_task
@@ -277,8 +281,8 @@ def render_daily_quest(generator, child, engine):
                         "due_date": None
                     }
                     engine.save_task_to_db(task_data)
-                play_success_effect()
-                st.success(f"✅ Все {len(tasks)} заданий добавлены!")
+                # Эффект покажем после rerun — иначе он сразу исчезнет
+                queue_effect('success', message=f"✅ Все {len(tasks)} заданий добавлены!")
                 st.session_state.quest_mode = 'input'
                 if 'generated_quest' in st.session_state:
                     del st.session_state.generated_quest
@@ -343,8 +347,8 @@ def render_story_task(generator, child, engine):
                     "due_date": None
                 }
                 engine.save_task_to_db(task_data)
-                play_success_effect()
-                st.success("✅ Миссия принята! Удачи, герой!")
+                # Эффект покажем после rerun — иначе он сразу исчезнет
+                queue_effect('success', message="✅ Миссия принята! Удачи, герой!")
                 st.session_state.story_mode = 'input'
                 if 'story_task' in st.session_state:
                     del st.session_state.story_task
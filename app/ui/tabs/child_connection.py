@@ -4,7 +4,9 @@
 import streamlit as st
 from core.auth_system import AuthSystem
 from data.database import get_connection
+from utils.profiler import profiled
 
+@profiled('render_child_connection')
 def render_child_connection(engine, child_id):
     st.subheader("🔗 Подключиться к родителям")
     
@@ -24,7 +26,7 @@ def render_child_connection(engine, child_id):
     if st.session_state.get('show_invite_form', False) or not parents:
         with st.form("connect_parent"):
             invite_code = st.text_input("Введите код приглашения от родителей", 
-                                       placeholder="FAM-XXXXXX",
+                                       placeholder="FAM-XXXXXXX",
                                        help="Код можно получить у родителей")
             
             col1, col2 = st.columns(2)
@@ -41,7 +41,7 @@ def render_child_registration(engine):
         # Поле для кода приглашения (если есть)
         st.markdown("### 🔗 Есть код приглашения от родителей?")
         invite_code = st.text_input("Введи код (если есть)", 
-                                    placeholder="FAM-XXXXXX",
+                                    placeholder="FAM-XXXXXXX",
                                     value=st.session_state.pending_invite if st.session_state.pending_invite else "")
         
         if st.form_submit_button("✨ Создать мой профиль", type="primary", use_container_width=True):
@@ -3,8 +3,10 @@
 """
 import streamlit as st
 from datetime import datetime, timedelta
-from ui.components import safe_rerun
+from ui.components import fragment
+from utils.profiler import profiled
 
+@profiled('render_create_task')
 def render_create_task(engine, child_id):
     st.subheader("✨ Создать своё задание")
     
@@ -81,10 +83,35 @@ def render_create_task(engine, child_id):
             else:
                 st.error("Заполни название и описание!")
 
+def _add_template(engine, child_id, template):
+    """Колбэк кнопки шаблона: добавить задание до перерисовки фрагмента"""
+    task_data = {
+        "title": template['title'],
+        "description": template['desc'],
+        "category": template['category'],
+        "points": template['points'],
+        "difficulty": template['difficulty'],
+        "emoji": template['emoji'],
+        "photo_required": False,
+        "child_id": child_id,
+        "due_date": None
+    }
+    engine.save_task_to_db(task_data)
+    st.session_state.template_added = template['title']
+
+@profiled('render_task_library')
 def render_task_library(engine, child_id):
     """Библиотека готовых заданий"""
+    _render_task_library(engine, child_id)
+
+@fragment
+def _render_task_library(engine, child_id):
     st.subheader("📚 Библиотека заданий")
     
+    added = st.session_state.pop('template_added', None)
+    if added:
+        st.success(f"✅ Задание «{added}» добавлено!")
+    
     # Готовые шаблоны заданий
     templates = [
         {"title": "Убрать в комнате", "desc": "Пылесос, протереть пыль, сложить вещи", 
@@ -118,18 +145,6 @@ def render_task_library(engine, child_id):
                 </div>
                 """, unsafe_allow_html=True)
                 
-                if st.button(f"➕ Добавить", key=f"add_template_{idx}"):
-                    task_data = {
-                        "title": template['title'],
-                        "description": template['desc'],
-                        "category": template['category'],
-                        "points": template['points'],
-                        "difficulty": template['difficulty'],
-                        "emoji": template['emoji'],
-                        "photo_required": False,
-                        "child_id": child_id,
-                        "due_date": None
-                    }
-                    engine.save_task_to_db(task_data)
-                    st.success(f"✅ Задание добавлено!")
-                    safe_rerun()
+                # Сохраняет колбэк, перерисовывается только библиотека
+                st.button(f"➕ Добавить", key=f"add_template_{idx}",
+                          on_click=_add_template, args=(engine, child_id, template))
@@ -1,10 +1,22 @@
 """
 Вкладка с ежедневными заданиями (исправленная версия)
+
+Список заданий — фрагмент: выбор задания и отмена перерисовывают только
+список, а не весь main.py. Выполнение меняет баллы и уровень в боковой
+панели вне фрагмента, поэтому после него приложение перерисовывается
+целиком. Задания грузятся страницами (ui.paging): у ребёнка с сотнями
+заданий рисуется только первая.
 """
 import streamlit as st
 from ui.effects import play_success_effect
+from ui.components import fragment, rerun_fragment, request_app_rerun, apply_app_rerun
 from utils.logger import logger, log_function_call
+from utils.profiler import profiled
+from utils.cache import tasks_tag
+from ui.paging import paged_items, render_load_more
+from data.task_pages import open_tasks_page, task_counts
 
+@profiled('render_daily_tasks')
 def render_daily_tasks(engine, child_id):
     """Отображение ежедневных заданий"""
     log_function_call("render_daily_tasks")
@@ -18,8 +30,36 @@ def render_daily_tasks(engine, child_id):
     if 'completing_task_id' not in st.session_state:
         st.session_state.completing_task_id = None
     
-    # ПОЛУЧАЕМ ЗАДАНИЯ
-    tasks = engine.get_daily_tasks(child_id)
+    render_task_list(engine, child_id)
+
+def _select_task(task_id):
+    st.session_state.completing_task_id = task_id
+
+def _complete_task(engine, task_id, child_id):
+    """Колбэк кнопки подтверждения: выполняется до перерисовки фрагмента"""
+    result = engine.complete_task(task_id, child_id)
+    points = result['points'] if isinstance(result, dict) else result
+    st.session_state.completing_task_id = None
+    st.session_state.completion_result = points
+    # Баллы и уровень в боковой панели — вне фрагмента
+    request_app_rerun()
+
+@fragment
+def render_task_list(engine, child_id):
+    """Список заданий и экран подтверждения (перерисовываются без полного rerun)"""
+    apply_app_rerun()
+    child = engine.children.get(child_id)
+    
+    # Результат подтверждения из колбэка: эффект и новый баланс
+    points = st.session_state.pop('completion_result', None)
+    if points is not None:
+        play_success_effect()
+        st.success(f"✅ Отлично! +{points} баллов! Теперь у тебя {child.points} ⭐")
+    
+    # ПОЛУЧАЕМ ЗАДАНИЯ: постранично, следующая страница — по кнопке «Показать ещё»
+    pages_key = f"daily_tasks_{child_id}"
+    fetch = lambda token, limit: open_tasks_page(child_id, token, limit)
+    tasks = paged_items(pages_key, fetch, [tasks_tag(child_id)])
     incomplete_tasks = [t for t in tasks if not t.completed]
     
     if not incomplete_tasks:
@@ -41,51 +81,33 @@ def render_daily_tasks(engine, child_id):
                 
                 if photo:
                     with st.spinner("Обрабатываем..."):
-                        # Вызываем complete_task без параметра photo_url или с корректным
-                        result = engine.complete_task(task.id, child_id)
-                        points = result['points'] if isinstance(result, dict) else result
-                        
-                        play_success_effect()
-                        st.success(f"✅ Молодец! +{points} баллов!")
-                        
-                        # Сбрасываем состояние
-                        st.session_state.completing_task_id = None
-                        st.rerun()
+                        _complete_task(engine, task.id, child_id)
+                        apply_app_rerun()
+                        rerun_fragment()  # Без фрагментов — обычный полный rerun
             
             else:
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.button("✅ Да, я выполнил", key="confirm_completion_unique", use_container_width=True):
-                        with st.spinner("Обрабатываем..."):
-                            result = engine.complete_task(task.id, child_id)
-                            points = result['points'] if isinstance(result, dict) else result
-                            
-                            play_success_effect()
-                            st.success(f"✅ Отлично! +{points} баллов!")
-                            
-                            st.session_state.completing_task_id = None
-                            st.rerun()
+                    st.button("✅ Да, я выполнил", key="confirm_completion_unique", use_container_width=True,
+                              on_click=_complete_task, args=(engine, task.id, child_id))
                 
                 with col2:
-                    if st.button("❌ Отмена", key="cancel_completion_unique", use_container_width=True):
-                        st.session_state.completing_task_id = None
-                        st.rerun()
+                    st.button("❌ Отмена", key="cancel_completion_unique", use_container_width=True,
+                              on_click=_select_task, args=(None,))
             
             # Добавляем кнопку возврата к списку
-            if st.button("← Вернуться к списку заданий", key="back_to_list_unique"):
-                st.session_state.completing_task_id = None
-                st.rerun()
-        
-        else:
-            # Задание не найдено - сбрасываем
-            st.session_state.completing_task_id = None
-            st.rerun()
+            st.button("← Вернуться к списку заданий", key="back_to_list_unique",
+                      on_click=_select_task, args=(None,))
+            
+            return  # ВАЖНО: выходим, не показывая список
         
-        return  # ВАЖНО: выходим, не показывая список
+        # Задание не найдено - сбрасываем и показываем список
+        st.session_state.completing_task_id = None
     
     # ПОКАЗЫВАЕМ СПИСОК НЕВЫПОЛНЕННЫХ ЗАДАНИЙ
     st.subheader(f"📋 Задания для {child.name}")
-    st.caption(f"Осталось выполнить: {len(incomplete_tasks)}")
+    counts = task_counts(child_id)
+    st.caption(f"Осталось выполнить: {counts['open'] if counts else len(incomplete_tasks)}")
     
     for task in incomplete_tasks:
         with st.container():
@@ -101,9 +123,11 @@ def render_daily_tasks(engine, child_id):
                 st.markdown(f"⭐ {task.points} баллов")
             
             with col3:
-                # УНИКАЛЬНЫЙ КЛЮЧ для каждой кнопки
-                if st.button("✅", key=f"complete_{task.id}", help="Отметить выполненным"):
-                    st.session_state.completing_task_id = task.id
-                    st.rerun()
+                # УНИКАЛЬНЫЙ КЛЮЧ для каждой кнопки; состояние меняет колбэк,
+                # поэтому отдельный st.rerun() не нужен
+                st.button("✅", key=f"complete_{task.id}", help="Отметить выполненным",
+                          on_click=_select_task, args=(task.id,))
             
-            st.divider()
\ No newline at end of file
+            st.divider()
+    
+    render_load_more(pages_key, fetch)
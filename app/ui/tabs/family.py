@@ -2,7 +2,9 @@
 Вкладка семейного соревнования
 """
 import streamlit as st
+from utils.profiler import profiled
 
+@profiled('render_family')
 def render_family(engine, child_id):
     st.subheader("👨‍👩‍👧 Семейный зачёт")
     
@@ -10,18 +12,19 @@ def render_family(engine, child_id):
         st.info("Добавьте членов семьи в настройках")
         return
     
-    # Сортируем детей по баллам
-    sorted_children = sorted(
-        engine.children.values(), 
-        key=lambda x: x.points, 
-        reverse=True
-    )
+    # Турнирная таблица из кэшируемой read-модели (общей для всех сессий семьи)
+    leaderboard = engine.get_family_leaderboard(child_id)
+    if not leaderboard:
+        leaderboard = [
+            {'id': c.id, 'name': c.name, 'points': c.points, 'level': c.level}
+            for c in sorted(engine.children.values(), key=lambda x: x.points, reverse=True)
+        ]
     
     st.markdown("### 🏆 Турнирная таблица")
     
-    for idx, child in enumerate(sorted_children, 1):
+    for idx, child in enumerate(leaderboard, 1):
         medal = "🥇" if idx == 1 else "🥈" if idx == 2 else "🥉" if idx == 3 else "📱"
-        highlight = child.id == child_id
+        highlight = child['id'] == child_id
         
         if highlight:
             st.markdown(f"""
@@ -32,7 +35,7 @@ def render_family(engine, child_id):
                 margin: 0.2rem 0;
                 border: 2px solid #4A90E2;
             ">
-                {medal} <b>{child.name}</b> — {child.points} ⭐ (уровень {child.level})
+                {medal} <b>{child['name']}</b> — {child['points']} ⭐ (уровень {child['level']})
             </div>
             """, unsafe_allow_html=True)
         else:
@@ -43,7 +46,7 @@ def render_family(engine, child_id):
                 border-radius: 5px;
                 margin: 0.2rem 0;
             ">
-                {medal} {child.name} — {child.points} ⭐ (уровень {child.level})
+                {medal} {child['name']} — {child['points']} ⭐ (уровень {child['level']})
             </div>
             """, unsafe_allow_html=True)
     
@@ -0,0 +1,48 @@
+"""
+Вкладка истории выполненных заданий
+
+История грузится страницами (ui.paging, data.task_pages.history_page):
+последние выполненные сверху, остальное — по кнопке «Показать ещё».
+Фильтр по категории — отдельный постраничный список со своим токеном.
+"""
+import streamlit as st
+from utils.profiler import profiled
+from utils.cache import tasks_tag
+from ui.paging import paged_items, render_load_more
+from data.task_pages import history_page, task_counts
+
+ALL_CATEGORIES = "Все категории"
+
+@profiled('render_history')
+def render_history(engine, child_id):
+    """Выполненные задания ребёнка, последние сверху"""
+    st.subheader("📜 История заданий")
+    
+    labels = {ALL_CATEGORIES: None}
+    labels.update({f"{c['emoji']} {c['name']}": key for key, c in engine.categories.items()})
+    category = labels[st.selectbox("Категория", list(labels), key=f"history_category_{child_id}")]
+    
+    pages_key = f"history_{child_id}_{category or 'all'}"
+    fetch = lambda token, limit: history_page(child_id, token, limit, category)
+    tasks = paged_items(pages_key, fetch, [tasks_tag(child_id)])
+    
+    if not tasks:
+        st.info("Здесь появятся выполненные задания")
+        return
+    
+    if category is None:
+        counts = task_counts(child_id)
+        st.caption(f"Выполнено заданий: {counts['completed'] if counts else len(tasks)}")
+    
+    for task in tasks:
+        col1, col2, col3 = st.columns([1, 4, 2])
+        with col1:
+            st.markdown(f"### {task.emoji}")
+        with col2:
+            st.markdown(f"**{task.title}**")
+            if task.completed_at:
+                st.caption(f"Выполнено: {str(task.completed_at)[:16]}")
+        with col3:
+            st.markdown(f"⭐ +{task.points}")
+    
+    render_load_more(pages_key, fetch)
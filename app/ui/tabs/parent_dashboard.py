@@ -4,7 +4,11 @@
 import streamlit as st
 from core.auth_system import AuthSystem
 from data.database import get_connection
+from utils.avatars import avatar_svg
+from ui.auth.session import end_session
+from utils.profiler import profiled
 
+@profiled('render_parent_dashboard')
 def render_parent_dashboard(engine):
     st.subheader("👨‍👩‍👧‍👦 Родительский кабинет")
     
@@ -38,8 +42,7 @@ def render_parent_dashboard(engine):
                 with st.container():
                     col1, col2, col3 = st.columns([1, 3, 1])
                     with col1:
-                        avatar = child.get('avatar', f"https://api.dicebear.com/7.x/adventurer/svg?seed={child['name']}")
-                        st.image(avatar, width=50)
+                        st.image(avatar_svg(child.get('avatar'), child['name']), width=50)
                     with col2:
                         st.markdown(f"**{child['name']}** ({child['age']} лет)")
                         st.caption(f"Баллов: {child.get('points', 0)} • Уровень: {child.get('level', 1)}")
@@ -102,7 +105,5 @@ def render_parent_dashboard(engine):
                     st.info("Функция смены пароля будет добавлена")
         
         if st.button("🚪 Выйти из аккаунта", use_container_width=True):
-            del st.session_state.current_user
-            if 'current_child' in st.session_state:
-                del st.session_state.current_child
+            end_session()
             st.rerun()
\ No newline at end of file
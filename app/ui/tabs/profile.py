@@ -3,7 +3,13 @@
 """
 import streamlit as st
 from datetime import datetime
+from utils.profiler import profiled
+from ui.effects import render_effects_toggle
+from utils.avatars import avatar_svg
+from ui.auth.session import end_session
+from data.task_pages import task_counts
 
+@profiled('render_profile')
 def render_profile(engine, child_id):
     st.subheader("👤 Мой профиль")
     
@@ -11,16 +17,14 @@ def render_profile(engine, child_id):
     if not child:
         st.error("👶 Ребёнок не найден. Возможно, нужно перезайти.")
         if st.button("🔄 Перезайти"):
-            if 'current_user' in st.session_state:
-                del st.session_state.current_user
+            end_session()
             st.rerun()
         return
     
     col1, col2 = st.columns([1, 2])
     
     with col1:
-        avatar_url = child.avatar if hasattr(child, 'avatar') else f"https://api.dicebear.com/7.x/adventurer/svg?seed={child.name}"
-        st.image(avatar_url, width=150)
+        st.image(avatar_svg(getattr(child, 'avatar', None), child.name), width=150)
     
     with col2:
         st.markdown(f"### {child.name}, {child.age} лет")
@@ -40,14 +44,15 @@ def render_profile(engine, child_id):
             }
             interests_display = [interest_emojis.get(i, i) for i in child.interests]
             st.markdown(f"**Интересы:** {', '.join(interests_display)}")
+        render_effects_toggle()
     
     st.markdown("---")
     st.subheader("📊 Статистика")
     
-    # Получаем задания для статистики
-    tasks = engine.get_daily_tasks(child_id)
-    total_tasks = len([t for t in engine.tasks if t.child_id == child_id])
-    completed_tasks = len([t for t in engine.tasks if t.child_id == child_id and t.completed])
+    # Счётчики заданий из БД (без загрузки самих заданий: их может быть сотни)
+    counts = task_counts(child_id) or {'open': 0, 'completed': 0}
+    completed_tasks = counts['completed']
+    total_tasks = counts['open'] + completed_tasks
     
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -88,7 +93,7 @@ def render_child_connection(engine, child_id):
     if st.session_state.get('show_invite_form', False) or not parents:
         with st.form("connect_parent"):
             invite_code = st.text_input("Введите пригласительный код", 
-                                        placeholder="FAM-XXXXXX",
+                                        placeholder="FAM-XXXXXXX",
                                         help="Код можно получить у родителей")
             
             col1, col2 = st.columns(2)
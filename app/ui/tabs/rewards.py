@@ -1,8 +1,30 @@
 """
 Вкладка с наградами и магазином
+
+Каталог и покупка — core.rewards: баллы списываются в БД одной
+транзакцией. Ключ покупки живёт до успеха: повтор после ошибки (обрыв,
+занятая БД) не спишет баллы дважды, если первая попытка всё же прошла.
+
+Покупка — колбэк кнопки: он выполняется до перерисовки, поэтому баланс и
+доступность всех кнопок считаются уже по новому числу баллов.
 """
+import uuid
 import streamlit as st
+from utils.profiler import profiled
+from core.rewards import get_catalog, get_purchases
+from data.points_ledger import get_balance
+from ui.effects import play_success_effect
+
+def _buy(engine, child_id, reward):
+    """Колбэк кнопки «Купить»: покупка до перерисовки вкладки"""
+    request_key = f"buy_request_{child_id}_{reward.id}"
+    st.session_state.setdefault(request_key, uuid.uuid4().hex)
+    result = engine.purchase_reward(child_id, reward.id, st.session_state[request_key])
+    if result.ok:
+        st.session_state.pop(request_key, None)
+    st.session_state.reward_purchase = (result, reward)
 
+@profiled('render_rewards')
 def render_rewards(engine, child_id):
     st.subheader("🎁 Магазин наград")
     
@@ -12,15 +34,27 @@ def render_rewards(engine, child_id):
         st.error("Ребёнок не найден")
         return
     
-    st.metric("Твои баллы", f"{child.points} ⭐", delta=None)
+    balance = get_balance(child_id)
+    if balance is None:
+        balance = child.points
     
-    # Пример списка наград
-    rewards = [
-        {"name": "30 мин в YouTube", "cost": 50, "emoji": "📱"},
-        {"name": "Мороженое", "cost": 30, "emoji": "🍦"},
-        {"name": "Поход в кино", "cost": 200, "emoji": "🎬"},
-        {"name": "Новая игра", "cost": 500, "emoji": "🎮"},
-    ]
+    purchase = st.session_state.pop('reward_purchase', None)
+    if purchase and purchase[0].ok:
+        result, reward = purchase
+        st.metric("Твои баллы", f"{balance} ⭐", delta=-reward.cost)
+        play_success_effect()
+        st.success(f"✅ Ты купил {reward.name}! Осталось {result.balance} ⭐")
+    else:
+        st.metric("Твои баллы", f"{balance} ⭐", delta=None)
+        if purchase and purchase[0].status == 'insufficient':
+            st.error("❌ Не хватает баллов!")
+        elif purchase:
+            st.error("❌ Не удалось купить, попробуй ещё раз")
+    
+    rewards = get_catalog(child_id)
+    if not rewards:
+        st.info("Наград пока нет")
+        return
     
     cols = st.columns(2)
     for idx, reward in enumerate(rewards):
@@ -34,17 +68,19 @@ def render_rewards(engine, child_id):
                     margin: 0.5rem 0;
                     box-shadow: 0 2px 4px rgba(0,0,0,0.1);
                 ">
-                    <h2 style="text-align: center;">{reward['emoji']}</h2>
-                    <h4 style="text-align: center;">{reward['name']}</h4>
+                    <h2 style="text-align: center;">{reward.emoji}</h2>
+                    <h4 style="text-align: center;">{reward.name}</h4>
                     <p style="text-align: center; color: #4A90E2; font-weight: bold;">
-                        {reward['cost']} ⭐
+                        {reward.cost} ⭐
                     </p>
                 </div>
                 """, unsafe_allow_html=True)
                 
-                if st.button(f"Купить", key=f"buy_{idx}"):
-                    if child.points >= reward['cost']:
-                        st.success(f"✅ Ты купил {reward['name']}!")
-                        # Здесь будет логика списания баллов
-                    else:
-                        st.error("❌ Не хватает баллов!")
+                st.button(f"Купить", key=f"buy_{reward.id}", disabled=balance < reward.cost,
+                          on_click=_buy, args=(engine, child_id, reward))
+    
+    purchases = get_purchases(child_id)
+    if purchases:
+        st.markdown("#### 🧾 Мои покупки")
+        for purchase in purchases:
+            st.caption(f"{purchase['created_at'][:16]} — {purchase['reward_name']} (−{purchase['points_spent']} ⭐)")
@@ -0,0 +1,37 @@
+"""
+Фоновые потоки процесса: архив заданий, чистка приглашений, сверка баллов
+
+Модули этих задач не импортируются в main.py: их загружает и запускает
+отдельный поток при первом запуске скрипта, поэтому холодный старт (и
+страница входа) их импорта не ждёт. Каждая задача сама следит, чтобы её
+поток был один на процесс, и сама выключается своей переменной окружения
+(FQ_ARCHIVE, FQ_INVITE_SWEEP, FQ_RECONCILE).
+"""
+import threading
+
+from utils.logger import logger
+
+_launcher = None
+_launcher_lock = threading.Lock()
+
+
+def _start_all():
+    try:
+        from data.archive import start_archiver
+        from core.invites import start_invite_sweeper
+        from data.points_ledger import start_reconciler
+        
+        start_archiver()
+        start_invite_sweeper()
+        start_reconciler()
+    except Exception as e:
+        logger.error(f"Не удалось запустить фоновые задачи: {e}", exc_info=True)
+
+def start_background_jobs():
+    """Запустить фоновые задачи (один раз на процесс, без ожидания импортов)"""
+    global _launcher
+    if _launcher is None:
+        with _launcher_lock:
+            if _launcher is None:
+                _launcher = threading.Thread(target=_start_all, name="fq-background-start", daemon=True)
+                _launcher.start()
@@ -0,0 +1,287 @@
+"""
+Кэш read-моделей: TTL, ограниченный размер и явная инвалидация по тегам
+
+Аналог st.cache_data для методов репозиториев: хранилище одно на процесс
+(общее для всех сессий, под блокировкой), ключ — имя функции и аргументы
+без self (AuthSystem() создаётся на каждый вызов). Значения копируются
+при записи и при выдаче, поэтому сессия, поменявшая полученный список,
+не испортит его другим.
+
+Записи помечаются тегами; пути записи вызывают хуки (on_task_completed,
+on_invitation_accepted, ...), которые сбрасывают только затронутые записи.
+
+FQ_CACHE=0 выключает кэш (функции вызываются напрямую).
+"""
+import copy
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+import streamlit as st
+
+CACHE_ENABLED = os.getenv("FQ_CACHE", "1") != "0"
+DEFAULT_TTL = 60.0       # секунд
+DEFAULT_MAXSIZE = 256    # записей на функцию
+
+# Теги read-моделей
+FAMILY_TAG = "family"    # состав семей: кто чей родитель/ребёнок
+REWARDS_TAG = "rewards"  # каталог наград
+
+
+def points_tag(child_id) -> str:
+    return f"points:{child_id}"
+
+def achievements_tag(child_id) -> str:
+    return f"achievements:{child_id}"
+
+def tasks_tag(child_id) -> str:
+    return f"tasks:{child_id}"
+
+
+class _Entry:
+    __slots__ = ('value', 'expires', 'tags')
+
+    def __init__(self, value, expires: float, tags: frozenset):
+        self.value = value
+        self.expires = expires
+        self.tags = tags
+
+
+class ReadModelCache:
+    """Кэш одной функции: LRU с TTL и индексом тегов"""
+
+    def __init__(self, name: str, ttl: float, maxsize: int):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._by_tag: Dict[str, set] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self.invalidated = 0
+
+    def get(self, key):
+        """(найдено, копия значения)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            if entry.expires <= time.monotonic():
+                self._drop(key)
+                self.expired += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry.value
+        return True, copy.deepcopy(value)
+
+    def put(self, key, value, tags: Iterable[str] = (), since: int = None) -> bool:
+        """Записать значение; since — номер сброса до чтения из БД
+
+        Если с тех пор сбросили любой из тегов записи, значение уже
+        устарело и не пишется. Проверка и запись — под блокировкой кэша,
+        а сброс сначала меняет версии тегов и только потом чистит записи,
+        поэтому устаревшее значение не переживёт сброс ни при каком порядке.
+        """
+        entry = _Entry(copy.deepcopy(value), time.monotonic() + self.ttl, frozenset(tags))
+        with self._lock:
+            if since is not None and _invalidated_since(since, entry.tags):
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            for tag in entry.tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evicted += 1
+        return True
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                keys |= self._by_tag.get(tag, set())
+            for key in keys:
+                self._drop(key)
+            self.invalidated += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.invalidated += len(self._entries)
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry.tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'кэш': self.name,
+                'записей': len(self._entries),
+                'лимит': self.maxsize,
+                'ttl, с': self.ttl,
+                'попаданий': self.hits,
+                'промахов': self.misses,
+                'hit rate': f"{self.hits / requests:.0%}" if requests else "—",
+                'истекло': self.expired,
+                'вытеснено': self.evicted,
+                'сброшено': self.invalidated,
+            }
+
+
+_caches: Dict[str, ReadModelCache] = {}
+_caches_lock = threading.Lock()
+# Номер последнего сброса по тегу: модели вне кэша (семья в GameEngine) сверяют его
+# без запросов к БД, а декоратор — чтобы не записать прочитанное до сброса
+_invalidation_seq = 0
+_tag_versions: Dict[str, int] = {}
+_clear_generation = 0
+
+
+def cached_read_model(name: str = None, ttl: float = DEFAULT_TTL, maxsize: int = DEFAULT_MAXSIZE,
+                      tags: Callable = None):
+    """Декоратор read-модели
+
+    tags(result, *args) возвращает теги записи (аргументы — без self).
+    Исключения не кэшируются; результат None тоже (обычно это ошибка БД).
+    """
+    def decorator(func):
+        params = list(inspect.signature(func).parameters)
+        skip_self = bool(params) and params[0] == 'self'
+        cache_name = name or func.__qualname__
+
+        with _caches_lock:
+            cache = _caches.setdefault(cache_name, ReadModelCache(cache_name, ttl, maxsize))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CACHE_ENABLED:
+                return func(*args, **kwargs)
+
+            key_args = args[1:] if skip_self else args
+            key = (key_args, tuple(sorted(kwargs.items())))
+            found, value = cache.get(key)
+            if found:
+                return value
+
+            # Сброс мог прийти между чтением из БД и записью в кэш — тогда не кэшируем
+            since = invalidation_seq()
+            result = func(*args, **kwargs)
+            if result is not None:
+                cache.put(key, result, tags(result, *key_args, **kwargs) if tags else (), since=since)
+            return result
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def invalidate(*tags: str) -> int:
+    """Сбросить записи с любым из тегов во всех кэшах"""
+    global _invalidation_seq
+    with _caches_lock:
+        caches = list(_caches.values())
+        _invalidation_seq += 1
+        for tag in tags:
+            _tag_versions[tag] = _invalidation_seq
+    return sum(cache.invalidate_tags(tags) for cache in caches)
+
+def invalidation_seq() -> int:
+    """Номер последнего сброса (растёт при каждом invalidate и clear_all)"""
+    with _caches_lock:
+        return _invalidation_seq
+
+def _invalidated_since(seq: int, tags: Iterable[str]) -> bool:
+    with _caches_lock:
+        return _clear_generation > seq or any(_tag_versions.get(tag, 0) > seq for tag in tags)
+
+def tag_versions(tags: Iterable[str]) -> tuple:
+    """Текущие версии тегов (меняются при каждом invalidate с этим тегом)"""
+    with _caches_lock:
+        return (_clear_generation,) + tuple(_tag_versions.get(tag, 0) for tag in tags)
+
+def clear_all():
+    """Сбросить все кэши"""
+    global _clear_generation, _invalidation_seq
+    with _caches_lock:
+        caches = list(_caches.values())
+        _invalidation_seq += 1
+        _clear_generation = _invalidation_seq
+    for cache in caches:
+        cache.clear()
+
+def cache_stats() -> List[Dict]:
+    """Статистика всех кэшей"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return [cache.stats() for cache in caches]
+
+
+# Хуки путей записи
+
+def on_points_changed(child_id: int):
+    """Изменились баллы/уровень ребёнка"""
+    invalidate(points_tag(child_id))
+
+def on_task_completed(child_id: int):
+    """Ребёнок выполнил задание: баллы, список заданий и, возможно, достижения"""
+    invalidate(points_tag(child_id), tasks_tag(child_id), achievements_tag(child_id))
+
+def on_tasks_changed(child_id: int):
+    """Ребёнку добавили или изменили задания"""
+    invalidate(tasks_tag(child_id))
+
+def on_achievements_unlocked(child_id: int):
+    """Выданы новые достижения (с бонусными баллами)"""
+    invalidate(points_tag(child_id), achievements_tag(child_id))
+
+def on_family_changed():
+    """Изменился состав семьи: принято приглашение или добавлен ребёнок"""
+    invalidate(FAMILY_TAG)
+
+def on_invitation_accepted(child_id: int):
+    """Ребёнок принял приглашение родителя"""
+    on_family_changed()
+
+def on_rewards_changed():
+    """Изменился каталог наград"""
+    invalidate(REWARDS_TAG)
+
+
+def render_cache_panel():
+    """Блок кэша read-моделей для отладочной панели"""
+    st.subheader("🗄️ Кэш read-моделей")
+    if not CACHE_ENABLED:
+        st.caption("Кэш выключен (FQ_CACHE=0)")
+        return
+
+    stats = cache_stats()
+    if not stats:
+        st.caption("Кэшированных read-моделей пока нет")
+        return
+    st.table(stats)
+
+    if st.button("Сбросить кэш", key="cache_clear"):
+        clear_all()
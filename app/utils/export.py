@@ -8,23 +8,79 @@ from datetime import datetime, timedelta
 import streamlit as st
 from io import StringIO, BytesIO
 
+REPORT_COLUMNS = ['Дата', 'Заданий', 'Баллов']
+
 class DataExporter:
     def __init__(self, engine, db_conn):
         self.engine = engine
         self.conn = db_conn
     
-    def export_tasks_csv(self, child_id=None):
-        """Экспорт заданий в CSV"""
-        cursor = self.conn.cursor()
-        
+    @staticmethod
+    def tasks_query(child_id=None):
+        """SQL и параметры для выгрузки заданий"""
+        if child_id:
+            return '''
+                SELECT * FROM tasks_all
+                WHERE user_id = ?
+                ORDER BY created_at DESC, id DESC
+            ''', (child_id,)
+        return 'SELECT * FROM tasks_all ORDER BY created_at DESC, id DESC', ()
+    
+    @staticmethod
+    def children_query():
+        """SQL и параметры для выгрузки детей (по id: баллы меняются, а по id выгрузку можно продолжить)"""
+        return 'SELECT * FROM children ORDER BY id DESC', ()
+    
+    @staticmethod
+    def achievements_query(child_id=None):
+        """SQL и параметры для выгрузки достижений"""
         if child_id:
-            cursor.execute('''
-                SELECT * FROM tasks 
-                WHERE child_id = ? 
-                ORDER BY created_at DESC
-            ''', (child_id,))
-        else:
-            cursor.execute('SELECT * FROM tasks ORDER BY created_at DESC')
+            return '''
+                SELECT a.*, d.name, d.description, d.emoji
+                FROM achievements a
+                JOIN achievements_def d ON a.achievement_id = d.id
+                WHERE a.child_id = ?
+                ORDER BY a.unlocked_at DESC, a.id DESC
+            ''', (child_id,)
+        return '''
+            SELECT a.*, d.name, d.description, d.emoji
+            FROM achievements a
+            JOIN achievements_def d ON a.achievement_id = d.id
+            ORDER BY a.unlocked_at DESC, a.id DESC
+        ''', ()
+    
+    @staticmethod
+    def report_query(child_id=None, days=30):
+        """SQL и параметры для отчёта за период"""
+        if child_id:
+            return '''
+                SELECT
+                    date(created_at) as day,
+                    COUNT(*) as tasks_count,
+                    SUM(points) as total_points
+                FROM tasks_all
+                WHERE user_id = ?
+                    AND completed = 1
+                    AND date(created_at) >= date('now', ?)
+                GROUP BY date(created_at)
+                ORDER BY day DESC
+            ''', (child_id, f'-{days} days')
+        return '''
+            SELECT
+                date(created_at) as day,
+                COUNT(*) as tasks_count,
+                SUM(points) as total_points
+            FROM tasks_all
+            WHERE completed = 1
+                AND date(created_at) >= date('now', ?)
+            GROUP BY date(created_at)
+            ORDER BY day DESC
+        ''', (f'-{days} days',)
+    
+    def _query_to_csv(self, sql, params):
+        """Выполнить запрос и вернуть результат в виде CSV"""
+        cursor = self.conn.cursor()
+        cursor.execute(sql, params)
         
         columns = [description[0] for description in cursor.description]
         data = cursor.fetchall()
@@ -37,166 +93,55 @@ class DataExporter:
         
         return output.getvalue()
     
+    def export_tasks_csv(self, child_id=None):
+        """Экспорт заданий в CSV"""
+        return self._query_to_csv(*self.tasks_query(child_id))
+    
     def export_children_csv(self):
         """Экспорт данных детей в CSV"""
-        cursor = self.conn.cursor()
-        cursor.execute('SELECT * FROM children ORDER BY points DESC')
-        
-        columns = [description[0] for description in cursor.description]
-        data = cursor.fetchall()
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(columns)
-        writer.writerows(data)
-        
-        return output.getvalue()
+        return self._query_to_csv(*self.children_query())
     
     def export_achievements_csv(self, child_id=None):
         """Экспорт достижений в CSV"""
-        cursor = self.conn.cursor()
-        
-        if child_id:
-            cursor.execute('''
-                SELECT a.*, d.name, d.description, d.emoji 
-                FROM achievements a
-                JOIN achievements_def d ON a.achievement_id = d.id
-                WHERE a.child_id = ?
-                ORDER BY a.unlocked_at DESC
-            ''', (child_id,))
-        else:
-            cursor.execute('''
-                SELECT a.*, d.name, d.description, d.emoji 
-                FROM achievements a
-                JOIN achievements_def d ON a.achievement_id = d.id
-                ORDER BY a.unlocked_at DESC
-            ''')
-        
-        columns = [description[0] for description in cursor.description]
-        data = cursor.fetchall()
-        
-        output = StringIO()
-        writer = csv.writer(output)
-        writer.writerow(columns)
-        writer.writerows(data)
-        
-        return output.getvalue()
+        return self._query_to_csv(*self.achievements_query(child_id))
     
     def generate_report(self, child_id=None, days=30):
         """Сгенерировать отчёт за период"""
         cursor = self.conn.cursor()
-        
-        if child_id:
-            cursor.execute('''
-                SELECT 
-                    date(created_at) as day,
-                    COUNT(*) as tasks_count,
-                    SUM(points) as total_points
-                FROM tasks 
-                WHERE child_id = ? 
-                    AND completed = 1
-                    AND date(created_at) >= date('now', ?)
-                GROUP BY date(created_at)
-                ORDER BY day DESC
-            ''', (child_id, f'-{days} days'))
-        else:
-            cursor.execute('''
-                SELECT 
-                    date(created_at) as day,
-                    COUNT(*) as tasks_count,
-                    SUM(points) as total_points
-                FROM tasks 
-                WHERE completed = 1
-                    AND date(created_at) >= date('now', ?)
-                GROUP BY date(created_at)
-                ORDER BY day DESC
-            ''', (f'-{days} days',))
-        
+        cursor.execute(*self.report_query(child_id, days))
         report_data = cursor.fetchall()
         
         # Создаем DataFrame для удобного отображения
-        df = pd.DataFrame(report_data, columns=['Дата', 'Заданий', 'Баллов'])
+        df = pd.DataFrame(report_data, columns=REPORT_COLUMNS)
         return df
-    
-    def get_child_statistics(self, child_id):
-        """Получить полную статистику по ребёнку"""
-        cursor = self.conn.cursor()
-        
-        # Основная информация
-        cursor.execute('SELECT * FROM children WHERE id = ?', (child_id,))
-        child = cursor.fetchone()
-        
-        # Количество заданий по категориям
-        cursor.execute('''
-            SELECT category, COUNT(*) as count, SUM(points) as total_points
-            FROM tasks 
-            WHERE child_id = ? AND completed = 1
-            GROUP BY category
-        ''', (child_id,))
-        category_stats = cursor.fetchall()
-        
-        # Динамика по дням (последние 30 дней)
-        cursor.execute('''
-            SELECT 
-                date(completed_at) as day,
-                COUNT(*) as tasks,
-                SUM(points) as points
-            FROM tasks 
-            WHERE child_id = ? AND completed = 1
-                AND date(completed_at) >= date('now', '-30 days')
-            GROUP BY date(completed_at)
-            ORDER BY day
-        ''', (child_id,))
-        daily_stats = cursor.fetchall()
-        
-        # Достижения
-        cursor.execute('''
-            SELECT COUNT(*) FROM achievements WHERE child_id = ?
-        ''', (child_id,))
-        achievements_count = cursor.fetchone()[0]
-        
-        return {
-            'child': child,
-            'category_stats': category_stats,
-            'daily_stats': daily_stats,
-            'achievements_count': achievements_count
-        }
 
 def render_export_section(exporter):
-    """Рендеринг секции экспорта"""
+    """Рендеринг секции экспорта (выгрузки выполняются в фоне)"""
+    from utils.export_jobs import get_export_manager, EXPORT_KINDS
+    
+    manager = get_export_manager()
+    current_user = st.session_state.get('current_user') or {}
+    user_id = current_user.get('id')
+    
     st.subheader("📤 Экспорт данных")
+    st.caption("Выгрузки готовятся в фоне — можно продолжать работу и скачать файл позже")
     
     col1, col2, col3 = st.columns(3)
     
     with col1:
         if st.button("📥 Экспорт детей (CSV)"):
-            csv_data = exporter.export_children_csv()
-            st.download_button(
-                label="💾 Скачать children.csv",
-                data=csv_data,
-                file_name=f"children_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+            manager.submit('children', requested_by=user_id)
+            st.success("⏳ Экспорт детей поставлен в очередь")
     
     with col2:
         if st.button("📥 Экспорт заданий (CSV)"):
-            csv_data = exporter.export_tasks_csv()
-            st.download_button(
-                label="💾 Скачать tasks.csv",
-                data=csv_data,
-                file_name=f"tasks_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+            manager.submit('tasks', requested_by=user_id)
+            st.success("⏳ Экспорт заданий поставлен в очередь")
     
     with col3:
         if st.button("📥 Экспорт достижений (CSV)"):
-            csv_data = exporter.export_achievements_csv()
-            st.download_button(
-                label="💾 Скачать achievements.csv",
-                data=csv_data,
-                file_name=f"achievements_export_{datetime.now().strftime('%Y%m%d')}.csv",
-                mime="text/csv"
-            )
+            manager.submit('achievements', requested_by=user_id)
+            st.success("⏳ Экспорт достижений поставлен в очередь")
     
     st.markdown("---")
     st.subheader("📊 Отчёты")
@@ -204,25 +149,87 @@ def render_export_section(exporter):
     days = st.slider("Период (дней)", min_value=7, max_value=90, value=30)
     
     if st.button("📈 Сгенерировать отчёт"):
-        df = exporter.generate_report(days=days)
-        
-        if not df.empty:
-            st.dataframe(df)
-            
-            # Простая статистика
-            total_tasks = df['Заданий'].sum()
-            total_points = df['Баллов'].sum()
-            avg_per_day = total_tasks / days
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Всего заданий", total_tasks)
-            with col2:
-                st.metric("Всего баллов", total_points)
-            with col3:
-                st.metric("В среднем в день", f"{avg_per_day:.1f}")
-            
-            # График
-            st.line_chart(df.set_index('Дата')[['Заданий', 'Баллов']])
-        else:
-            st.info("Нет данных за выбранный период")
+        st.session_state.report_job_id = manager.submit('report', requested_by=user_id, days=days)
+        st.session_state.report_days = days
+    
+    report_job_id = st.session_state.get('report_job_id')
+    if report_job_id:
+        job = manager.get_job(report_job_id)
+        if job and job['status'] == 'done':
+            render_report(manager.read_result(job), st.session_state.get('report_days', days))
+        elif job and job['status'] == 'failed':
+            st.error(f"❌ Не удалось построить отчёт: {job['error']}")
+        elif job:
+            st.progress(job['progress'], text="⏳ Отчёт готовится...")
+    
+    st.markdown("---")
+    st.subheader("🗂️ Мои выгрузки")
+    
+    if st.button("🔄 Обновить статус"):
+        pass  # Нажатие само по себе перезапускает скрипт и перечитывает статусы
+    
+    jobs = manager.list_jobs(requested_by=user_id)
+    if not jobs:
+        st.caption("Выгрузок пока нет")
+    
+    for job in jobs:
+        label = EXPORT_KINDS[job['kind']]['label']
+        created = (job.get('created_at') or '')[:16]
+        col1, col2 = st.columns([3, 2])
+        with col1:
+            st.markdown(f"**{label}** · {created}")
+            if job['status'] in ('queued', 'running'):
+                st.progress(job['progress'], text=f"{job.get('rows_written') or 0} из {job.get('total_rows') or '?'} строк")
+            elif job['status'] == 'failed':
+                st.caption(f"❌ Ошибка: {job['error']}")
+            else:
+                st.caption(f"✅ {job['rows_written']} строк · sha256 {job['checksum'][:12]}")
+        with col2:
+            if job['status'] != 'done':
+                continue
+            # Файл читаем только для выбранной выгрузки, а не для всех на каждом rerun
+            if st.session_state.get('export_download_id') != job['id']:
+                if st.button("📂 Подготовить", key=f"prepare_export_{job['id']}"):
+                    st.session_state.export_download_id = job['id']
+                    st.rerun()
+                continue
+            data = manager.read_result(job)
+            if data is not None:
+                st.download_button(
+                    label="💾 Скачать",
+                    data=data,
+                    file_name=job['file_name'],
+                    mime="text/csv",
+                    key=f"download_export_{job['id']}"
+                )
+            else:
+                st.caption("⚠️ Файл недоступен или повреждён")
+
+def render_report(data, days):
+    """Отображение готового отчёта"""
+    if not data:
+        st.info("Нет данных за выбранный период")
+        return
+    
+    df = pd.read_csv(BytesIO(data))
+    
+    if not df.empty:
+        st.dataframe(df)
+        
+        # Простая статистика
+        total_tasks = df['Заданий'].sum()
+        total_points = df['Баллов'].sum()
+        avg_per_day = total_tasks / days
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Всего заданий", total_tasks)
+        with col2:
+            st.metric("Всего баллов", total_points)
+        with col3:
+            st.metric("В среднем в день", f"{avg_per_day:.1f}")
+        
+        # График
+        st.line_chart(df.set_index('Дата')[['Заданий', 'Баллов']])
+    else:
+        st.info("Нет данных за выбранный период")
@@ -0,0 +1,281 @@
+"""
+Фоновые задачи экспорта: очередь в БД, пул потоков и прогресс
+"""
+import csv
+import hashlib
+import json
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from typing import Dict, List, Optional
+import sqlite3
+
+from data.database import get_connection
+from utils.export import DataExporter, REPORT_COLUMNS
+from utils.logger import logger
+
+EXPORT_DIR = Path(__file__).parent.parent.parent / "exports"
+BATCH_SIZE = 500  # Сколько строк пишем между обновлениями прогресса
+MAX_WORKERS = 2
+
+# Виды экспорта: подпись, построитель запроса (берём из DataExporter) и
+# ключ порядка (колонки результата, по убыванию; последняя — уникальная).
+# Продолжение идёт с ключа последней записанной строки, как в data.task_pages
+EXPORT_KINDS = {
+    'children': {
+        'label': 'Дети',
+        'query': lambda params: DataExporter.children_query(),
+        'keyset': ('id',),
+    },
+    'tasks': {
+        'label': 'Задания',
+        'query': lambda params: DataExporter.tasks_query(params.get('child_id')),
+        'keyset': ('created_at', 'id'),
+    },
+    'achievements': {
+        'label': 'Достижения',
+        'query': lambda params: DataExporter.achievements_query(params.get('child_id')),
+        'keyset': ('unlocked_at', 'id'),
+    },
+    'report': {
+        'label': 'Отчёт',
+        'query': lambda params: DataExporter.report_query(params.get('child_id'), params.get('days', 30)),
+        'keyset': ('day',),
+        'header': REPORT_COLUMNS,
+    },
+}
+
+
+def file_checksum(path: Path) -> str:
+    """SHA-256 файла (читаем блоками, чтобы не держать файл в памяти)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExportJobManager:
+    """Очередь задач экспорта, выполняемых в фоновых потоках"""
+    
+    def __init__(self, export_dir: Path = EXPORT_DIR, max_workers: int = MAX_WORKERS):
+        self.export_dir = Path(export_dir)
+        self.export_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fq-export")
+        self._active = set()
+        self._lock = threading.Lock()
+        self._resume_unfinished()
+    
+    def submit(self, kind: str, requested_by: int = None, **params) -> str:
+        """Поставить экспорт в очередь и сразу вернуть id задачи"""
+        if kind not in EXPORT_KINDS:
+            raise ValueError(f"Неизвестный вид экспорта: {kind}")
+        
+        job_id = uuid.uuid4().hex
+        conn = get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO export_jobs (id, kind, params, requested_by, status)
+                VALUES (?, ?, ?, ?, 'queued')
+            ''', (job_id, kind, json.dumps(params, ensure_ascii=False), requested_by))
+            conn.commit()
+        finally:
+            conn.close()
+        
+        logger.info(f"📤 Export job {job_id[:8]} queued: {kind} {params}")
+        self._schedule(job_id)
+        return job_id
+    
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Текущее состояние задачи"""
+        conn = get_connection()
+        try:
+            row = conn.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+            return self._job_dict(row) if row else None
+        finally:
+            conn.close()
+    
+    def list_jobs(self, requested_by: int = None, limit: int = 20) -> List[Dict]:
+        """Последние задачи пользователя (или все, если пользователь не указан)"""
+        conn = get_connection()
+        try:
+            if requested_by is not None:
+                rows = conn.execute('''
+                    SELECT * FROM export_jobs WHERE requested_by = ?
+                    ORDER BY created_at DESC LIMIT ?
+                ''', (requested_by, limit)).fetchall()
+            else:
+                rows = conn.execute('''
+                    SELECT * FROM export_jobs ORDER BY created_at DESC LIMIT ?
+                ''', (limit,)).fetchall()
+            return [self._job_dict(row) for row in rows]
+        finally:
+            conn.close()
+    
+    def read_result(self, job: Dict) -> Optional[bytes]:
+        """Прочитать готовый файл, проверив контрольную сумму"""
+        if job['status'] != 'done' or not job.get('file_name'):
+            return None
+        
+        path = self.export_dir / job['file_name']
+        if not path.exists():
+            logger.warning(f"Export file missing: {path}")
+            return None
+        
+        data = path.read_bytes()
+        if hashlib.sha256(data).hexdigest() != job['checksum']:
+            logger.error(f"Checksum mismatch for export {job['id'][:8]}")
+            return None
+        return data
+    
+    def _job_dict(self, row) -> Dict:
+        job = dict(row)
+        job['params'] = json.loads(job['params']) if job.get('params') else {}
+        total = job.get('total_rows') or 0
+        job['progress'] = 1.0 if job['status'] == 'done' else (
+            min(job.get('rows_written', 0) / total, 1.0) if total else 0.0
+        )
+        return job
+    
+    def _schedule(self, job_id: str):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self._executor.submit(self._run, job_id)
+    
+    def _resume_unfinished(self):
+        """Продолжить задачи, прерванные перезапуском процесса"""
+        conn = get_connection()
+        try:
+            rows = conn.execute('''
+                SELECT id FROM export_jobs WHERE status IN ('queued', 'running')
+                ORDER BY created_at
+            ''').fetchall()
+        except sqlite3.Error as e:
+            logger.error(f"Database error in _resume_unfinished: {e}")
+            rows = []
+        finally:
+            conn.close()
+        
+        for row in rows:
+            logger.info(f"📤 Resuming export job {row['id'][:8]}")
+            self._schedule(row['id'])
+    
+    def _run(self, job_id: str):
+        """Выполнение задачи в фоновом потоке (своё соединение с БД)"""
+        conn = get_connection()
+        try:
+            self._export(conn, job_id)
+        except Exception as e:
+            logger.error(f"Export job {job_id[:8]} failed: {e}", exc_info=True)
+            try:
+                conn.rollback()
+                conn.execute('''
+                    UPDATE export_jobs SET status = 'failed', error = ?, finished_at = ?
+                    WHERE id = ?
+                ''', (str(e), datetime.now().isoformat(), job_id))
+                conn.commit()
+            except sqlite3.Error as db_error:
+                logger.error(f"Database error in export job {job_id[:8]}: {db_error}")
+        finally:
+            conn.close()
+            with self._lock:
+                self._active.discard(job_id)
+    
+    def _export(self, conn, job_id: str):
+        job = self._job_dict(conn.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone())
+        spec = EXPORT_KINDS[job['kind']]
+        sql, params = spec['query'](job['params'])
+        
+        total = conn.execute(f'SELECT COUNT(*) FROM ({sql})', params).fetchone()[0]
+        conn.execute('''
+            UPDATE export_jobs SET status = 'running', total_rows = ? WHERE id = ?
+        ''', (total, job_id))
+        conn.commit()
+        
+        # Продолжаем с места остановки: обрезаем хвост, не попавший в БД
+        part_path = self.export_dir / f"{job_id}.csv.part"
+        rows_written = job.get('rows_written') or 0
+        bytes_written = job.get('bytes_written') or 0
+        position = json.loads(job['resume_key']) if job.get('resume_key') else None
+        if not part_path.exists() or (rows_written and position is None):
+            rows_written = bytes_written = 0
+            position = None
+        
+        # Порции — отдельные запросы с ключа последней записанной строки, а не
+        # OFFSET: задания, добавленные или ушедшие в архив между падением и
+        # продолжением, не сдвинут выгрузку. Между порциями не держим читающую
+        # транзакцию, иначе запись прогресса упрётся в блокировку
+        keyset = spec['keyset']
+        key_list = ", ".join(keyset)
+        order = ", ".join(f"{column} DESC" for column in keyset)
+        first_sql = f'SELECT * FROM ({sql}) ORDER BY {order} LIMIT ?'
+        next_sql = f'SELECT * FROM ({sql}) WHERE ({key_list}) < ({", ".join("?" * len(keyset))}) ORDER BY {order} LIMIT ?'
+        
+        def fetch(position):
+            if position is None:
+                return conn.execute(first_sql, (*params, BATCH_SIZE))
+            return conn.execute(next_sql, (*params, *position, BATCH_SIZE))
+        
+        cursor = fetch(position)
+        columns = [d[0] for d in cursor.description]
+        key_index = [columns.index(column) for column in keyset]
+        header = spec.get('header') or columns
+        rows = cursor.fetchall()
+        
+        with open(part_path, 'ab') as f:
+            f.truncate(bytes_written)
+            
+            if rows_written == 0 and bytes_written == 0:
+                bytes_written += f.write(self._csv_chunk([header]))
+            
+            while rows:
+                bytes_written += f.write(self._csv_chunk(rows))
+                f.flush()
+                rows_written += len(rows)
+                position = [rows[-1][i] for i in key_index]
+                conn.execute('''
+                    UPDATE export_jobs SET rows_written = ?, bytes_written = ?, resume_key = ? WHERE id = ?
+                ''', (rows_written, bytes_written, json.dumps(position, ensure_ascii=False), job_id))
+                conn.commit()
+                
+                if len(rows) < BATCH_SIZE:
+                    break
+                rows = fetch(position).fetchall()
+        
+        file_name = f"{job['kind']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{job_id[:8]}.csv"
+        final_path = self.export_dir / file_name
+        part_path.replace(final_path)
+        checksum = file_checksum(final_path)
+        
+        conn.execute('''
+            UPDATE export_jobs
+            SET status = 'done', rows_written = ?, bytes_written = ?,
+                file_name = ?, checksum = ?, finished_at = ?
+            WHERE id = ?
+        ''', (rows_written, bytes_written, file_name, checksum, datetime.now().isoformat(), job_id))
+        conn.commit()
+        logger.info(f"📤 Export job {job_id[:8]} done: {rows_written} rows, sha256={checksum[:12]}")
+    
+    @staticmethod
+    def _csv_chunk(rows) -> bytes:
+        output = StringIO()
+        csv.writer(output).writerows(tuple(row) for row in rows)
+        return output.getvalue().encode('utf-8')
+
+
+_manager: Optional[ExportJobManager] = None
+_manager_lock = threading.Lock()
+
+def get_export_manager() -> ExportJobManager:
+    """Единый менеджер экспорта на процесс (общий для всех сессий)"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ExportJobManager()
+    return _manager
@@ -1,9 +1,24 @@
 """
 Модуль логирования для FamilyQuest
+
+Записи попадают в очередь (QueueHandler), а в файл и консоль их пишет
+отдельный поток (QueueListener) — дисковый I/O не выполняется в потоке
+скрипта Streamlit.
+
+FQ_LOG_FORMAT=json включает структурированный режим: одна JSON-строка на
+запись с session_id / rerun_id / user_id / event / duration_ms.
 """
+import atexit
+import contextvars
+import json
 import logging
+import logging.handlers
 import os
+import queue
+import random
+import uuid
 from datetime import datetime
+from typing import Dict
 from pathlib import Path
 import streamlit as st
 from ui.components import safe_rerun
@@ -12,29 +27,265 @@ from ui.components import safe_rerun
 LOG_DIR = Path(__file__).parent.parent.parent / "logs"
 LOG_DIR.mkdir(exist_ok=True)
 
-# Имя файла лога с датой
-LOG_FILE = LOG_DIR / f"familyquest_{datetime.now().strftime('%Y%m%d')}.log"
-
-# Настройка логирования
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()  # Вывод в консоль
-    ]
+# Один файл, ротация в полночь и по размеру (старые: familyquest.log.ГГГГ-ММ-ДД[.N])
+LOG_FILE = LOG_DIR / "familyquest.log"
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Настройки из окружения
+LOG_LEVEL = os.getenv("FQ_LOG_LEVEL", "DEBUG").upper()
+LOG_MAX_BYTES = int(os.getenv("FQ_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("FQ_LOG_BACKUP_COUNT", "14"))
+LOG_QUEUE_SIZE = int(os.getenv("FQ_LOG_QUEUE_SIZE", "10000"))
+LOG_STRUCTURED = os.getenv("FQ_LOG_FORMAT", "text").lower() == "json"
+
+def _parse_sample_rates(raw: str) -> Dict[str, float]:
+    """'debug_rerun=0.1,log_function_call=0.05' -> {'debug_rerun': 0.1, ...}"""
+    rates = {}
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+# Доля записей, которые оставляем для частых DEBUG-событий (1.0 — все)
+LOG_SAMPLE_RATES = _parse_sample_rates(
+    os.getenv("FQ_LOG_SAMPLE", "debug_rerun=1.0,log_function_call=1.0")
 )
 
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+
+
+# Контекст текущего rerun (у каждого потока скрипта свой)
+_log_context = contextvars.ContextVar('fq_log_context', default={})
+CONTEXT_FIELDS = ('session_id', 'rerun_id', 'user_id')
+
+# Стандартные атрибуты LogRecord — всё остальное считаем пользовательскими полями
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет в запись поля контекста rerun (в потоке, который логирует)"""
+    
+    def filter(self, record):
+        context = _log_context.get()
+        for field in CONTEXT_FIELDS:
+            if not hasattr(record, field):
+                setattr(record, field, context.get(field))
+        if not hasattr(record, 'event'):
+            record.event = None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает только долю записей для событий из LOG_SAMPLE_RATES"""
+    
+    def filter(self, record):
+        event = getattr(record, 'event', None)
+        if event is None or getattr(record, 'sampled', False):
+            return True
+        rate = LOG_SAMPLE_RATES.get(event)
+        return rate is None or random.random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна JSON-строка на запись"""
+    
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'msg': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            entry[field] = getattr(record, field, None)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and key not in entry and key != 'sampled':
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SizedTimedRotatingFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Ротация по времени (в полночь) и дополнительно по размеру файла"""
+    
+    def __init__(self, filename, max_bytes=0, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.max_bytes = max_bytes
+    
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes > 0:
+            if self.stream is None:
+                self.stream = self._open()
+            msg = "%s\n" % self.format(record)
+            if self.stream.tell() + len(msg.encode(self.encoding or 'utf-8')) >= self.max_bytes:
+                return True
+        return False
+    
+    def rotation_filename(self, default_name):
+        # Несколько ротаций по размеру за день не должны затирать друг друга
+        name = super().rotation_filename(default_name)
+        counter = 1
+        candidate = name
+        while os.path.exists(candidate):
+            candidate = f"{name}.{counter}"
+            counter += 1
+        return candidate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который не блокирует поток при переполнении очереди"""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _build_writer_handlers():
+    """Обработчики, которые работают в потоке-писателе"""
+    formatter = JsonFormatter() if LOG_STRUCTURED else logging.Formatter(LOG_FORMAT)
+    
+    file_handler = SizedTimedRotatingFileHandler(
+        LOG_FILE,
+        max_bytes=LOG_MAX_BYTES,
+        when='midnight',
+        backupCount=LOG_BACKUP_COUNT,
+        encoding='utf-8',
+        delay=True
+    )
+    file_handler.setFormatter(formatter)
+    
+    console_handler = logging.StreamHandler()  # Вывод в консоль
+    console_handler.setFormatter(formatter)
+    
+    return [file_handler, console_handler]
+
+
+def _stop_listener(listener):
+    """Остановить поток-писатель (он допишет очередь) и закрыть его файл и консоль"""
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+
+def _shutdown_logging():
+    """Выход процесса: остановить текущий конвейер (какой бы ни был после перезагрузок)"""
+    root = logging.getLogger()
+    listener = getattr(root, '_fq_listener', None)
+    if listener is not None:
+        root._fq_listener = None
+        _stop_listener(listener)
+
+
+def _setup_logging():
+    """Подключить очередь к корневому логгеру (повторный вызов безопасен)"""
+    root = logging.getLogger()
+    
+    # При горячей перезагрузке модуля снимаем прежний конвейер
+    previous = getattr(root, '_fq_queue_handler', None)
+    if previous is not None:
+        root.removeHandler(previous)
+    if getattr(root, '_fq_listener', None) is not None:
+        _stop_listener(root._fq_listener)
+    
+    log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+    queue_handler.addFilter(ContextFilter())
+    listener = logging.handlers.QueueListener(
+        log_queue, *_build_writer_handlers(), respect_handler_level=True
+    )
+    
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+    root._fq_queue_handler = queue_handler
+    root._fq_listener = listener
+    
+    listener.start()
+    # Хук выхода — один на процесс: он берёт текущий конвейер из root, а не этот
+    if not getattr(root, '_fq_atexit', False):
+        atexit.register(_shutdown_logging)
+        root._fq_atexit = True
+    return queue_handler, listener
+
+_queue_handler, _listener = _setup_logging()
+
 # Создаём логгер для приложения
 logger = logging.getLogger("FamilyQuest")
 
+def set_log_level(level):
+    """Изменить уровень логирования на лету (для всех логгеров FamilyQuest)"""
+    if isinstance(level, str):
+        level = level.upper()
+    logging.getLogger().setLevel(level)
+    logger.setLevel(level)
+    logger.info(f"Log level set to {logging.getLevelName(logger.level)}")
+
+def get_log_level() -> str:
+    """Текущий уровень логирования"""
+    return logging.getLevelName(logger.getEffectiveLevel())
+
+def get_dropped_records() -> int:
+    """Сколько записей отброшено из-за переполненной очереди"""
+    return _queue_handler.dropped
+
+def bind_log_context(**fields):
+    """Задать поля контекста (session_id, rerun_id, user_id) для текущего потока"""
+    context = dict(_log_context.get())
+    context.update(fields)
+    _log_context.set(context)
+
+def start_rerun_context(session_state, user_id=None) -> str:
+    """Начать новый rerun: стабильный id сессии и свежий id запуска"""
+    if 'log_session_id' not in session_state:
+        session_state['log_session_id'] = uuid.uuid4().hex[:12]
+    rerun_id = uuid.uuid4().hex[:12]
+    bind_log_context(session_id=session_state['log_session_id'], rerun_id=rerun_id, user_id=user_id)
+    return rerun_id
+
+def should_log_event(event: str, level=logging.DEBUG) -> bool:
+    """Решение о сэмплировании заранее — чтобы не готовить текст отброшенных записей"""
+    if not logger.isEnabledFor(level):
+        return False
+    rate = LOG_SAMPLE_RATES.get(event)
+    return rate is None or random.random() < rate
+
+def log_event(event: str, message: str = None, level=logging.INFO, duration_ms: float = None, **fields):
+    """Структурированное событие: имя, длительность и произвольные поля"""
+    if not logger.isEnabledFor(level):
+        return
+    extra = {'event': event, **fields}
+    if duration_ms is not None:
+        extra['duration_ms'] = round(duration_ms, 2)
+    logger.log(level, message or event, extra=extra)
+
 def log_function_call(func_name, **kwargs):
     """Логирование вызова функции с параметрами"""
+    if not should_log_event('log_function_call'):
+        return
     params = ", ".join([f"{k}={v}" for k, v in kwargs.items()])
-    logger.debug(f"CALL {func_name}({params})")
+    logger.debug(f"CALL {func_name}({params})",
+                 extra={'event': 'log_function_call', 'function': func_name, 'sampled': True})
 
 def log_function_return(func_name, result):
     """Логирование возврата из функции"""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return
     logger.debug(f"RETURN {func_name} -> {result}")
 
 def log_error(func_name, error):
@@ -56,7 +307,7 @@ def log_rerun(source, reason=""):
     })
     
     # Если слишком много rerun за короткое время
-    recent = [r for r in st.session_state.rerun_log 
+    recent = [r for r in st.session_state.rerun_log
               if (datetime.now() - datetime.strptime(r['time'], '%H:%M:%S.%f')).seconds < 5]
     
     if len(recent) > 5:
@@ -72,4 +323,20 @@ def display_rerun_log():
             
             if st.button("Очистить лог"):
                 st.session_state.rerun_log = []
-                safe_rerun()
\ No newline at end of file
+                safe_rerun()
+
+def render_log_level_control():
+    """Переключатель уровня логирования (для отладочной панели)"""
+    current = get_log_level()
+    level = st.selectbox(
+        "Уровень логирования",
+        options=LOG_LEVELS,
+        index=LOG_LEVELS.index(current) if current in LOG_LEVELS else 0,
+        key="log_level_select"
+    )
+    if level != current:
+        set_log_level(level)
+    
+    dropped = get_dropped_records()
+    if dropped:
+        st.caption(f"⚠️ Отброшено записей лога: {dropped}")
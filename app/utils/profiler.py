@@ -0,0 +1,202 @@
+"""
+Профилирование rerun: время секций, SQL и вызовов ИИ
+
+Пока профилирование выключено, @profiled и timed() сводятся к одной
+проверке контекстной переменной, а соединения с БД не оборачиваются.
+"""
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import streamlit as st
+
+from data.database import add_query_listener, remove_query_listener
+
+HISTORY_SIZE = 500        # Сколько последних замеров храним на секцию
+MAX_QUERIES_PER_RERUN = 200
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_enabled = False
+_current = contextvars.ContextVar('fq_profile', default=None)
+
+_histograms: Dict[str, deque] = {}
+_histograms_lock = threading.Lock()
+
+
+class RerunProfile:
+    """Замеры одного запуска скрипта"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_ms = None
+        self.sections: Dict[str, List[float]] = {}   # имя -> [вызовов, мс]
+        self.queries: List[tuple] = []               # (мс, sql)
+        self.sql_count = 0
+        self.sql_ms = 0.0
+    
+    def add_section(self, name: str, ms: float):
+        stats = self.sections.setdefault(name, [0, 0.0])
+        stats[0] += 1
+        stats[1] += ms
+    
+    def add_query(self, sql: str, ms: float):
+        self.sql_count += 1
+        self.sql_ms += ms
+        if len(self.queries) < MAX_QUERIES_PER_RERUN:
+            self.queries.append((ms, ' '.join(sql.split())))
+    
+    def finish(self):
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+    
+    def slowest_queries(self, limit: int = 5) -> List[tuple]:
+        return sorted(self.queries, reverse=True)[:limit]
+
+
+def _record(name: str, ms: float):
+    with _histograms_lock:
+        history = _histograms.get(name)
+        if history is None:
+            history = _histograms[name] = deque(maxlen=HISTORY_SIZE)
+        history.append(ms)
+
+def _on_query(sql: str, seconds: float):
+    profile = _current.get()
+    if profile is None:
+        return
+    ms = seconds * 1000
+    profile.add_query(sql, ms)
+    _record('sql', ms)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+def set_enabled(flag: bool):
+    """Включить/выключить профилирование для всего процесса"""
+    global _enabled
+    _enabled = bool(flag)
+    if _enabled:
+        add_query_listener(_on_query)
+    else:
+        remove_query_listener(_on_query)
+        _current.set(None)
+
+def start_rerun() -> Optional[RerunProfile]:
+    """Начать замеры текущего rerun (ничего не делает, если выключено)"""
+    profile = RerunProfile() if _enabled else None
+    _current.set(profile)
+    return profile
+
+def finish_rerun(session_state):
+    """Закончить замеры и сохранить их для отладочной панели"""
+    profile = _current.get()
+    if profile is None:
+        return
+    profile.finish()
+    _record('rerun', profile.wall_ms)
+    session_state['last_rerun_profile'] = profile
+    _current.set(None)
+
+@contextmanager
+def timed(name: str):
+    """Замерить блок кода как секцию текущего rerun"""
+    profile = _current.get()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        ms = (time.perf_counter() - start) * 1000
+        profile.add_section(name, ms)
+        _record(name, ms)
+
+def profiled(name: str = None):
+    """Декоратор: замерять функцию как секцию (по умолчанию — её имя)"""
+    def decorator(func):
+        label = name or func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return func(*args, **kwargs)
+            with timed(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def histogram_summary() -> List[Dict]:
+    """Сводка скользящих гистограмм по всем секциям"""
+    with _histograms_lock:
+        snapshot = {name: list(values) for name, values in _histograms.items()}
+    
+    summary = []
+    for name, values in sorted(snapshot.items()):
+        buckets = {}
+        for ms in values:
+            bucket = next((f"≤{b}" for b in HISTOGRAM_BUCKETS_MS if ms <= b), f">{HISTOGRAM_BUCKETS_MS[-1]}")
+            buckets[bucket] = buckets.get(bucket, 0) + 1
+        summary.append({
+            'секция': name,
+            'замеров': len(values),
+            'p50, мс': round(_percentile(values, 50), 2),
+            'p95, мс': round(_percentile(values, 95), 2),
+            'max, мс': round(max(values), 2) if values else 0,
+            'распределение': ' '.join(f"{k}:{v}" for k, v in buckets.items()),
+        })
+    return summary
+
+def render_profiler_panel():
+    """Блок профилировщика для отладочной панели"""
+    st.subheader("⏱️ Профилирование")
+    enabled = st.checkbox("Замерять rerun", value=is_enabled(), key="profiler_enabled")
+    if enabled != is_enabled():
+        set_enabled(enabled)
+    
+    profile = st.session_state.get('last_rerun_profile')
+    if not profile:
+        st.caption("Замеров пока нет — включите профилирование и обновите страницу")
+        return
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Время rerun", f"{profile.wall_ms:.0f} мс")
+    with col2:
+        st.metric("SQL-запросов", profile.sql_count)
+    with col3:
+        st.metric("Время SQL", f"{profile.sql_ms:.1f} мс")
+    
+    sections = sorted(profile.sections.items(), key=lambda item: item[1][1], reverse=True)
+    if sections:
+        st.table([
+            {'секция': name, 'вызовов': count, 'мс': round(ms, 1)}
+            for name, (count, ms) in sections
+        ])
+    
+    slowest = profile.slowest_queries()
+    if slowest:
+        st.markdown("**Самые медленные запросы**")
+        for ms, sql in slowest:
+            st.text(f"{ms:7.2f} мс  {sql[:150]}")
+    
+    with st.expander("📊 Гистограммы (последние замеры)"):
+        st.table(histogram_summary())
+
+
+# Профилирование можно включить сразу при старте: FQ_PROFILE=1
+if os.getenv("FQ_PROFILE", "0") == "1":
+    set_enabled(True)
@@ -0,0 +1,300 @@
+"""
+Трассировка SQL: отпечатки запросов, задержки, медленные запросы и N+1
+
+Включается FQ_SQL_TRACE=1 или из отладочной панели. Трассировщик вешается
+на соединения из get_connection: set_trace_callback видит каждый оператор,
+который реально выполнил SQLite (включая executescript и BEGIN/COMMIT),
+а обёртки курсора дают время выполнения.
+"""
+import atexit
+import contextvars
+import csv
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import threading
+from collections import deque
+from datetime import datetime
+from io import StringIO
+from typing import Dict, List
+
+import streamlit as st
+
+from data.database import (
+    add_query_listener, remove_query_listener,
+    add_connection_hook, remove_connection_hook
+)
+from utils.logger import logger, LOG_DIR, LOG_FORMAT, SizedTimedRotatingFileHandler
+
+SLOW_QUERY_MS = float(os.getenv("FQ_SQL_SLOW_MS", "50"))
+N_PLUS_ONE_THRESHOLD = int(os.getenv("FQ_SQL_N_PLUS_ONE", "5"))  # Повторов одного запроса за rerun
+SAMPLES_PER_FINGERPRINT = 500
+SLOW_LOG_FILE = LOG_DIR / "slow_queries.log"
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_COMMENT_RE = re.compile(r"--[^\n]*")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """Нормализованный вид запроса: литералы и параметры -> ?, списки IN -> (?+)"""
+    text = _STRING_RE.sub('?', sql)
+    text = _COMMENT_RE.sub('', text)
+    text = _NUMBER_RE.sub('?', text)
+    text = _IN_LIST_RE.sub('(?+)', text)
+    return _SPACE_RE.sub(' ', text).strip().rstrip(';').lower()
+
+
+def _one_line(sql: str) -> str:
+    """Текст запроса в одну строку (комментарии -- убираем, иначе они съедят хвост)"""
+    return _SPACE_RE.sub(' ', _COMMENT_RE.sub('', sql)).strip()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FingerprintStats:
+    """Счётчики и выборка задержек одного отпечатка"""
+    
+    __slots__ = ('fingerprint', 'executions', 'timed', 'total_ms', 'max_ms', 'samples')
+    
+    def __init__(self, fp: str):
+        self.fingerprint = fp
+        self.executions = 0      # По trace callback — всё, что выполнил SQLite
+        self.timed = 0           # Из них замерено обёрткой курсора
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.samples = deque(maxlen=SAMPLES_PER_FINGERPRINT)
+    
+    def as_dict(self) -> Dict:
+        samples = list(self.samples)
+        return {
+            'fingerprint': self.fingerprint,
+            'count': self.executions,
+            'timed': self.timed,
+            'total_ms': round(self.total_ms, 2),
+            'p50_ms': round(_percentile(samples, 50), 3),
+            'p95_ms': round(_percentile(samples, 95), 3),
+            'max_ms': round(self.max_ms, 3),
+        }
+
+
+class QueryTracer:
+    """Сбор статистики по запросам всего процесса"""
+    
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS, n_plus_one: int = N_PLUS_ONE_THRESHOLD):
+        self.slow_ms = slow_ms
+        self.n_plus_one = n_plus_one
+        self.enabled = False
+        self._stats: Dict[str, FingerprintStats] = {}
+        self._suspects: Dict[tuple, Dict] = {}   # (scope, отпечаток) -> находка N+1
+        self._lock = threading.Lock()
+        self._scope = contextvars.ContextVar('fq_sql_scope', default=None)
+        self._slow_logger = None
+        self._slow_listener = None
+    
+    # --- включение ---
+    
+    def enable(self):
+        if self.enabled:
+            return
+        self._ensure_slow_log()
+        add_connection_hook(self._attach)
+        add_query_listener(self._on_timed)
+        self.enabled = True
+        logger.info(f"🔎 SQL trace enabled (slow > {self.slow_ms:.0f} ms)")
+    
+    def disable(self):
+        if not self.enabled:
+            return
+        remove_connection_hook(self._attach)
+        remove_query_listener(self._on_timed)
+        self.enabled = False
+        logger.info("🔎 SQL trace disabled")
+    
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._suspects.clear()
+    
+    def _ensure_slow_log(self):
+        """Отдельный файл для медленных запросов (пишется в фоне, как и основной лог)"""
+        if self._slow_logger is not None:
+            return
+        handler = SizedTimedRotatingFileHandler(
+            SLOW_LOG_FILE, max_bytes=5 * 1024 * 1024, when='midnight',
+            backupCount=7, encoding='utf-8', delay=True
+        )
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        log_queue = queue.Queue(maxsize=1000)
+        self._slow_listener = logging.handlers.QueueListener(log_queue, handler)
+        self._slow_listener.start()
+        atexit.register(self._slow_listener.stop)
+        
+        slow_logger = logging.getLogger("FamilyQuest.sql.slow")
+        slow_logger.propagate = False
+        slow_logger.setLevel(logging.WARNING)
+        slow_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+        self._slow_logger = slow_logger
+    
+    # --- сбор ---
+    
+    def _attach(self, conn):
+        conn.set_trace_callback(self._on_trace)
+    
+    def _get_stats(self, fp: str) -> FingerprintStats:
+        stats = self._stats.get(fp)
+        if stats is None:
+            stats = self._stats[fp] = FingerprintStats(fp)
+        return stats
+    
+    def _on_trace(self, statement: str):
+        # Операторы внутри триггеров приходят как комментарии "-- TRIGGER ..."
+        if statement.lstrip().startswith('--'):
+            return
+        fp = fingerprint(statement)
+        with self._lock:
+            self._get_stats(fp).executions += 1
+        
+        scope = self._scope.get()
+        if scope is not None:
+            scope['counts'][fp] = scope['counts'].get(fp, 0) + 1
+    
+    def _on_timed(self, sql: str, seconds: float):
+        ms = seconds * 1000
+        fp = fingerprint(sql)
+        with self._lock:
+            stats = self._get_stats(fp)
+            stats.timed += 1
+            stats.total_ms += ms
+            stats.max_ms = max(stats.max_ms, ms)
+            stats.samples.append(ms)
+        
+        if ms >= self.slow_ms:
+            # В лог идёт текст с ?, без значений параметров (там бывают хеши паролей)
+            scope = self._scope.get()
+            self._slow_logger.warning(
+                f"{ms:.1f} ms [{scope['name'] if scope else '-'}] {_one_line(sql)}"
+            )
+    
+    # --- области (rerun) для поиска N+1 ---
+    
+    def begin_scope(self, name: str):
+        """Начать область подсчёта повторов (обычно — один rerun)"""
+        self._scope.set({'name': name, 'counts': {}} if self.enabled else None)
+    
+    def end_scope(self) -> List[Dict]:
+        """Закончить область и вернуть найденные в ней повторы (N+1)"""
+        scope = self._scope.get()
+        self._scope.set(None)
+        if scope is None:
+            return []
+        
+        found = []
+        with self._lock:
+            for fp, count in scope['counts'].items():
+                if count < self.n_plus_one or fp in ('begin', 'commit', 'rollback'):
+                    continue
+                key = (scope['name'], fp)
+                suspect = self._suspects.setdefault(key, {
+                    'scope': scope['name'], 'fingerprint': fp,
+                    'max_repeats': 0, 'occurrences': 0
+                })
+                suspect['max_repeats'] = max(suspect['max_repeats'], count)
+                suspect['occurrences'] += 1
+                found.append({'fingerprint': fp, 'repeats': count})
+        
+        for item in found:
+            logger.warning(f"🔎 Possible N+1 in {scope['name']}: {item['repeats']}x {item['fingerprint'][:120]}")
+        return found
+    
+    # --- отчёт ---
+    
+    def report(self, limit: int = None) -> Dict:
+        """Сводка: отпечатки (по суммарному времени) и подозрения на N+1"""
+        with self._lock:
+            queries = [stats.as_dict() for stats in self._stats.values()]
+            suspects = sorted(self._suspects.values(), key=lambda s: s['max_repeats'], reverse=True)
+            suspects = [dict(s) for s in suspects]
+        queries.sort(key=lambda q: (q['total_ms'], q['count']), reverse=True)
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'slow_query_ms': self.slow_ms,
+            'queries': queries[:limit] if limit else queries,
+            'n_plus_one': suspects,
+        }
+    
+    def export_report(self, fmt: str = 'json') -> bytes:
+        """Отчёт для скачивания: json целиком или csv по отпечаткам"""
+        data = self.report()
+        if fmt == 'csv':
+            output = StringIO()
+            columns = ['fingerprint', 'count', 'timed', 'total_ms', 'p50_ms', 'p95_ms', 'max_ms']
+            writer = csv.DictWriter(output, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(data['queries'])
+            return output.getvalue().encode('utf-8')
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+_tracer = QueryTracer()
+
+def get_query_tracer() -> QueryTracer:
+    """Единый трассировщик на процесс"""
+    return _tracer
+
+def begin_trace_scope(name: str):
+    _tracer.begin_scope(name)
+
+def end_trace_scope() -> List[Dict]:
+    return _tracer.end_scope()
+
+def render_query_tracer_panel():
+    """Блок трассировки SQL для отладочной панели"""
+    st.subheader("🔎 Трассировка SQL")
+    enabled = st.checkbox("Собирать статистику запросов", value=_tracer.enabled, key="sql_trace_enabled")
+    if enabled and not _tracer.enabled:
+        _tracer.enable()
+    elif not enabled and _tracer.enabled:
+        _tracer.disable()
+    
+    data = _tracer.report(limit=15)
+    if not data['queries']:
+        st.caption("Запросов пока нет — включите трассировку и обновите страницу")
+        return
+    
+    if data['n_plus_one']:
+        st.warning(f"Возможные N+1: {len(data['n_plus_one'])}")
+        for suspect in data['n_plus_one'][:5]:
+            st.text(f"{suspect['scope']}: до {suspect['max_repeats']}x  {suspect['fingerprint'][:150]}")
+    
+    st.table([
+        {'запрос': q['fingerprint'][:80], 'раз': q['count'], 'p50, мс': q['p50_ms'],
+         'p95, мс': q['p95_ms'], 'всего, мс': q['total_ms']}
+        for q in data['queries']
+    ])
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("⬇️ JSON", _tracer.export_report('json'),
+                           file_name="sql_report.json", mime="application/json")
+    with col2:
+        st.download_button("⬇️ CSV", _tracer.export_report('csv'),
+                           file_name="sql_report.csv", mime="text/csv")
+    with col3:
+        if st.button("Сбросить статистику", key="sql_trace_reset"):
+            _tracer.reset()
+
+
+if os.getenv("FQ_SQL_TRACE", "0") == "1":
+    _tracer.enable()
@@ -0,0 +1,135 @@
+"""
+Бенчмарк: обзор семьи из 5 детей — последовательные запросы против AsyncRepository
+
+Запуск из корня репозитория:
+    python benchmarks/family_overview.py
+
+Последовательно — как раньше: get_children_for_parent, затем для каждого
+ребёнка load_child, все задания (load_tasks_from_db), get_daily_tasks и
+get_unlocked_achievements.
+Через фасад — data.async_repository.load_family_overview (те же методы,
+выполняемые в пуле потоков БД). Строка «те же запросы» — запросы
+AsyncRepository по очереди.
+
+Выигрыш к прежней загрузке даёт не пул, а сами запросы: load_child читает
+одну строку, задания не грузятся дважды. От пула выигрыша нет (около 1x к
+«тем же запросам»): одновременно идёт только время внутри SQLite, а сборка
+объектов Task в Python — под GIL, на одном ядре параллельности нет вовсе.
+
+Кэш read-моделей выключен (FQ_CACHE=0), чтобы каждый прогон ходил в БД.
+Код выхода 1, если фасад медленнее прежней загрузки или его накладные
+расходы больше OVERHEAD_LIMIT к тем же запросам по очереди.
+"""
+import atexit
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Временная БД и выключенный кэш — до импорта модулей приложения
+_tmp_dir = tempfile.mkdtemp(prefix="fq_bench_")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+os.environ["FQ_DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+os.environ["FQ_CACHE"] = "0"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.bootstrap import bootstrap_database
+from data.database import get_connection
+from data.async_repository import load_family_overview, DB_WORKERS
+from core.achievements import AchievementSystem, ACHIEVEMENTS
+from core.auth_system import AuthSystem
+from core.game_engine import GameEngine
+
+CHILDREN = 5
+TASKS_PER_CHILD = int(os.getenv("FQ_BENCH_TASKS", "3000"))
+RUNS = 15
+OVERHEAD_LIMIT = 1.25   # Фасад не дольше «тех же запросов» × это число
+
+
+def seed() -> int:
+    bootstrap_database()
+    auth = AuthSystem()
+    parent_id = auth.register_parent("bench_parent", "bench", "Родитель")
+    conn = get_connection()
+    for n in range(CHILDREN):
+        child_id = auth.register_child(f"bench_child_{n}", "bench", f"Ребёнок {n}", 7 + n, ["science"])
+        auth.accept_invitation(auth.generate_invite_code(parent_id), child_id)
+        conn.executemany('''
+            INSERT INTO tasks (user_id, title, description, category, points, difficulty, emoji,
+                               completed, created_by)
+            VALUES (?, ?, 'Описание задания', 'help', 10, 'easy', '⭐', ?, ?)
+        ''', [(child_id, f"Задание {i}", int(i % 3 == 0), parent_id) for i in range(TASKS_PER_CHILD)])
+        conn.executemany('INSERT INTO achievements (child_id, achievement_id) VALUES (?, ?)',
+                         [(child_id, ach_id) for ach_id in ACHIEVEMENTS])
+        conn.commit()
+    conn.close()
+    return parent_id
+
+
+def serial(parent_id: int) -> int:
+    """Как раньше: запросы страницы один за другим"""
+    children = AuthSystem().get_children_for_parent(parent_id)
+    engine = GameEngine()
+    total = 0
+    for child in children:
+        # load_child_data теперь читает одну страницу заданий — прежняя загрузка всех явно
+        engine.load_child(child['id'])
+        engine.tasks = engine.load_tasks_from_db(child['id'])
+        total += len(engine.get_daily_tasks(child['id']))
+        conn = get_connection()
+        total += len(AchievementSystem(conn).get_unlocked_achievements(child['id']))
+        conn.close()
+    return total
+
+
+def serial_same_queries(parent_id: int) -> int:
+    """Те же запросы, что у AsyncRepository, но по очереди (выигрыш только от параллельности)"""
+    children = AuthSystem().get_children_for_parent(parent_id)
+    engine = GameEngine()
+    total = 0
+    for child in children:
+        engine.load_child(child['id'])
+        total += len(engine.load_tasks_from_db(child['id']))
+        conn = get_connection()
+        total += len(AchievementSystem(conn).get_unlocked_achievements(child['id']))
+        conn.close()
+    return total
+
+
+def concurrent(parent_id: int) -> int:
+    overview = load_family_overview(parent_id)
+    return sum(len(o['tasks']) + len(o['achievements']) for o in overview.values())
+
+
+def timed(func, parent_id: int):
+    samples, result = [], None
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        result = func(parent_id)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parent_id = seed()
+    serial(parent_id), concurrent(parent_id)  # Прогрев
+
+    serial_ms, serial_rows = timed(serial, parent_id)
+    same_ms, same_rows = timed(serial_same_queries, parent_id)
+    concurrent_ms, concurrent_rows = timed(concurrent, parent_id)
+
+    print(f"Семья: {CHILDREN} детей, по {TASKS_PER_CHILD} заданий (медиана {RUNS} прогонов, "
+          f"{os.cpu_count()} CPU, пул {DB_WORKERS} потоков)")
+    print(f"  последовательно:  {serial_ms:7.1f} мс  ({serial_rows} строк)")
+    print(f"  те же запросы:    {same_ms:7.1f} мс  ({same_rows} строк)")
+    print(f"  AsyncRepository:  {concurrent_ms:7.1f} мс  ({concurrent_rows} строк)")
+    print(f"  к прежней загрузке: {serial_ms / same_ms:.2f}x от новых запросов, "
+          f"пул к тем же запросам по очереди: {same_ms / concurrent_ms:.2f}x")
+    return 0 if concurrent_ms < serial_ms and concurrent_ms <= same_ms * OVERHEAD_LIMIT else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
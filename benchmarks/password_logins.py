@@ -0,0 +1,146 @@
+"""
+Бенчмарк: входов в секунду при текущих параметрах KDF (core.passwords)
+
+Запуск из корня репозитория:
+    python benchmarks/password_logins.py
+    FQ_SCRYPT_N=32768 FQ_SCRYPT_P=1 python benchmarks/password_logins.py
+
+Замеряется AuthSystem.login целиком (запрос пользователя + проверка пароля):
+  - по одному, кэш проверок сброшен — честная стоимость KDF;
+  - пачка одновременных входов BURST потоками (KDF в пуле FQ_PASSWORD_WORKERS)
+    и задержка лёгкого запроса «другой сессии» во время пачки;
+  - повторный вход с тем же паролем (кэш успешных проверок).
+Отдельно проверяется перехеширование старого sha256-хеша при входе.
+
+Код выхода 1, если старый хеш не перехеширован или входов в секунду
+меньше MIN_LOGINS_PER_SEC (стоимость KDF слишком высока для сервера).
+"""
+import atexit
+import hashlib
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Временная БД и выключенный кэш read-моделей — до импорта модулей приложения
+_tmp_dir = tempfile.mkdtemp(prefix="fq_bench_")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+os.environ["FQ_DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+os.environ["FQ_CACHE"] = "0"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.bootstrap import bootstrap_database
+from data.database import get_connection
+from core.auth_system import AuthSystem
+from core import passwords
+
+USERS = 8
+BURST = 16
+RUNS = 5
+MIN_LOGINS_PER_SEC = float(os.getenv("FQ_BENCH_MIN_LOGINS", "2"))
+
+
+def seed(auth):
+    bootstrap_database()
+    users = [(f"bench_user_{n}", f"secret-{n}") for n in range(USERS)]
+    for username, password in users:
+        auth.register_parent(username, password, username)
+    return users
+
+
+def sequential(auth, users) -> float:
+    """Входов в секунду по одному (без кэша проверок)"""
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        for username, password in users:
+            passwords.clear_verify_cache()
+            assert auth.login(username, password)
+    return RUNS * len(users) / (time.perf_counter() - started)
+
+
+def burst(auth, users):
+    """Пачка одновременных входов: входов в секунду и задержка чужого запроса"""
+    passwords.clear_verify_cache()
+    done = threading.Event()
+    latencies = []
+
+    def other_session():
+        # Лёгкий запрос соседней сессии, пока идут входы
+        while not done.is_set():
+            started = time.perf_counter()
+            auth.get_user_by_id(1)
+            latencies.append((time.perf_counter() - started) * 1000)
+            time.sleep(0.005)
+
+    watcher = threading.Thread(target=other_session)
+    watcher.start()
+    logins = [users[i % len(users)] for i in range(BURST)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=BURST) as pool:
+        results = list(pool.map(lambda user: auth.login(*user), logins))
+    elapsed = time.perf_counter() - started
+    done.set()
+    watcher.join()
+    assert all(results)
+    return BURST / elapsed, statistics.median(latencies), max(latencies)
+
+
+def cached(auth, users) -> float:
+    """Повторные входы (успешная проверка уже в кэше)"""
+    for user in users:
+        auth.login(*user)
+    started = time.perf_counter()
+    for _ in range(RUNS * 20):
+        for username, password in users:
+            auth.login(username, password)
+    return RUNS * 20 * len(users) / (time.perf_counter() - started)
+
+
+def legacy_rehash(auth) -> bool:
+    """Пользователь со старым sha256-хешем: вход проходит, хеш заменяется"""
+    conn = get_connection()
+    conn.execute('''
+        INSERT INTO users (username, password_hash, name, user_type) VALUES (?, ?, ?, 'parent')
+    ''', ("legacy_user", hashlib.sha256(b"old-secret").hexdigest(), "legacy_user"))
+    conn.commit()
+    user = auth.login("legacy_user", "old-secret")
+    stored = conn.execute("SELECT password_hash FROM users WHERE username = 'legacy_user'").fetchone()[0]
+    conn.close()
+    passwords.clear_verify_cache()
+    return bool(user) and not passwords.needs_rehash(stored) and bool(auth.login("legacy_user", "old-secret"))
+
+
+def main():
+    auth = AuthSystem()
+    users = seed(auth)
+
+    started = time.perf_counter()
+    passwords.hash_password("benchmark")
+    hash_ms = (time.perf_counter() - started) * 1000
+
+    sequential_rate = sequential(auth, users)
+    burst_rate, other_median, other_max = burst(auth, users)
+    cached_rate = cached(auth, users)
+    rehashed = legacy_rehash(auth)
+
+    if passwords.PASSWORD_KDF == "scrypt":
+        params = f"scrypt N={passwords.SCRYPT_N} r={passwords.SCRYPT_R} p={passwords.SCRYPT_P}"
+    else:
+        params = f"pbkdf2_sha256 {passwords.PBKDF2_ITERATIONS} итераций"
+    print(f"KDF: {params}, пул {passwords.PASSWORD_WORKERS} потоков, {os.cpu_count()} CPU")
+    print(f"  один хеш:                          {hash_ms:8.1f} мс")
+    print(f"  входов в секунду по одному:        {sequential_rate:8.1f}")
+    print(f"  входов в секунду, пачка из {BURST}:     {burst_rate:8.1f}")
+    print(f"  запрос другой сессии во время пачки: медиана {other_median:.1f} мс, максимум {other_max:.1f} мс")
+    print(f"  повторных входов в секунду (кэш):  {cached_rate:8.1f}")
+    print(f"  старый sha256-хеш перехеширован:   {'да' if rehashed else 'НЕТ'}")
+    return 0 if rehashed and sequential_rate >= MIN_LOGINS_PER_SEC else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
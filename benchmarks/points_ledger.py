@@ -0,0 +1,122 @@
+"""
+Бенчмарк: баланс по журналу баллов (снимок + хвост) и сверка users.points
+
+Запуск из корня репозитория:
+    python benchmarks/points_ledger.py
+
+CHILDREN детей, у каждого EVENTS событий в points_ledger, записанных
+через data.points_ledger.record (как из приложения: начисления и
+списания, снимок каждые SNAPSHOT_EVERY событий). Замеряется:
+  - баланс одного ребёнка: снимок + хвост против полной суммы журнала;
+  - reconcile_points по всем детям (снимок + хвост и полная сверка);
+  - сверка находит и исправляет искусственное расхождение users.points.
+
+Кэш read-моделей выключен (FQ_CACHE=0). Код выхода 1, если баланс по
+снимку не совпал с полной суммой, сверка нашла лишнее или не нашла
+подстроенное расхождение.
+"""
+import atexit
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+# Временная БД и выключенный кэш read-моделей — до импорта модулей приложения
+_tmp_dir = tempfile.mkdtemp(prefix="fq_bench_")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+os.environ["FQ_DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+os.environ["FQ_CACHE"] = "0"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.bootstrap import bootstrap_database
+from data.database import get_connection
+from data.points_ledger import ADJUSTMENT, TASK, SNAPSHOT_EVERY, ledger_balance, reconcile_points, record
+from core.auth_system import AuthSystem
+
+CHILDREN = int(os.getenv("FQ_BENCH_CHILDREN", "20"))
+EVENTS = int(os.getenv("FQ_BENCH_EVENTS", "1000"))
+RUNS = 200
+
+
+def seed():
+    bootstrap_database()
+    auth = AuthSystem()
+    children = [auth.register_child(f"bench_child_{n}", "bench", f"Ребёнок {n}", 8, ["science"])
+                for n in range(CHILDREN)]
+
+    # События детей вперемешку, как в жизни; пачками по одной транзакции
+    rng = random.Random(42)
+    events = [child_id for child_id in children for _ in range(EVENTS)]
+    rng.shuffle(events)
+    conn = get_connection()
+    cursor = conn.cursor()
+    for n, child_id in enumerate(events, 1):
+        if rng.random() < 0.8:
+            record(cursor, child_id, rng.randint(5, 50), TASK, n)
+        else:
+            record(cursor, child_id, -rng.randint(1, 20), ADJUSTMENT)
+        if n % 1000 == 0:
+            conn.commit()
+    conn.commit()
+    conn.close()
+    return children
+
+
+def timed(func) -> float:
+    func()  # Прогрев
+    samples = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    started = time.perf_counter()
+    children = seed()
+    seed_s = time.perf_counter() - started
+    child_id = children[len(children) // 2]
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    full_sum = lambda: cursor.execute("SELECT SUM(delta) FROM points_ledger WHERE child_id = ?",
+                                      (child_id,)).fetchone()[0]
+    same_balance = ledger_balance(cursor, child_id) == full_sum()
+    snapshot_ms = timed(lambda: ledger_balance(cursor, child_id))
+    full_ms = timed(full_sum)
+
+    started = time.perf_counter()
+    clean = reconcile_points(repair=False)
+    reconcile_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    clean_full = reconcile_points(repair=False, full=True)
+    reconcile_full_ms = (time.perf_counter() - started) * 1000
+
+    # Расхождение: баллы поменяли в обход журнала
+    conn.execute("UPDATE users SET points = points + 7 WHERE id = ?", (child_id,))
+    conn.commit()
+    found = reconcile_points()
+    fixed = reconcile_points(repair=False)
+    conn.close()
+
+    print(f"{CHILDREN} детей по {EVENTS} событий (снимок каждые {SNAPSHOT_EVERY}), запись {seed_s:.1f} с")
+    print(f"  баланс: снимок + хвост          {snapshot_ms:7.3f} мс")
+    print(f"  баланс: полная сумма журнала    {full_ms:7.3f} мс ({full_ms / max(snapshot_ms, 1e-6):.1f}x дольше)")
+    print(f"  баланс по снимку = полной сумме: {'да' if same_balance else 'НЕТ'}")
+    print(f"  сверка всех детей (снимок)      {reconcile_ms:7.1f} мс, расхождений {len(clean['mismatched'])}")
+    print(f"  сверка всех детей (полная)      {reconcile_full_ms:7.1f} мс, расхождений {len(clean_full['mismatched'])}")
+    print(f"  подстроенное расхождение: найдено {len(found['mismatched'])}, исправлено {found['repaired']}, "
+          f"осталось {len(fixed['mismatched'])}")
+
+    ok = (same_balance and not clean['mismatched'] and not clean_full['mismatched']
+          and len(found['mismatched']) == 1 and found['repaired'] == 1 and not fixed['mismatched'])
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
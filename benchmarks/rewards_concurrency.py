@@ -0,0 +1,137 @@
+"""
+Стресс-тест: одновременные покупки наград не тратят больше, чем есть
+
+Запуск из корня репозитория:
+    python benchmarks/rewards_concurrency.py
+
+У ребёнка BALANCE баллов; core.rewards.purchase_reward вызывается
+одновременно:
+  - THREADS потоками в одном процессе (как сессии одного сервера);
+  - PROCESSES процессами по THREADS потоков (несколько серверов на одной БД);
+  - THREADS потоками с одним и тем же ключом покупки (повтор нажатия).
+Каждая попытка — покупка награды за COST баллов, попыток больше, чем
+хватит баллов.
+
+После каждого прогона проверяется: баланс не отрицательный, списано ровно
+COST × число успешных покупок, сумма points_ledger совпадает с
+users.points, строк в rewards_history столько же, сколько покупок, а
+повтор с одним ключом списал один раз. Код выхода 1 при любом нарушении.
+
+Проверяется в tests/test_rewards_concurrency.py.
+"""
+import atexit
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Временная БД и выключенный кэш read-моделей — до импорта модулей приложения
+_tmp_dir = tempfile.mkdtemp(prefix="fq_bench_")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+os.environ["FQ_DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+os.environ["FQ_CACHE"] = "0"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.bootstrap import bootstrap_database
+from data.database import get_connection
+from core.auth_system import AuthSystem
+from core.rewards import add_reward, purchase_reward
+
+BALANCE = 1000
+COST = 30
+THREADS = 16
+PROCESSES = 4
+ATTEMPTS = 4        # Покупок на поток
+
+
+def seed():
+    bootstrap_database()
+    auth = AuthSystem()
+    parent_id = auth.register_parent("bench_parent", "bench", "Родитель")
+    child_id = auth.register_child("bench_child", "bench", "Ребёнок", 9, ["science"])
+    auth.accept_invitation(auth.generate_invite_code(parent_id), child_id)
+    reward_id = add_reward(parent_id, "Тестовая награда", COST)
+    return child_id, reward_id
+
+
+def top_up(child_id):
+    """Выставить баланс BALANCE (с записью в журнал, как любое изменение)"""
+    conn = get_connection()
+    points = conn.execute("SELECT points FROM users WHERE id = ?", (child_id,)).fetchone()[0]
+    conn.execute("UPDATE users SET points = ? WHERE id = ?", (BALANCE, child_id))
+    conn.execute('''
+        INSERT INTO points_ledger (child_id, delta, balance_after, reason) VALUES (?, ?, ?, 'opening')
+    ''', (child_id, BALANCE - points, BALANCE))
+    conn.commit()
+    conn.close()
+
+
+def state(child_id):
+    conn = get_connection()
+    points = conn.execute("SELECT points FROM users WHERE id = ?", (child_id,)).fetchone()[0]
+    ledger, last = conn.execute('''
+        SELECT SUM(delta), (SELECT balance_after FROM points_ledger WHERE child_id = ? ORDER BY id DESC LIMIT 1)
+        FROM points_ledger WHERE child_id = ?
+    ''', (child_id, child_id)).fetchone()
+    purchases = conn.execute("SELECT COUNT(*) FROM rewards_history WHERE child_id = ?", (child_id,)).fetchone()[0]
+    conn.close()
+    return points, ledger, last, purchases
+
+
+def thread_storm(child_id, reward_id, same_key: str = None) -> Counter:
+    """THREADS потоков по ATTEMPTS покупок; счётчик статусов"""
+    def attempt(_):
+        return purchase_reward(child_id, reward_id, same_key).status
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return Counter(pool.map(attempt, range(THREADS * ATTEMPTS)))
+
+
+def _process_worker(args):
+    child_id, reward_id = args
+    return thread_storm(child_id, reward_id)
+
+
+def process_storm(child_id, reward_id) -> Counter:
+    """PROCESSES процессов, в каждом — thread_storm"""
+    with multiprocessing.get_context("fork").Pool(PROCESSES) as pool:
+        return sum(pool.map(_process_worker, [(child_id, reward_id)] * PROCESSES), Counter())
+
+
+def run(name, child_id, storm, expect_single: bool = False) -> bool:
+    """Прогон storm() с полным балансом и проверка инвариантов"""
+    top_up(child_id)
+    purchases_before = state(child_id)[3]
+    started = time.perf_counter()
+    statuses = storm()
+    elapsed = time.perf_counter() - started
+
+    points, ledger, last, purchases = state(child_id)
+    bought = statuses['ok']
+    expected = 1 if expect_single else BALANCE // COST
+    ok = (points >= 0 and BALANCE - points == bought * COST and bought == expected
+          and ledger == points and last == points and purchases - purchases_before == bought)
+    print(f"  {name:34s} попыток {sum(statuses.values()):4d} за {elapsed * 1000:6.0f} мс: "
+          f"{dict(statuses)}, баланс {points}, журнал {ledger} — {'ок' if ok else 'НАРУШЕНИЕ'}")
+    return ok
+
+
+def main():
+    child_id, reward_id = seed()
+    print(f"Баланс {BALANCE}, награда {COST} баллов (хватает на {BALANCE // COST}), {os.cpu_count()} CPU")
+    results = [
+        run(f"{THREADS} потоков", child_id, lambda: thread_storm(child_id, reward_id)),
+        run(f"{PROCESSES} процесса × {THREADS} потоков", child_id, lambda: process_storm(child_id, reward_id)),
+        run(f"{THREADS} потоков, один ключ покупки", child_id,
+            lambda: thread_storm(child_id, reward_id, same_key="bench-same-click"), expect_single=True),
+    ]
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Микробенчмарк: сборка заданий и детей из результата запроса
+
+Запуск из корня репозитория:
+    python benchmarks/row_mapping.py
+
+Сравниваются:
+  - прежний путь: sqlite3.Row -> dict(row) -> json.loads / fromisoformat ->
+    конструктор с именованными аргументами;
+  - Task.from_row / Child.from_row по sqlite3.Row;
+  - data.row_mapping (план колонок как row_factory, ленивый разбор);
+  - data.row_mapping с чтением ленивых полей у каждой записи (худший случай).
+
+Время — выполнение запроса и сборка всех записей, медиана RUNS прогонов.
+Код выхода 1, если data.row_mapping не быстрее прежнего пути.
+"""
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime, date
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.models import Task, Child
+from data.row_mapping import TASK_ROWS, CHILD_ROWS
+from utils.avatars import avatar_ref
+
+TASKS = int(os.getenv("FQ_BENCH_TASKS", "100000"))
+CHILDREN = TASKS // 5
+RUNS = 7
+
+TASKS_SQL = "SELECT * FROM tasks"
+CHILDREN_SQL = "SELECT * FROM users"
+
+
+def create_db():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.executescript('''
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, description TEXT,
+            category TEXT, points INTEGER, difficulty TEXT, emoji TEXT,
+            photo_required BOOLEAN, due_date TEXT, completed BOOLEAN,
+            completed_at TEXT, photo_url TEXT, created_at TEXT, created_by INTEGER
+        );
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY, username TEXT, password_hash TEXT, name TEXT,
+            user_type TEXT, age INTEGER, interests TEXT, avatar TEXT, points INTEGER,
+            level INTEGER, streak_days INTEGER, last_active TEXT, created_at TEXT
+        );
+    ''')
+    conn.executemany('''
+        INSERT INTO tasks (user_id, title, description, category, points, difficulty, emoji,
+                           photo_required, completed, created_at)
+        VALUES (?, ?, 'Описание задания', 'help', 10, 'easy', '⭐', 0, ?, '2024-05-01 10:00:00')
+    ''', [(i % 5 + 1, f"Задание {i}", int(i % 3 == 0)) for i in range(TASKS)])
+    conn.executemany('''
+        INSERT INTO users (username, password_hash, name, user_type, age, interests, avatar,
+                           points, level, streak_days, last_active)
+        VALUES (?, 'x', ?, 'child', 9, '["science", "sport"]', NULL, 120, 2, 3, '2024-05-01')
+    ''', [(f"child_{i}", f"Ребёнок {i}") for i in range(CHILDREN)])
+    return conn
+
+
+def legacy_tasks(conn):
+    tasks = []
+    for row in conn.execute(TASKS_SQL).fetchall():
+        task_data = dict(row)
+        tasks.append(Task(
+            id=task_data['id'],
+            title=task_data['title'],
+            description=task_data['description'],
+            category=task_data['category'],
+            points=task_data['points'],
+            difficulty=task_data['difficulty'],
+            emoji=task_data['emoji'],
+            photo_required=bool(task_data['photo_required']),
+            child_id=task_data['user_id'],
+            due_date=task_data.get('due_date'),
+            completed=bool(task_data['completed']),
+            completed_at=task_data.get('completed_at'),
+            photo_url=task_data.get('photo_url'),
+            created_at=datetime.fromisoformat(task_data['created_at']) if task_data['created_at'] else datetime.now()
+        ))
+    return tasks
+
+
+def legacy_children(conn):
+    children = []
+    for row in conn.execute(CHILDREN_SQL).fetchall():
+        child_data = dict(row)
+        child_data['interests'] = json.loads(child_data['interests']) if child_data.get('interests') else []
+        children.append(Child(
+            id=child_data['id'],
+            name=child_data['name'],
+            age=child_data['age'],
+            avatar=child_data.get('avatar') or avatar_ref(child_data['name']),
+            interests=child_data['interests'],
+            points=child_data.get('points', 0),
+            level=child_data.get('level', 1),
+            streak_days=child_data.get('streak_days', 0),
+            last_active=datetime.fromisoformat(child_data['last_active']).date() if child_data.get('last_active') else date.today(),
+            parent_id=1
+        ))
+    return children
+
+
+def from_row_tasks(conn):
+    return [Task.from_row(row) for row in conn.execute(TASKS_SQL).fetchall()]
+
+def from_row_children(conn):
+    return [Child.from_row(row, 1) for row in conn.execute(CHILDREN_SQL).fetchall()]
+
+
+def mapped_tasks(conn):
+    return TASK_ROWS.fetchall(conn.execute(TASKS_SQL))
+
+def mapped_children(conn):
+    return CHILD_ROWS.fetchall(conn.execute(CHILDREN_SQL), parent_id=1)
+
+
+def mapped_tasks_touched(conn):
+    tasks = mapped_tasks(conn)
+    for task in tasks:
+        task.created_at
+    return tasks
+
+def mapped_children_touched(conn):
+    children = mapped_children(conn)
+    for child in children:
+        child.interests, child.last_active
+    return children
+
+
+def timed(func, conn) -> float:
+    func(conn)  # Прогрев (и компиляция плана)
+    samples = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        func(conn)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    conn = create_db()
+    assert [t.created_at for t in mapped_tasks(conn)[:3]] == [t.created_at for t in legacy_tasks(conn)[:3]]
+    assert mapped_children(conn)[0].interests == legacy_children(conn)[0].interests
+
+    ok = True
+    for title, count, legacy, from_row, mapped, touched in (
+        ("заданий", TASKS, legacy_tasks, from_row_tasks, mapped_tasks, mapped_tasks_touched),
+        ("детей", CHILDREN, legacy_children, from_row_children, mapped_children, mapped_children_touched),
+    ):
+        legacy_ms = timed(legacy, conn)
+        from_row_ms = timed(from_row, conn)
+        mapped_ms = timed(mapped, conn)
+        touched_ms = timed(touched, conn)
+        print(f"{count} {title} (медиана {RUNS} прогонов)")
+        print(f"  dict(row) + конструктор:            {legacy_ms:7.1f} мс")
+        print(f"  from_row по sqlite3.Row:            {from_row_ms:7.1f} мс")
+        print(f"  row_mapping (ленивый разбор):       {mapped_ms:7.1f} мс  ({legacy_ms / mapped_ms:.2f}x)")
+        print(f"  row_mapping + чтение ленивых полей: {touched_ms:7.1f} мс  ({legacy_ms / touched_ms:.2f}x)")
+        ok = ok and mapped_ms < legacy_ms
+
+    conn.close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
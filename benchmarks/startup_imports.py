@@ -0,0 +1,134 @@
+"""
+Бенчмарк: время импортов при холодном старте main.py (python -X importtime)
+
+Запуск из корня репозитория:
+    python benchmarks/startup_imports.py
+
+Список импортов берётся из самого main.py (импорты верхнего уровня), так что
+бенчмарк не расходится с приложением. Streamlit (и то, что он тянет сам:
+pandas, pyarrow, тема plotly) считается базой и в бюджет не входит —
+считаются только модули, загруженные после него.
+
+Бюджет — доля от импорта «всех разделов сразу», замеренного тут же:
+FQ_STARTUP_BUDGET_SHARE (по умолчанию 0.5, медианы из FQ_STARTUP_RUNS
+прогонов). Доля от замера на той же машине не зависит от её скорости;
+FQ_STARTUP_BUDGET_MS задаёт ещё и абсолютный бюджет (по умолчанию не
+проверяется). Кроме того, при старте не должны загружаться модули из
+FORBIDDEN — они нужны только отдельным разделам и фоновым задачам. Код
+выхода 1, если бюджет превышен или запрещённый модуль загружен.
+
+Проверяется в tests/test_startup_imports.py.
+"""
+import ast
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app'))
+BUDGET_SHARE = float(os.getenv("FQ_STARTUP_BUDGET_SHARE", "0.5"))
+BUDGET_MS = float(os.getenv("FQ_STARTUP_BUDGET_MS", "0"))  # 0 — абсолютный бюджет не проверяется
+RUNS = int(os.getenv("FQ_STARTUP_RUNS", "5"))
+
+# Грузятся при первом открытии своего раздела (или в фоне, utils.background), а не при старте
+FORBIDDEN = (
+    "core.ai_generator", "utils.export", "utils.export_jobs",
+    "requests", "urllib3", "dotenv",
+    "ui.tabs.", "ui.auth.login_page",
+    "data.archive", "core.invites", "data.points_ledger", "data.async_repository",
+    "core.rewards", "data.task_pages",
+)
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def startup_modules(path: str):
+    """Модули, которые main.py импортирует на верхнем уровне (в порядке появления)"""
+    tree = ast.parse(open(path, encoding="utf-8").read())
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+
+def importtime(code: str):
+    """[(self_us, cumulative_us, depth, module)] для одного холодного запуска интерпретатора"""
+    with tempfile.TemporaryDirectory(prefix="fq_import_") as tmp:
+        env = dict(os.environ, FQ_DB_PATH=os.path.join(tmp, "bench.db"))
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=APP_DIR, env=env, capture_output=True, text=True
+        )
+    if proc.returncode != 0:
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit(f"Импорт завершился с ошибкой (код {proc.returncode})")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((int(self_us), int(cumulative_us), len(indent) // 2, module))
+    return rows
+
+
+def app_part(rows):
+    """Строки после загрузки streamlit (importtime печатает модуль после его зависимостей)"""
+    for i, (_, _, depth, module) in enumerate(rows):
+        if module == "streamlit" and depth == 0:
+            return rows[i + 1:]
+    return rows
+
+
+def measure(modules):
+    code = "import streamlit\n" + "".join(f"import {m}\n" for m in modules if m != "streamlit")
+    rows = app_part(importtime(code))
+    return sum(r[0] for r in rows) / 1000, rows
+
+
+def main():
+    modules = startup_modules(os.path.join(APP_DIR, "main.py"))
+    print(f"Импорты main.py: {', '.join(modules)}")
+
+    measure(modules)  # Прогрев: .pyc и файловый кэш
+    samples = []
+    for _ in range(RUNS):
+        ms, rows = measure(modules)
+        samples.append(ms)
+    median = statistics.median(samples)
+
+    # Для сравнения (и как мерило бюджета): если бы все разделы импортировались сразу
+    eager = modules + [
+        "ui.tabs.daily_tasks", "ui.tabs.create_task", "ui.tabs.ai_tasks", "ui.tabs.achievements",
+        "ui.tabs.rewards", "ui.tabs.profile", "ui.tabs.family", "ui.tabs.child_connection",
+        "ui.tabs.parent_dashboard", "ui.auth.login_page", "core.ai_generator", "utils.export",
+        "utils.background", "data.archive", "core.invites", "data.points_ledger", "data.async_repository",
+    ]
+    eager_ms = statistics.median(measure(eager)[0] for _ in range(RUNS))
+    budget_ms = eager_ms * BUDGET_SHARE
+    if BUDGET_MS:
+        budget_ms = min(budget_ms, BUDGET_MS)
+
+    print(f"Импорты приложения при старте: {median:.1f} мс (медиана {RUNS} прогонов, бюджет {budget_ms:.1f} мс)")
+    print(f"Для сравнения, все разделы сразу: {eager_ms:.1f} мс (старт — {median / eager_ms:.0%})")
+    print("Самые дорогие модули (собственное время):")
+    for self_us, _, _, module in sorted(rows, reverse=True)[:10]:
+        print(f"  {self_us / 1000:7.2f} мс  {module}")
+
+    loaded = [r[3] for r in rows]
+    forbidden = sorted({m for m in loaded for f in FORBIDDEN if m == f or (f.endswith(".") and m.startswith(f))})
+    if forbidden:
+        print(f"❌ При старте загружены модули отдельных разделов: {', '.join(forbidden)}")
+    if median > budget_ms:
+        print(f"❌ Бюджет превышен: {median:.1f} мс > {budget_ms:.1f} мс")
+
+    return 1 if forbidden or median > budget_ms else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
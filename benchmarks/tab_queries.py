@@ -0,0 +1,128 @@
+"""
+Бенчмарк: SQL-запросов за rerun при st.tabs (все вкладки) и при ленивой навигации
+
+Запуск из корня репозитория:
+    python benchmarks/tab_queries.py
+
+Работает на временной копии БД (FQ_DB_PATH) и прогоняет экран ребёнка через
+streamlit.testing.v1.AppTest: один прогон для прогрева, второй — замер.
+Если скрипт упал или не завершился, бенчмарк завершается с кодом 1:
+запросы недовыполненного rerun ничего не говорят.
+"""
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# Временная БД — до импорта модулей приложения
+_tmp_dir = tempfile.mkdtemp(prefix="fq_bench_")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+os.environ["FQ_DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from streamlit.testing.v1 import AppTest
+
+from data.database import init_database, add_connection_hook
+from core.auth_system import AuthSystem
+from core.game_engine import GameEngine
+
+TASKS_PER_CHILD = 20
+
+SCRIPT = '''
+import contextlib
+import streamlit as st
+from streamlit.delta_generator import DeltaGenerator
+# AppTest 1.28 не умеет разбирать st.container в дерево элементов — для замера
+# запросов контейнер не нужен, а без него видно исключения скрипта (at.exception)
+DeltaGenerator.container = lambda self, *args, **kwargs: contextlib.nullcontext()
+st.container = DeltaGenerator.container.__get__(st._main)
+from core.game_engine import GameEngine
+from ui.components import render_sidebar
+from ui.navigation import CHILD_VIEWS, render_child_views
+
+if 'engine' not in st.session_state:
+    st.session_state.engine = GameEngine()
+engine = st.session_state.engine
+engine.load_child_data({child_id})
+render_sidebar(engine, {child_id})
+
+if {mode!r} == 'tabs':
+    # Как было: st.tabs выполняет все вкладки
+    for tab, render in zip(st.tabs(list(CHILD_VIEWS)), CHILD_VIEWS.values()):
+        with tab:
+            render(engine, {child_id})
+else:
+    st.session_state.setdefault('child_view_active', {view!r})
+    render_child_views(engine, {child_id})
+'''
+
+_statements = 0
+
+def _count(conn):
+    def trace(statement):
+        global _statements
+        _statements += 1
+    conn.set_trace_callback(trace)
+
+
+def seed() -> int:
+    init_database()
+    auth = AuthSystem()
+    parent_id = auth.register_parent("bench_parent", "bench", "Родитель")
+    child_id = auth.register_child("bench_child", "bench", "Маша", 9, ["science", "art"])
+    code = auth.generate_invite_code(parent_id)
+    auth.accept_invitation(code, child_id)
+
+    engine = GameEngine()
+    for i in range(TASKS_PER_CHILD):
+        engine.save_task_to_db({
+            'child_id': child_id, 'title': f"Задание {i}", 'description': "Описание",
+            'category': "help", 'points': 10, 'difficulty': "easy", 'emoji': "⭐",
+            'created_by': parent_id,
+        })
+    return child_id
+
+
+class ScriptFailed(Exception):
+    pass
+
+
+def measure(child_id: int, mode: str, view: str = None) -> int:
+    """Запросов за один rerun экрана ребёнка (отдельный AppTest на каждый замер)"""
+    global _statements
+    _statements = 0
+    at = AppTest.from_string(SCRIPT.format(child_id=child_id, mode=mode, view=view), default_timeout=30)
+    at.run()
+    if at.exception:
+        raise ScriptFailed(f"{mode}/{view}: " + "; ".join(e.message for e in at.exception))
+    return _statements
+
+
+def main():
+    from ui.navigation import CHILD_VIEWS
+
+    child_id = seed()
+    add_connection_hook(_count)
+
+    try:
+        measure(child_id, 'tabs')  # Прогрев: импорты модулей приложения
+        before = measure(child_id, 'tabs')
+        print(f"st.tabs (все {len(CHILD_VIEWS)} вкладок): {before} SQL за rerun")
+        print("Ленивая навигация (только выбранный раздел):")
+        results = {}
+        for view in CHILD_VIEWS:
+            results[view] = measure(child_id, 'lazy', view)
+            print(f"  {view:<16} {results[view]:>4}")
+    except ScriptFailed as e:
+        print(f"Скрипт упал, запросы не считаются: {e}")
+        return 1
+
+    worst = max(results.values())
+    print(f"Худший раздел: {worst} SQL за rerun (было {before}, в {before / max(worst, 1):.1f} раза меньше)")
+    return 0 if worst < before else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
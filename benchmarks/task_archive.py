@@ -0,0 +1,158 @@
+"""
+Бенчмарк: горячая таблица tasks до и после переноса истории в архив
+
+Запуск из корня репозитория:
+    python benchmarks/task_archive.py
+
+Семья из 5 детей: по FQ_BENCH_DAYS дней истории (8 выполненных заданий в
+день) и 30 открытых заданий у каждого. Замеряются запросы, которые идут
+на каждом rerun (открытые задания, первая страница истории, загрузка
+семьи), и размер tasks с её индексами в страницах БД (dbstat) — до и после
+data.archive.archive_completed_tasks. История через tasks_all после
+переноса должна остаться той же.
+
+Кэш read-моделей выключен (FQ_CACHE=0), фоновый архиватор не запускается.
+Код выхода 1, если история изменилась или горячая таблица не уменьшилась.
+"""
+import atexit
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Временная БД, выключенные кэш и фоновый архиватор — до импорта модулей приложения
+_tmp_dir = tempfile.mkdtemp(prefix="fq_bench_")
+atexit.register(shutil.rmtree, _tmp_dir, ignore_errors=True)
+os.environ["FQ_DB_PATH"] = os.path.join(_tmp_dir, "bench.db")
+os.environ["FQ_CACHE"] = "0"
+os.environ["FQ_ARCHIVE"] = "0"
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.archive import archive_completed_tasks, ARCHIVE_AFTER_DAYS
+from data.bootstrap import bootstrap_database
+from data.database import get_connection
+from data.task_pages import open_tasks_page, history_page, task_counts
+from core.auth_system import AuthSystem
+from core.game_engine import GameEngine
+
+CHILDREN = 5
+DAYS = int(os.getenv("FQ_BENCH_DAYS", "730"))
+COMPLETED_PER_DAY = 8
+OPEN_TASKS = 30
+RUNS = 30
+
+
+def seed():
+    bootstrap_database()
+    auth = AuthSystem()
+    parent_id = auth.register_parent("bench_parent", "bench", "Родитель")
+    children = []
+    for n in range(CHILDREN):
+        child_id = auth.register_child(f"bench_child_{n}", "bench", f"Ребёнок {n}", 7 + n, ["science"])
+        auth.accept_invitation(auth.generate_invite_code(parent_id), child_id)
+        children.append(child_id)
+
+    # Как в жизни: история копится день за днём, строки детей перемешаны по страницам
+    now = datetime.now()
+    rows = []
+    for day in range(DAYS, 0, -1):
+        for child_id in children:
+            for j in range(COMPLETED_PER_DAY):
+                moment = (now - timedelta(days=day, minutes=j)).isoformat()
+                rows.append((child_id, f"Задание {day}-{j}", 1, moment, moment))
+    for child_id in children:
+        rows += [(child_id, f"Открытое задание {j}", 0, None, now.isoformat()) for j in range(OPEN_TASKS)]
+
+    conn = get_connection()
+    conn.executemany('''
+        INSERT INTO tasks (user_id, title, description, category, points, difficulty, emoji,
+                           completed, completed_at, created_at, created_by)
+        VALUES (?, ?, 'Описание задания, чуть длиннее обычного', 'help', 10, 'easy', '⭐', ?, ?, ?, NULL)
+    ''', rows)
+    conn.commit()
+    conn.close()
+    return parent_id, children
+
+
+def hot_pages():
+    """Страниц БД у tasks и её индексов (None, если SQLite собран без dbstat)"""
+    conn = sqlite3.connect(os.environ["FQ_DB_PATH"])
+    try:
+        return conn.execute('''
+            SELECT COUNT(*) FROM dbstat
+            WHERE name = 'tasks' OR name IN (SELECT name FROM sqlite_master WHERE tbl_name = 'tasks' AND type = 'index')
+        ''').fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+def timed(func, runs: int = RUNS) -> float:
+    func()  # Прогрев
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def measure(engine, parent_id, child_id):
+    return {
+        "открытые задания (страница)": timed(lambda: open_tasks_page(child_id)),
+        "открытые задания (все)": timed(lambda: engine.load_tasks_from_db(child_id)),
+        "история (первая страница)": timed(lambda: history_page(child_id)),
+        "загрузка семьи": timed(lambda: engine.load_family_bulk(parent_id, force=True), runs=RUNS // 3),
+    }
+
+
+def full_history(child_id):
+    ids, token = [], None
+    while True:
+        page = history_page(child_id, token, 200)
+        ids += [task.id for task in page.tasks]
+        token = page.next_token
+        if not token:
+            return ids
+
+
+def main():
+    parent_id, children = seed()
+    engine = GameEngine()
+    child_id = children[0]
+
+    history_before = full_history(child_id)
+    counts_before = task_counts(child_id)
+    pages_before = hot_pages()
+    before = measure(engine, parent_id, child_id)
+
+    started = time.perf_counter()
+    moved = archive_completed_tasks(pause=0)
+    archive_ms = (time.perf_counter() - started) * 1000
+
+    pages_after = hot_pages()
+    after = measure(engine, parent_id, child_id)
+    same_history = full_history(child_id) == history_before and task_counts(child_id) == counts_before
+
+    print(f"Семья: {CHILDREN} детей, {DAYS} дней истории по {COMPLETED_PER_DAY} заданий, "
+          f"по {OPEN_TASKS} открытых (медиана {RUNS} прогонов)")
+    print(f"  в архив старше {ARCHIVE_AFTER_DAYS} дней: {moved} заданий за {archive_ms:.0f} мс")
+    if pages_before is not None:
+        print(f"  tasks с индексами: {pages_before} → {pages_after} страниц "
+              f"({pages_before / max(pages_after, 1):.1f}x меньше)")
+    for name, before_ms in before.items():
+        print(f"  {name:28s} {before_ms:7.2f} → {after[name]:7.2f} мс")
+    print(f"  история через tasks_all не изменилась: {'да' if same_history else 'НЕТ'}")
+
+    shrunk = pages_before is None or pages_after < pages_before
+    return 0 if same_history and moved and shrunk else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
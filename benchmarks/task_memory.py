@@ -0,0 +1,134 @@
+"""
+Бенчмарк: память и время сборки 100 тысяч заданий из sqlite3.Row
+
+Запуск из корня репозитория:
+    python benchmarks/task_memory.py
+
+Сравниваются прежнее представление задания (класс с __dict__, собираемый
+через dict(row)) и data.models.Task (неизменяемая запись со __slots__,
+Task.from_row). Память считается tracemalloc по всем объектам заданий,
+включая строки и даты, поэтому разница — это именно накладные расходы
+представления.
+
+Код выхода 1, если новые записи занимают не меньше памяти, чем прежние.
+"""
+import gc
+import os
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'app')))
+
+from data.models import Task
+
+TASKS = int(os.getenv("FQ_BENCH_TASKS", "100000"))
+RUNS = 5
+
+
+class LegacyTask:
+    """Задание, каким оно было в core.game_engine (обычный класс с __dict__)"""
+    def __init__(self, id, title, description, category, points, difficulty, emoji,
+                 photo_required, child_id, due_date=None, completed=False,
+                 completed_at=None, photo_url=None, created_at=None):
+        self.id = id
+        self.title = title
+        self.description = description
+        self.category = category
+        self.points = points
+        self.difficulty = difficulty
+        self.emoji = emoji
+        self.photo_required = photo_required
+        self.child_id = child_id
+        self.due_date = due_date
+        self.completed = completed
+        self.completed_at = completed_at
+        self.photo_url = photo_url
+        self.created_at = created_at
+
+
+def legacy_from_row(row) -> LegacyTask:
+    task_data = dict(row)
+    return LegacyTask(
+        id=task_data['id'],
+        title=task_data['title'],
+        description=task_data['description'],
+        category=task_data['category'],
+        points=task_data['points'],
+        difficulty=task_data['difficulty'],
+        emoji=task_data['emoji'],
+        photo_required=bool(task_data['photo_required']),
+        child_id=task_data['user_id'],
+        due_date=task_data.get('due_date'),
+        completed=bool(task_data['completed']),
+        completed_at=task_data.get('completed_at'),
+        photo_url=task_data.get('photo_url'),
+        created_at=datetime.fromisoformat(task_data['created_at']) if task_data['created_at'] else datetime.now()
+    )
+
+
+def load_rows():
+    """Строки таблицы tasks той же формы, что в приложении"""
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        CREATE TABLE tasks (
+            id INTEGER PRIMARY KEY, user_id INTEGER, title TEXT, description TEXT,
+            category TEXT, points INTEGER, difficulty TEXT, emoji TEXT,
+            photo_required BOOLEAN, due_date TEXT, completed BOOLEAN,
+            completed_at TEXT, photo_url TEXT, created_at TEXT
+        )
+    ''')
+    conn.executemany('''
+        INSERT INTO tasks (user_id, title, description, category, points, difficulty, emoji,
+                           photo_required, completed, created_at)
+        VALUES (?, ?, 'Описание задания', 'help', 10, 'easy', '⭐', 0, ?, '2024-05-01T10:00:00')
+    ''', [(i % 5 + 1, f"Задание {i}", int(i % 3 == 0)) for i in range(TASKS)])
+    rows = conn.execute("SELECT * FROM tasks").fetchall()
+    conn.close()
+    return rows
+
+
+def memory(build, rows) -> int:
+    """Байт, занятых списком собранных заданий"""
+    gc.collect()
+    tracemalloc.start()
+    tasks = [build(row) for row in rows]
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del tasks
+    return size
+
+
+def build_time(build, rows) -> float:
+    samples = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        tasks = [build(row) for row in rows]
+        samples.append((time.perf_counter() - started) * 1000)
+        del tasks
+    return statistics.median(samples)
+
+
+def main():
+    rows = load_rows()
+
+    legacy_bytes = memory(legacy_from_row, rows)
+    slotted_bytes = memory(Task.from_row, rows)
+    legacy_ms = build_time(legacy_from_row, rows)
+    slotted_ms = build_time(Task.from_row, rows)
+
+    print(f"{TASKS} заданий (время — медиана {RUNS} прогонов)")
+    print(f"  прежний класс (__dict__):  {legacy_bytes / 2**20:7.1f} МБ  "
+          f"({legacy_bytes / TASKS:5.0f} Б/задание)  {legacy_ms:7.1f} мс")
+    print(f"  data.models.Task (slots):  {slotted_bytes / 2**20:7.1f} МБ  "
+          f"({slotted_bytes / TASKS:5.0f} Б/задание)  {slotted_ms:7.1f} мс")
+    print(f"  экономия памяти: {1 - slotted_bytes / legacy_bytes:.0%}")
+    return 0 if slotted_bytes < legacy_bytes else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""
+Одновременные покупки наград не тратят больше, чем есть (benchmarks/rewards_concurrency.py)
+
+Стресс-тест запускается отдельным процессом: он работает на своей
+временной БД, сам запускает процессы-покупатели и завершается с кодом 1,
+если баланс ушёл в минус, журнал баллов разошёлся с users.points или
+повтор покупки с тем же ключом списал дважды.
+"""
+import os
+import subprocess
+import sys
+
+BENCHMARK = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'rewards_concurrency.py')
+
+
+def test_concurrent_purchases_never_overspend():
+    proc = subprocess.run([sys.executable, BENCHMARK], capture_output=True, text=True, timeout=600)
+    assert proc.returncode == 0, proc.stdout + proc.stderr[-2000:]
@@ -0,0 +1,17 @@
+"""
+Бюджет импортов при холодном старте main.py (benchmarks/startup_imports.py)
+
+Бенчмарк запускается отдельным процессом: он сам запускает интерпретаторы
+с -X importtime и завершается с кодом 1, если старт вышел за бюджет или
+при старте загрузился модуль, нужный только отдельному разделу.
+"""
+import os
+import subprocess
+import sys
+
+BENCHMARK = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'startup_imports.py')
+
+
+def test_startup_imports_within_budget():
+    proc = subprocess.run([sys.executable, BENCHMARK], capture_output=True, text=True, timeout=600)
+    assert proc.returncode == 0, proc.stdout + proc.stderr[-2000:]